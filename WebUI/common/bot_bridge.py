@@ -9,6 +9,8 @@ from loguru import logger
 from WebUI.utils.singleton import Singleton
 # 引入键值数据库
 from database.keyvalDB import KeyvalDB
+from utils.message_counter import MessageCounter
+from utils.metrics import metrics
 from utils.plugin_manager import PluginManager
 
 # 确保可以导入根目录模块
@@ -75,6 +77,11 @@ class BotBridge(metaclass=Singleton):
         获取接收消息数量
         """
         try:
+            # 机器人运行时直接读取内存中的计数，数据库中的值会有写回延迟
+            counter = MessageCounter()
+            if self.is_running and counter.loaded:
+                return counter.count
+
             result = await self._db.get(KEY_MESSAGE_COUNT)
             count = int(result) if result is not None else 0
 
@@ -88,6 +95,11 @@ class BotBridge(metaclass=Singleton):
         增加消息计数
         """
         try:
+            counter = MessageCounter()
+            if self.is_running and counter.loaded:
+                counter.incr(amount)
+                return True
+
             current = await self.get_message_count()
             new_count = current + amount
             await self._db.set(KEY_MESSAGE_COUNT, str(new_count))
@@ -233,7 +245,8 @@ class BotBridge(metaclass=Singleton):
                     "author": plugin["author"],
                     "version": plugin["version"],
                     "enabled": plugin["enabled"],
-                    "directory": rel_path
+                    "directory": rel_path,
+                    "stats": metrics.handler_stats(plugin["name"])
                 }
                 formatted_plugins.append(formatted_plugin)
 
@@ -263,7 +276,8 @@ class BotBridge(metaclass=Singleton):
                 "author": plugin_info["author"],
                 "version": plugin_info["version"],
                 "enabled": plugin_info["enabled"],
-                "directory": rel_path
+                "directory": rel_path,
+                "stats": metrics.handler_stats(plugin_info["name"])
             }
         except Exception as e:
             logger.log('WEBUI', f"获取插件详情出错: {str(e)}")
@@ -126,6 +126,7 @@ function renderPluginList(plugins) {
                         </div>
                         
                         <p class="plugin-description mb-0">${plugin.description || '无描述信息'}</p>
+                        ${renderPluginStats(plugin.stats)}
                     </div>
 
                     <div class="d-flex align-items-center gap-3 me-3">
@@ -159,6 +160,25 @@ function renderPluginList(plugins) {
     });
 }
 
+// 渲染插件处理耗时统计
+function renderPluginStats(stats) {
+    if (!stats || stats.length === 0) {
+        return '';
+    }
+
+    const ms = (seconds) => `${Math.round(seconds * 1000)}ms`;
+    const rows = stats.map(stat => `
+        <div class="plugin-stats text-sm text-gray-500">
+            <i class="fas fa-tachometer-alt mr-1"></i>${stat.event_type}
+            <span class="mx-2 text-gray-300">|</span>${stat.calls}次
+            <span class="mx-2 text-gray-300">|</span>p50 ${ms(stat.latency.p50)} / p95 ${ms(stat.latency.p95)} / p99 ${ms(stat.latency.p99)}
+            ${stat.errors || stat.timeouts ? `<span class="mx-2 text-gray-300">|</span><span class="text-red-500">错误 ${stat.errors} 超时 ${stat.timeouts}</span>` : ''}
+        </div>
+    `).join('');
+
+    return `<div class="mt-2">${rows}</div>`;
+}
+
 // 处理插件操作按钮点击
 function handlePluginActionClick() {
     const pluginId = $(this).data('id');
@@ -1,6 +1,7 @@
 from WechatAPI.errors import *
 from .base import WechatAPIClientBase, Proxy, Section
 from .chatroom import ChatroomMixin
+from .image_pipeline import ImageOptions
 from .friend import FriendMixin
 from .hongbao import HongBaoMixin
 from .login import LoginMixin
@@ -9,6 +10,7 @@ from .protect import protector
 from .protect import protector
 from .tool import ToolMixin
 from .user import UserMixin
+from .video_pipeline import VideoOptions
 
 
 class WechatAPIClient(LoginMixin, MessageMixin, FriendMixin, ChatroomMixin, UserMixin,
@@ -16,13 +18,16 @@ class WechatAPIClient(LoginMixin, MessageMixin, FriendMixin, ChatroomMixin, User
 
     # 这里都是需要结合多个功能的方法
 
-    async def send_at_message(self, wxid: str, content: str, at: list[str]) -> tuple[int, int, int]:
+    async def send_at_message(self, wxid: str, content: str, at: list[str], lane: str = None,
+                              coalesce: bool = True) -> tuple[int, int, int]:
         """发送@消息
 
         Args:
             wxid (str): 接收人
             content (str): 消息内容
             at (list[str]): 要@的用户ID列表
+            lane (str, optional): 发送通道，interactive、normal或bulk，默认使用当前上下文的通道
+            coalesce (bool, optional): 是否允许与相邻的、@相同用户的文本消息合并发送
 
         Returns:
             tuple[int, int, int]: 包含以下三个值的元组:
@@ -40,10 +45,9 @@ class WechatAPIClient(LoginMixin, MessageMixin, FriendMixin, ChatroomMixin, User
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
         output = ""
-        for id in at:
-            nickname = await self.get_nickname(id)
+        for nickname in await self.get_nickname(list(at)):
             output += f"@{nickname}\u2005"
 
         output += content
 
-        return await self.send_text_message(wxid, output, at)
+        return await self.send_text_message(wxid, output, at, lane=lane, coalesce=coalesce)
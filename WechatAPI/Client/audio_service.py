@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import io
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional
+
+import pysilk
+from loguru import logger
+from pydub import AudioSegment
+
+SOURCE_FORMATS = ("silk", "amr", "wav", "mp3")
+TARGET_FORMATS = ("silk", "amr", "wav")
+
+# 微信语音silk支持的采样率
+SILK_FRAME_RATES = (8000, 12000, 16000, 24000)
+
+
+def closest_frame_rate(frame_rate: int) -> int:
+    """最接近的silk采样率"""
+    return min(SILK_FRAME_RATES, key=lambda rate: abs(frame_rate - rate))
+
+
+def convert_audio(data: bytes, source: str, target: str) -> tuple[bytes, int]:
+    """转换音频格式，同步函数，在线程或进程池中执行
+
+    Args:
+        data: 音频数据
+        source: 源格式，silk/amr/wav/mp3
+        target: 目标格式，silk/amr/wav，与源格式相同时只计算时长
+
+    Returns:
+        tuple[bytes, int]: (转换后的数据, 时长毫秒)
+    """
+    if source == "silk":
+        wav = pysilk.decode(data, to_wav=True)
+        if target == "wav":
+            return wav, len(AudioSegment.from_wav(io.BytesIO(wav)))
+        data, source = wav, "wav"
+
+    audio = AudioSegment.from_file(io.BytesIO(data), format=source)
+    if target == source:
+        return data, len(audio)
+
+    if target == "silk":
+        audio = audio.set_channels(1)
+        audio = audio.set_frame_rate(closest_frame_rate(audio.frame_rate))
+        return pysilk.encode(audio.raw_data, data_rate=audio.frame_rate, sample_rate=audio.frame_rate), len(audio)
+
+    if target == "amr":
+        # AMR编码的标准参数
+        audio = audio.set_frame_rate(8000).set_channels(1)
+    output = io.BytesIO()
+    audio.export(output, format=target)
+    return output.getvalue(), len(audio)
+
+
+class AudioService:
+    """音频转码服务
+
+    pydub/ffmpeg和silk编解码都是CPU密集的同步操作，在线程或进程池中执行，不阻塞事件循环。
+    进程池使用spawn方式启动，不继承机器人进程中的线程和eventlet补丁。
+    同时等待转码的任务数量有上限，超出时调用方排队等待；转换结果按(内容哈希, 源格式, 目标格式)缓存，
+    相同音频并发转换时只转换一次。进程池不可用时退回线程执行。
+
+    Args:
+        workers (int): 进程数，0为使用线程（默认）
+        max_pending (int): 最多同时提交的转码任务数
+        cache_size (int): 最多缓存的转换结果数量，0为不缓存
+    """
+
+    def __init__(self, workers: int = 0, max_pending: int = 32, cache_size: int = 128):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.cache_size = cache_size
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._cache: OrderedDict[tuple, tuple[bytes, int]] = OrderedDict()
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+        self.hits = 0
+        self.conversions = 0
+
+    def configure(self, workers: int = None, max_pending: int = None, cache_size: int = None):
+        """修改进程数、排队上限和缓存容量"""
+        if workers is not None and workers != self.workers:
+            self.workers = workers
+            self.shutdown()
+        if max_pending is not None:
+            self.max_pending = max_pending
+            self._slots = None
+        if cache_size is not None:
+            self.cache_size = cache_size
+            self._evict()
+
+    def stats(self) -> dict:
+        return {"size": len(self._cache), "hits": self.hits, "conversions": self.conversions}
+
+    def shutdown(self):
+        """关闭进程池，下次转码时重新创建"""
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _evict(self):
+        while len(self._cache) > max(self.cache_size, 0):
+            self._cache.popitem(last=False)
+
+    async def convert(self, data: bytes, source: str, target: str) -> tuple[bytes, int]:
+        """转换音频格式
+
+        Args:
+            data: 音频数据
+            source: 源格式，silk/amr/wav/mp3
+            target: 目标格式，silk/amr/wav
+
+        Returns:
+            tuple[bytes, int]: (转换后的数据, 时长毫秒)
+
+        Raises:
+            ValueError: 格式不支持时
+        """
+        source, target = source.lower(), target.lower()
+        if source not in SOURCE_FORMATS or target not in TARGET_FORMATS:
+            raise ValueError(f"不支持从{source}转换到{target}")
+
+        key = (hashlib.sha256(data).hexdigest(), source, target)
+        while True:
+            result = self._cache.get(key)
+            if result is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return result
+
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            result = await asyncio.shield(future)
+            if result is not None:
+                self.hits += 1
+                return result
+            # 负责转换的调用方被取消，重新检查后自己转换
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            result = await self._run(data, source, target)
+            if self.cache_size > 0:
+                self._cache[key] = result
+                self._evict()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            # 不取消等待者，让它们自己转换
+            future.set_result(None)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _run(self, data: bytes, source: str, target: str) -> tuple[bytes, int]:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(max(self.max_pending, 1))
+        async with self._slots:
+            self.conversions += 1
+            loop = asyncio.get_running_loop()
+            if self.workers > 0:
+                try:
+                    if self._pool is None:
+                        self._pool = ProcessPoolExecutor(max_workers=self.workers,
+                                                         mp_context=multiprocessing.get_context("spawn"))
+                    return await loop.run_in_executor(self._pool, convert_audio, data, source, target)
+                except (BrokenProcessPool, OSError) as e:
+                    logger.warning("音频转码进程池不可用，改为线程执行: {}", e)
+                    self.shutdown()
+            return await asyncio.to_thread(convert_audio, data, source, target)
+
+
+audio_service = AudioService()
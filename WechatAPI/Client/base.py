@@ -1,7 +1,23 @@
 from dataclasses import dataclass
+from typing import Optional
+
+import aiohttp
 
 from WechatAPI.errors import *
 
+# 各接口的默认超时时间（秒），未列出的接口使用WechatAPIClientBase.timeout
+DEFAULT_ENDPOINT_TIMEOUTS = {
+    "/IsRunning": 5,
+    "/Sync": 10,
+    "/SendImageMsg": 300,
+    "/SendVideoMsg": 300,
+    "/SendVoiceMsg": 300,
+    "/CdnDownloadImg": 300,
+    "/DownloadVoice": 300,
+    "/DownloadVideo": 300,
+    "/DownloadAttach": 300,
+}
+
 
 @dataclass
 class Proxy:
@@ -56,9 +72,75 @@ class WechatAPIClientBase:
 
         self.ignore_protect = False
 
+        # 所有请求共用一个长连接会话，首次请求时创建
+        self.connection_limit = 100
+        self.timeout = 60
+        self.endpoint_timeouts = dict(DEFAULT_ENDPOINT_TIMEOUTS)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._timeouts: dict[str, aiohttp.ClientTimeout] = {}
+
         # 调用所有 Mixin 的初始化方法
         super().__init__()
 
+    def configure_http(self, connection_limit: int = None, timeout: float = None, endpoint_timeouts: dict = None):
+        """设置HTTP连接参数，需在首次请求前调用
+
+        Args:
+            connection_limit (int, optional): 最大连接数
+            timeout (float, optional): 默认超时时间（秒）
+            endpoint_timeouts (dict, optional): 按接口路径设置的超时时间，如{"/Sync": 10}，与默认值合并
+        """
+        if connection_limit is not None:
+            self.connection_limit = connection_limit
+        if timeout is not None:
+            self.timeout = timeout
+        if endpoint_timeouts:
+            self.endpoint_timeouts.update(endpoint_timeouts)
+        self._timeouts.clear()
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取共用的会话，不存在或已关闭时重新创建"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit, keepalive_timeout=60)
+            self._session = aiohttp.ClientSession(base_url=f"http://{self.ip}:{self.port}", connector=connector)
+        return self._session
+
+    def _get_timeout(self, path: str) -> aiohttp.ClientTimeout:
+        timeout = self._timeouts.get(path)
+        if timeout is None:
+            timeout = self._timeouts[path] = aiohttp.ClientTimeout(
+                total=self.endpoint_timeouts.get(path, self.timeout))
+        return timeout
+
+    async def _post(self, path: str, json_param: dict) -> dict:
+        """向WechatAPI发送POST请求
+
+        Args:
+            path (str): 接口路径，如"/SendTextMsg"
+            json_param (dict): 请求参数
+
+        Returns:
+            dict: 响应的JSON数据
+        """
+        async with self._get_session().post(path, json=json_param, timeout=self._get_timeout(path)) as response:
+            return await response.json()
+
+    async def _get(self, path: str, text: bool = False):
+        """向WechatAPI发送GET请求
+
+        Args:
+            path (str): 接口路径，如"/IsRunning"
+            text (bool): 为True时返回文本，否则返回JSON数据
+        """
+        async with self._get_session().get(path, timeout=self._get_timeout(path)) as response:
+            return await response.text() if text else await response.json()
+
+    async def close(self):
+        """关闭共用的会话，机器人关闭时调用"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
     @staticmethod
     def error_handler(json_resp):
         """处理API响应中的错误码
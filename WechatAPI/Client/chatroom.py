@@ -1,7 +1,5 @@
 from typing import Union, Any
 
-import aiohttp
-
 from .base import *
 from .protect import protector
 from ..errors import *
@@ -23,15 +21,13 @@ class ChatroomMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Chatroom": chatroom, "InviteWxids": wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/AddChatroomMember', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Chatroom": chatroom, "InviteWxids": wxid}
+        json_resp = await self._post("/AddChatroomMember", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def get_chatroom_announce(self, chatroom: str) -> dict:
         """获取群聊公告
@@ -45,17 +41,15 @@ class ChatroomMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetChatroomInfo', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
+        json_resp = await self._post("/GetChatroomInfo", json_param)
 
-            if json_resp.get("Success"):
-                data = dict(json_resp.get("Data"))
-                data.pop("BaseResponse")
-                return data
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            data = dict(json_resp.get("Data"))
+            data.pop("BaseResponse")
+            return data
+        else:
+            self.error_handler(json_resp)
 
     async def get_chatroom_info(self, chatroom: str) -> dict:
         """获取群聊信息
@@ -71,15 +65,13 @@ class ChatroomMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetChatroomInfoNoAnnounce', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
+        json_resp = await self._post("/GetChatroomInfoNoAnnounce", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("ContactList")[0]
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("ContactList")[0]
+        else:
+            self.error_handler(json_resp)
 
     async def get_chatroom_member_list(self, chatroom: str) -> list[dict]:
         """获取群聊成员列表
@@ -93,15 +85,13 @@ class ChatroomMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetChatroomMemberDetail', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
+        json_resp = await self._post("/GetChatroomMemberDetail", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("NewChatroomData").get("ChatRoomMember")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("NewChatroomData").get("ChatRoomMember")
+        else:
+            self.error_handler(json_resp)
 
     async def get_chatroom_qrcode(self, chatroom: str) -> dict[str, Any]:
         """获取群聊二维码
@@ -117,16 +107,14 @@ class ChatroomMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(86400):
             raise BanProtection("获取二维码需要在登录后24小时才可使用")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetChatroomQRCode', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Chatroom": chatroom}
+        json_resp = await self._post("/GetChatroomQRCode", json_param)
 
-            if json_resp.get("Success"):
-                data = json_resp.get("Data")
-                return {"base64": data.get("qrcode").get("buffer"), "description": data.get("revokeQrcodeWording")}
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            data = json_resp.get("Data")
+            return {"base64": data.get("qrcode").get("buffer"), "description": data.get("revokeQrcodeWording")}
+        else:
+            self.error_handler(json_resp)
 
     async def invite_chatroom_member(self, wxid: Union[str, list], chatroom: str) -> bool:
         """邀请群聊成员(群聊大于40人)
@@ -146,12 +134,10 @@ class ChatroomMixin(WechatAPIClientBase):
         if isinstance(wxid, list):
             wxid = ",".join(wxid)
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Chatroom": chatroom, "InviteWxids": wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/InviteChatroomMember', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Chatroom": chatroom, "InviteWxids": wxid}
+        json_resp = await self._post("/InviteChatroomMember", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
@@ -0,0 +1,153 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional
+
+
+class ContactCache:
+    """联系人详情缓存
+
+    按wxid缓存/GetContractDetail的结果，过期后重新获取，超过容量时淘汰最久未使用的联系人。
+    同一wxid同时只会有一个请求，并发查询共享结果；短时间内的未命中会合并，按每次最多20个批量查询。
+
+    Args:
+        fetch (Callable): 批量获取联系人详情的协程函数，参数为wxid列表，返回联系人详情列表
+        ttl (float): 缓存有效期（秒），0为不缓存
+        max_size (int): 最多缓存的联系人数量
+        batch_size (int): 每次请求最多查询的wxid数量
+        batch_delay (float): 合并未命中查询的等待时间（秒）
+        negative_ttl (float): 查不到的联系人（空dict）的缓存时间（秒），避免短时间内重复查询
+    """
+
+    def __init__(self, fetch: Callable[[List[str]], Awaitable[list]], ttl: float = 600, max_size: int = 5000,
+                 batch_size: int = 20, batch_delay: float = 0.01, negative_ttl: float = 30):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.batch_delay = batch_delay
+
+        self._fetch = fetch
+        self._entries: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._pending: List[str] = []
+        self._flush_task: Optional[asyncio.Task] = None
+
+        self.hits = 0
+        self.misses = 0
+        self.requests = 0
+
+    def configure(self, ttl: Optional[float] = None, max_size: Optional[int] = None):
+        """修改有效期和容量"""
+        if ttl is not None:
+            self.ttl = ttl
+        if max_size is not None:
+            self.max_size = max_size
+            self._evict()
+
+    def stats(self) -> dict:
+        """命中率等统计信息"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "requests": self.requests,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+    def put(self, wxid: str, contact: dict):
+        """写入或更新一个联系人，空dict只缓存negative_ttl"""
+        ttl = min(self.ttl, self.negative_ttl) if not contact else self.ttl
+        if ttl <= 0:
+            return
+        self._entries[wxid] = (time.monotonic() + ttl, contact)
+        self._entries.move_to_end(wxid)
+        self._evict()
+
+    def invalidate(self, wxid: Optional[str] = None):
+        """删除一个联系人的缓存，wxid为None时清空"""
+        if wxid is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(wxid, None)
+
+    def _evict(self):
+        while len(self._entries) > max(self.max_size, 0):
+            self._entries.popitem(last=False)
+
+    async def get(self, wxid: str) -> dict:
+        """获取单个联系人详情，不存在时返回空dict"""
+        return (await self.get_many([wxid]))[wxid]
+
+    async def get_many(self, wxids: Iterable[str]) -> Dict[str, dict]:
+        """批量获取联系人详情，数量不受20个的限制
+
+        Returns:
+            Dict[str, dict]: wxid到联系人详情的映射，不存在的联系人为空dict
+        """
+        now = time.monotonic()
+        result = {}
+        waiting = {}
+        for wxid in dict.fromkeys(wxids):
+            entry = self._entries.get(wxid)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(wxid)
+                self.hits += 1
+                result[wxid] = entry[1]
+                continue
+
+            self.misses += 1
+            future = self._inflight.get(wxid)
+            if future is None:
+                future = self._inflight[wxid] = asyncio.get_running_loop().create_future()
+                # 所有等待者都取消时，避免“异常未被获取”的警告
+                future.add_done_callback(lambda f: f.cancelled() or f.exception())
+                self._pending.append(wxid)
+            waiting[wxid] = future
+
+        if self._pending and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush())
+
+        for wxid, future in waiting.items():
+            # shield: 一个调用方被取消不影响其他共享同一请求的调用方
+            result[wxid] = await asyncio.shield(future)
+        return result
+
+    async def _flush(self):
+        """等待一小段时间收集并发的未命中，然后分批请求
+
+        请求期间新加入的未命中不会再创建flush任务，所以请求完成后继续处理，直到没有未命中
+        """
+        while self._pending:
+            await asyncio.sleep(self.batch_delay)
+            batches = []
+            while self._pending:
+                batches.append(self._pending[:self.batch_size])
+                del self._pending[:self.batch_size]
+            await asyncio.gather(*(self._fetch_batch(batch) for batch in batches))
+
+    async def _fetch_batch(self, batch: List[str]):
+        self.requests += 1
+        try:
+            contacts = await self._fetch(batch) or []
+        except Exception as e:
+            for wxid in batch:
+                future = self._inflight.pop(wxid, None)
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        found = {}
+        for contact in contacts:
+            username = (contact.get("UserName") or {}).get("string")
+            if username:
+                found[username] = contact
+
+        for wxid in batch:
+            # 只按UserName对应，返回结果的顺序和数量不可靠，按位置对应可能得到别人的资料
+            contact = found.get(wxid) or {}
+            self.put(wxid, contact)
+            future = self._inflight.pop(wxid, None)
+            if future is not None and not future.done():
+                future.set_result(contact)
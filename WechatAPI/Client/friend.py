@@ -1,13 +1,27 @@
 from typing import Union
 
-import aiohttp
-
 from .base import *
+from .contact_cache import ContactCache
 from .protect import protector
 from ..errors import *
 
 
 class FriendMixin(WechatAPIClientBase):
+    def __init__(self, ip: str, port: int):
+        super().__init__(ip, port)
+        # 联系人详情缓存，get_nickname等频繁查询的方法使用
+        # 调用时再查找方法，tracer.instrument替换后的方法才会被使用
+        self.contact_cache = ContactCache(lambda wxids: self.get_contract_detail(wxids))
+
+    def configure_contact_cache(self, ttl: float = None, max_size: int = None):
+        """设置联系人缓存
+
+        Args:
+            ttl (float, optional): 缓存有效期（秒），0为不缓存
+            max_size (int, optional): 最多缓存的联系人数量
+        """
+        self.contact_cache.configure(ttl, max_size)
+
     async def accept_friend(self, scene: int, v1: str, v2: str) -> bool:
         """接受好友请求
 
@@ -35,15 +49,13 @@ class FriendMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "Scene": scene, "V1": v1, "V2": v2}
-            response = await session.post(f'http://{self.ip}:{self.port}/AcceptFriend', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Scene": scene, "V1": v1, "V2": v2}
+        json_resp = await self._post("/AcceptFriend", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def get_contact(self, wxid: Union[str, list[str]]) -> Union[dict, list[dict]]:
         """获取联系人信息
@@ -60,19 +72,17 @@ class FriendMixin(WechatAPIClientBase):
         if isinstance(wxid, list):
             wxid = ",".join(wxid)
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "RequestWxids": wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetContact', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                contact_list = json_resp.get("Data").get("ContactList")
-                if len(contact_list) == 1:
-                    return contact_list[0]
-                else:
-                    return contact_list
+        json_param = {"Wxid": self.wxid, "RequestWxids": wxid}
+        json_resp = await self._post("/GetContact", json_param)
+
+        if json_resp.get("Success"):
+            contact_list = json_resp.get("Data").get("ContactList")
+            if len(contact_list) == 1:
+                return contact_list[0]
             else:
-                self.error_handler(json_resp)
+                return contact_list
+        else:
+            self.error_handler(json_resp)
 
     async def get_contract_detail(self, wxid: Union[str, list[str]], chatroom: str = "") -> list:
         """获取联系人详情
@@ -93,15 +103,13 @@ class FriendMixin(WechatAPIClientBase):
             wxid = ",".join(wxid)
 
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "RequestWxids": wxid, "Chatroom": chatroom}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetContractDetail', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "RequestWxids": wxid, "Chatroom": chatroom}
+        json_resp = await self._post("/GetContractDetail", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("ContactList")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("ContactList")
+        else:
+            self.error_handler(json_resp)
 
     async def get_contract_list(self, wx_seq: int = 0, chatroom_seq: int = 0) -> dict:
         """获取联系人列表
@@ -116,37 +124,42 @@ class FriendMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "CurrentWxcontactSeq": wx_seq, "CurrentChatroomContactSeq": chatroom_seq}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetContractList', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "CurrentWxcontactSeq": wx_seq, "CurrentChatroomContactSeq": chatroom_seq}
+        json_resp = await self._post("/GetContractList", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data")
+        else:
+            self.error_handler(json_resp)
+
+    async def get_cached_contact(self, wxid: Union[str, list[str]]) -> Union[dict, list[dict]]:
+        """从缓存获取联系人详情，未缓存或已过期时自动批量查询
+
+        Args:
+            wxid: 联系人wxid，可以是单个wxid或wxid列表，列表长度不限
+
+        Returns:
+            Union[dict, list[dict]]: 输入单个wxid返回dict，输入列表返回对应顺序的列表，不存在的联系人为空dict
+        """
+        if not self.wxid:
+            raise UserLoggedOut("请先登录")
+
+        if isinstance(wxid, str):
+            return await self.contact_cache.get(wxid)
+        contacts = await self.contact_cache.get_many(wxid)
+        return [contacts[w] for w in wxid]
 
     async def get_nickname(self, wxid: Union[str, list[str]]) -> Union[str, list[str]]:
-        """获取用户昵称
+        """获取用户昵称，结果会被缓存
 
         Args:
-            wxid: 用户wxid，可以是单个wxid或最多20个wxid的列表
+            wxid: 用户wxid，可以是单个wxid或wxid列表
 
         Returns:
             Union[str, list[str]]: 如果输入单个wxid返回str，如果输入wxid列表则返回对应的昵称列表
         """
-        data = await self.get_contract_detail(wxid)
+        data = await self.get_cached_contact(wxid)
 
         if isinstance(wxid, str):
-            try:
-                return data[0].get("NickName").get("string")
-            except:
-                return ""
-        else:
-            result = []
-            for contact in data:
-                try:
-                    result.append(contact.get("NickName").get("string"))
-                except:
-                    result.append("")
-            return result
+            return (data.get("NickName") or {}).get("string") or ""
+        return [(contact.get("NickName") or {}).get("string") or "" for contact in data]
@@ -0,0 +1,109 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from io import BytesIO
+from typing import Optional
+
+from PIL import Image
+
+# 图片编码在线程中执行，Pillow编码时会释放GIL，不会阻塞事件循环
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+@dataclass
+class ImageOptions:
+    """发送图片前的压缩设置
+
+    Args:
+        enabled (bool): 是否压缩，单次调用传入的设置默认开启
+        format (str): 输出格式，auto/jpeg/webp/png。auto时颜色少的图片（如棋盘）输出调色板PNG，其他输出JPEG
+        max_dimension (int): 最长边的最大像素，0为不限制
+        max_bytes (int): 最大字节数，超出时逐步降低质量和尺寸，0为不限制
+        quality (int): JPEG/WebP的初始质量
+    """
+    enabled: bool = True
+    format: str = "auto"
+    max_dimension: int = 1920
+    max_bytes: int = 1024 * 1024
+    quality: int = 85
+
+
+def _flatten(img: Image.Image) -> Image.Image:
+    """去掉透明通道，透明部分填充白色"""
+    if img.mode in ("RGBA", "LA") or (img.mode == "P" and "transparency" in img.info):
+        img = img.convert("RGBA")
+        background = Image.new("RGB", img.size, (255, 255, 255))
+        background.paste(img, mask=img.getchannel("A"))
+        return background
+    return img.convert("RGB")
+
+
+def _encode(img: Image.Image, fmt: str, quality: int) -> bytes:
+    buffer = BytesIO()
+    if fmt == "png":
+        img.quantize(colors=256, method=Image.Quantize.FASTOCTREE).save(buffer, format="PNG", optimize=True)
+    elif fmt == "webp":
+        _flatten(img).save(buffer, format="WEBP", quality=quality, method=4)
+    else:
+        _flatten(img).save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def optimize_image(data: bytes, options: ImageOptions) -> bytes:
+    """按设置缩放并重新编码图片，结果不比原图小且原图符合限制时返回原图
+
+    同步函数，请通过optimize_image_async调用。
+    """
+    img = Image.open(BytesIO(data))
+    if getattr(img, "is_animated", False):  # 动图不处理
+        return data
+
+    fmt = options.format.lower()
+    if fmt == "auto":
+        fmt = "png" if img.convert("RGBA").getcolors(maxcolors=256) is not None else "jpeg"
+
+    original_size = img.size
+    if options.max_dimension and max(img.size) > options.max_dimension:
+        img.thumbnail((options.max_dimension, options.max_dimension), Image.Resampling.LANCZOS)
+    resized = img.size != original_size
+
+    quality = options.quality
+    result = _encode(img, fmt, quality)
+    # 超出字节限制时先降低质量，再缩小尺寸
+    while options.max_bytes and len(result) > options.max_bytes:
+        if fmt != "png" and quality > 40:
+            quality -= 15
+        elif min(img.size) > 64:
+            img = img.resize((int(img.width * 0.8), int(img.height * 0.8)), Image.Resampling.LANCZOS)
+            resized = True
+        else:
+            break
+        result = _encode(img, fmt, quality)
+
+    if not resized and len(result) >= len(data) and (not options.max_bytes or len(data) <= options.max_bytes):
+        return data
+    return result
+
+
+async def optimize_image_async(data: bytes, options: ImageOptions) -> bytes:
+    """在线程池中压缩图片"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="image")
+    return await asyncio.get_running_loop().run_in_executor(_executor, optimize_image, data, options)
+
+
+def merge_options(base: ImageOptions, override) -> Optional[ImageOptions]:
+    """合并全局设置和单次调用的设置，返回None表示不压缩
+
+    Args:
+        base: 全局设置
+        override: None使用全局设置，True/False强制开启/关闭，ImageOptions直接使用
+    """
+    if override is None:
+        options = base
+    elif isinstance(override, ImageOptions):
+        options = override
+    else:
+        options = replace(base, enabled=bool(override))
+    return options if options.enabled else None
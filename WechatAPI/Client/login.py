@@ -1,3 +1,4 @@
+import asyncio
 import hashlib
 import io
 import string
@@ -20,10 +21,8 @@ class LoginMixin(WechatAPIClientBase):
             bool: 如果WechatAPI正在运行返回True，否则返回False。
         """
         try:
-            async with aiohttp.ClientSession() as session:
-                response = await session.get(f'http://{self.ip}:{self.port}/IsRunning')
-                return await response.text() == 'OK'
-        except aiohttp.client_exceptions.ClientConnectorError:
+            return await self._get("/IsRunning", text=True) == 'OK'
+        except (aiohttp.client_exceptions.ClientConnectorError, asyncio.TimeoutError):
             return False
 
     async def get_qr_code(self, device_name: str, device_id: str = "", proxy: Proxy = None) -> (
@@ -41,31 +40,29 @@ class LoginMixin(WechatAPIClientBase):
         Raises:
             根据error_handler处理错误
         """
-        async with aiohttp.ClientSession() as session:
-            json_param = {'DeviceName': device_name, 'DeviceID': device_id}
-            if proxy:
-                json_param['ProxyInfo'] = {'ProxyIp': f'{proxy.ip}:{proxy.port}',
-                                           'ProxyPassword': proxy.password,
-                                           'ProxyUser': proxy.username}
-
-            response = await session.post(f'http://{self.ip}:{self.port}/GetQRCode', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                qr = qrcode.QRCode(
-                    version=1,
-                    box_size=10,
-                    border=4,
-                )
-                qr.add_data(f'http://weixin.qq.com/x/{json_resp.get("Data").get("Uuid")}')
-                qr.make(fit=True)
-                f = io.StringIO()
-                qr.print_ascii(out=f)
-                f.seek(0)
-
-                return json_resp.get("Data").get("Uuid"), json_resp.get("Data").get("QRCodeURL"), f.read()
-            else:
-                self.error_handler(json_resp)
+        json_param = {'DeviceName': device_name, 'DeviceID': device_id}
+        if proxy:
+            json_param['ProxyInfo'] = {'ProxyIp': f'{proxy.ip}:{proxy.port}',
+                                       'ProxyPassword': proxy.password,
+                                       'ProxyUser': proxy.username}
+
+        json_resp = await self._post("/GetQRCode", json_param)
+
+        if json_resp.get("Success"):
+            qr = qrcode.QRCode(
+                version=1,
+                box_size=10,
+                border=4,
+            )
+            qr.add_data(f'http://weixin.qq.com/x/{json_resp.get("Data").get("Uuid")}')
+            qr.make(fit=True)
+            f = io.StringIO()
+            qr.print_ascii(out=f)
+            f.seek(0)
+
+            return json_resp.get("Data").get("Uuid"), json_resp.get("Data").get("QRCodeURL"), f.read()
+        else:
+            self.error_handler(json_resp)
 
     async def check_login_uuid(self, uuid: str, device_id: str = "") -> tuple[bool, Union[dict, int]]:
         """检查登录的UUID状态。
@@ -80,21 +77,19 @@ class LoginMixin(WechatAPIClientBase):
         Raises:
             根据error_handler处理错误
         """
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Uuid": uuid}
-            response = await session.post(f'http://{self.ip}:{self.port}/CheckUuid', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                if json_resp.get("Data").get("acctSectResp", ""):
-                    self.wxid = json_resp.get("Data").get("acctSectResp").get("userName")
-                    self.nickname = json_resp.get("Data").get("acctSectResp").get("nickName")
-                    protector.update_login_status(device_id=device_id)
-                    return True, json_resp.get("Data")
-                else:
-                    return False, json_resp.get("Data").get("expiredTime")
+        json_param = {"Uuid": uuid}
+        json_resp = await self._post("/CheckUuid", json_param)
+
+        if json_resp.get("Success"):
+            if json_resp.get("Data").get("acctSectResp", ""):
+                self.wxid = json_resp.get("Data").get("acctSectResp").get("userName")
+                self.nickname = json_resp.get("Data").get("acctSectResp").get("nickName")
+                protector.update_login_status(device_id=device_id)
+                return True, json_resp.get("Data")
             else:
-                self.error_handler(json_resp)
+                return False, json_resp.get("Data").get("expiredTime")
+        else:
+            self.error_handler(json_resp)
 
     async def log_out(self) -> bool:
         """登出当前账号。
@@ -109,17 +104,15 @@ class LoginMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/Logout', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid}
+        json_resp = await self._post("/Logout", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            elif json_resp.get("Success"):
-                return False
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        elif json_resp.get("Success"):
+            return False
+        else:
+            self.error_handler(json_resp)
 
     async def awaken_login(self, wxid: str = "") -> str:
         """唤醒登录。
@@ -141,17 +134,15 @@ class LoginMixin(WechatAPIClientBase):
         if not wxid and self.wxid:
             wxid = self.wxid
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/AwakenLogin', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": wxid}
+        json_resp = await self._post("/AwakenLogin", json_param)
 
-            if json_resp.get("Success") and json_resp.get("Data").get("QrCodeResponse").get("Uuid"):
-                return json_resp.get("Data").get("QrCodeResponse").get("Uuid")
-            elif not json_resp.get("Data").get("QrCodeResponse").get("Uuid"):
-                raise LoginError("Please login using QRCode first")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success") and json_resp.get("Data").get("QrCodeResponse").get("Uuid"):
+            return json_resp.get("Data").get("QrCodeResponse").get("Uuid")
+        elif not json_resp.get("Data").get("QrCodeResponse").get("Uuid"):
+            raise LoginError("Please login using QRCode first")
+        else:
+            self.error_handler(json_resp)
 
     async def get_cached_info(self, wxid: str = None) -> dict:
         """获取登录缓存信息。
@@ -168,15 +159,13 @@ class LoginMixin(WechatAPIClientBase):
         if not wxid:
             return {}
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/GetCachedInfo', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": wxid}
+        json_resp = await self._post("/GetCachedInfo", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data")
-            else:
-                return {}
+        if json_resp.get("Success"):
+            return json_resp.get("Data")
+        else:
+            return {}
 
     async def heartbeat(self) -> bool:
         """发送心跳包。
@@ -191,15 +180,13 @@ class LoginMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/Heartbeat', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid}
+        json_resp = await self._post("/Heartbeat", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def start_auto_heartbeat(self) -> bool:
         """开始自动心跳。
@@ -214,15 +201,13 @@ class LoginMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/AutoHeartbeatStart', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid}
+        json_resp = await self._post("/AutoHeartbeatStart", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def stop_auto_heartbeat(self) -> bool:
         """停止自动心跳。
@@ -237,15 +222,13 @@ class LoginMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/AutoHeartbeatStop', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid}
+        json_resp = await self._post("/AutoHeartbeatStop", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def get_auto_heartbeat_status(self) -> bool:
         """获取自动心跳状态。
@@ -260,15 +243,13 @@ class LoginMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid}
-            response = await session.post(f'http://{self.ip}:{self.port}/AutoHeartbeatStatus', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid}
+        json_resp = await self._post("/AutoHeartbeatStatus", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("Running")
-            else:
-                return self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("Running")
+        else:
+            return self.error_handler(json_resp)
 
     @staticmethod
     def create_device_name() -> str:
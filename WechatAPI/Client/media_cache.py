@@ -0,0 +1,156 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+from xml.sax.saxutils import quoteattr
+
+from loguru import logger
+
+
+def content_hash(data: str) -> str:
+    """媒体内容的哈希，data为媒体的base64"""
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+def _field(data: dict, *names: str) -> Any:
+    """按多个可能的字段名（不区分大小写）取值，兼容不同版本的返回格式"""
+    lowered = {key.lower(): value for key, value in data.items()}
+    for name in names:
+        value = lowered.get(name.lower())
+        if isinstance(value, dict):
+            value = value.get("string")
+        if value:
+            return value
+    return None
+
+
+def build_image_xml(data: dict, md5: str, length: int) -> Optional[str]:
+    """根据/SendImageMsg返回的CDN信息构造可用于/SendCDNImgMsg转发的xml，信息不全时返回None"""
+    aeskey = _field(data, "Aeskey", "AesKey")
+    fileid = _field(data, "Fileid", "FileId", "CdnMidImgUrl")
+    if not aeskey or not fileid:
+        return None
+    length = _field(data, "TotalLen", "DataLen") or length
+    return (f'<?xml version="1.0"?><msg><img aeskey={quoteattr(aeskey)} cdnthumbaeskey={quoteattr(aeskey)} '
+            f'cdnthumburl={quoteattr(fileid)} cdnthumblength="{length}" cdnmidimgurl={quoteattr(fileid)} '
+            f'length="{length}" md5="{md5}" /></msg>')
+
+
+def build_video_xml(data: dict, md5: str, length: int, play_length: int) -> Optional[str]:
+    """根据/SendVideoMsg返回的CDN信息构造可用于/SendCDNVideoMsg转发的xml，信息不全时返回None"""
+    aeskey = _field(data, "Aeskey", "AesKey")
+    video_url = _field(data, "CdnVideoUrl", "VideoUrl", "Fileid", "FileId")
+    if not aeskey or not video_url:
+        return None
+    thumb_url = _field(data, "CdnThumbUrl", "ThumbUrl") or video_url
+    thumb_aeskey = _field(data, "CdnThumbAeskey", "ThumbAeskey") or aeskey
+    return (f'<?xml version="1.0"?><msg><videomsg aeskey={quoteattr(aeskey)} cdnvideourl={quoteattr(video_url)} '
+            f'cdnthumbaeskey={quoteattr(thumb_aeskey)} cdnthumburl={quoteattr(thumb_url)} length="{length}" '
+            f'playlength="{play_length}" md5="{md5}" /></msg>')
+
+
+class MediaCache:
+    """已上传媒体的缓存
+
+    相同内容的图片、视频第一次上传成功后，记录CDN信息（转发用的xml），
+    之后发送相同内容时通过转发接口发送，不再重复上传。同一内容正在上传时，其他发送会等待上传完成后转发。
+    转发失败时清除缓存并重新上传。
+
+    Args:
+        ttl (float): 缓存有效期（秒），0为不缓存
+        max_size (int): 最多缓存的媒体数量
+    """
+
+    def __init__(self, ttl: float = 86400, max_size: int = 256):
+        self.ttl = ttl
+        self.max_size = max_size
+
+        self._entries: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.uploads = 0
+        self.forwards = 0
+
+    def configure(self, ttl: Optional[float] = None, max_size: Optional[int] = None):
+        """修改有效期和容量"""
+        if ttl is not None:
+            self.ttl = ttl
+        if max_size is not None:
+            self.max_size = max_size
+            while len(self._entries) > max(self.max_size, 0):
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"size": len(self._entries), "uploads": self.uploads, "forwards": self.forwards}
+
+    def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: str, xml: str):
+        if self.ttl <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, xml)
+        self._entries.move_to_end(key)
+        while len(self._entries) > max(self.max_size, 0):
+            self._entries.popitem(last=False)
+
+    def invalidate(self, key: Optional[str] = None):
+        """删除一个媒体的缓存，key为None时清空"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    async def send(self, key: str, upload: Callable[[], Awaitable[tuple[Any, Optional[str]]]],
+                   forward: Callable[[str], Awaitable[Any]]) -> Any:
+        """发送媒体，已上传过时转发，否则上传
+
+        Args:
+            key: 媒体类型和内容哈希组成的键
+            upload: 上传并发送的协程函数，返回(发送结果, 转发用的xml)，无法转发时xml为None
+            forward: 用xml转发的协程函数，返回发送结果
+
+        Returns:
+            发送结果
+        """
+        if self.ttl <= 0:
+            return (await upload())[0]
+
+        xml = self.get(key)
+        if xml is None and key in self._inflight:
+            # 相同内容正在上传，等待完成后转发
+            xml = await asyncio.shield(self._inflight[key])
+
+        if xml is not None:
+            try:
+                result = await forward(xml)
+                self.forwards += 1
+                return result
+            except Exception as e:
+                logger.warning("转发已上传的媒体失败，重新上传: {}", e)
+                self.invalidate(key)
+
+        future = None
+        if key not in self._inflight:
+            future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        xml = None
+        try:
+            # upload在接口返回未知错误时可能返回None
+            result, xml = await upload() or (None, None)
+            self.uploads += 1
+            if xml is not None:
+                self.put(key, xml)
+            return result
+        finally:
+            if future is not None:
+                del self._inflight[key]
+                # 上传失败或无法转发时等待者拿到None，各自上传
+                future.set_result(xml)
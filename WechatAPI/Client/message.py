@@ -1,64 +1,105 @@
 import asyncio
 import base64
+import hashlib
 import os
-from asyncio import Future
-from asyncio import Queue, sleep
-from io import BytesIO
+from dataclasses import replace
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 
-import aiohttp
-import pysilk
 from loguru import logger
-from pydub import AudioSegment
-from pymediainfo import MediaInfo
 
+from .audio_service import audio_service
 from .base import *
+from .image_pipeline import ImageOptions, merge_options, optimize_image_async
+from .media_cache import MediaCache, build_image_xml, build_video_xml, content_hash
 from .protect import protector
+from .send_scheduler import SendScheduler
+from .video_pipeline import VideoPipeline
 from ..errors import *
 
 
 class MessageMixin(WechatAPIClientBase):
     def __init__(self, ip: str, port: int):
-        # 初始化消息队列
         super().__init__(ip, port)
-        self._message_queue = Queue()
-        self._is_processing = False
+        # 发送调度器，按接收人和全局限速
+        self.send_scheduler = SendScheduler()
+        # 已上传的图片、视频，相同内容再次发送时转发
+        self.media_cache = MediaCache()
+        # 发送图片前的压缩设置，默认关闭
+        self.image_options = ImageOptions(enabled=False)
+        # 发送视频前的转码和封面生成
+        self.video_pipeline = VideoPipeline()
+
+    def configure_send(self, rate: float = None, burst: int = None, chat_rate: float = None, chat_burst: int = None,
+                       aging: float = None, coalesce_window: float = None, coalesce_max_length: int = None):
+        """设置发送频率
 
-    async def _process_message_queue(self):
-        """
-        处理消息队列的异步方法
+        Args:
+            rate (float, optional): 全局每秒发送数量
+            burst (int, optional): 全局突发数量
+            chat_rate (float, optional): 单个接收人每秒发送数量
+            chat_burst (int, optional): 单个接收人突发数量
+            aging (float, optional): 低优先级消息每等待多少秒提升一级优先级
+            coalesce_window (float, optional): 连续文本消息的合并等待时间（秒），0为不合并
+            coalesce_max_length (int, optional): 合并后文本的最大长度
         """
-        if self._is_processing:
-            return
-
-        self._is_processing = True
-        while True:
-            if self._message_queue.empty():
-                self._is_processing = False
-                break
-
-            func, args, kwargs, future = await self._message_queue.get()
-            try:
-                result = await func(*args, **kwargs)
-                future.set_result(result)
-            except Exception as e:
-                future.set_exception(e)
-            finally:
-                self._message_queue.task_done()
-                await sleep(1)  # 消息发送间隔1秒
-
-    async def _queue_message(self, func, *args, **kwargs):
+        self.send_scheduler.configure(rate, burst, chat_rate, chat_burst, aging, coalesce_window, coalesce_max_length)
+
+    def configure_media_cache(self, ttl: float = None, max_size: int = None):
+        """设置已上传媒体的缓存
+
+        Args:
+            ttl (float, optional): 缓存有效期（秒），0为不缓存，每次都重新上传
+            max_size (int, optional): 最多缓存的媒体数量
         """
-        将消息添加到队列
+        self.media_cache.configure(ttl, max_size)
+
+    def configure_image(self, enabled: bool = None, format: str = None, max_dimension: int = None,
+                        max_bytes: int = None, quality: int = None):
+        """设置发送图片前的压缩，参数说明见ImageOptions"""
+        changes = {"enabled": enabled, "format": format, "max_dimension": max_dimension, "max_bytes": max_bytes,
+                   "quality": quality}
+        self.image_options = replace(self.image_options, **{k: v for k, v in changes.items() if v is not None})
+
+    def configure_video(self, enabled: bool = None, max_dimension: int = None, video_bitrate: int = None,
+                        audio_bitrate: int = None, concurrency: int = None):
+        """设置发送视频前的转码，参数说明见VideoOptions
+
+        Args:
+            concurrency (int, optional): 最多同时运行的ffmpeg进程数
         """
-        future = Future()
-        await self._message_queue.put((func, args, kwargs, future))
+        changes = {"enabled": enabled, "max_dimension": max_dimension, "video_bitrate": video_bitrate,
+                   "audio_bitrate": audio_bitrate}
+        options = replace(self.video_pipeline.options, **{k: v for k, v in changes.items() if v is not None})
+        self.video_pipeline.configure(options, concurrency)
+
+    async def _optimize_image(self, image: Union[str, bytes, os.PathLike], options: ImageOptions) -> \
+            Union[str, bytes, os.PathLike]:
+        """压缩图片，失败时返回原图"""
+        try:
+            if isinstance(image, str):
+                data = base64.b64decode(image)
+            elif isinstance(image, bytes):
+                data = image
+            elif isinstance(image, os.PathLike):
+                data = await asyncio.to_thread(Path(image).read_bytes)
+            else:
+                return image
+            return await optimize_image_async(data, options)
+        except Exception as e:
+            logger.warning("压缩图片失败，发送原图: {}", e)
+            return image
 
-        if not self._is_processing:
-            asyncio.create_task(self._process_message_queue())
+    async def _queue_message(self, func, *args, lane: str = None, coalesce=None, **kwargs):
+        """
+        将消息添加到发送队列，args的第一个参数为接收人wxid，lane为发送通道，coalesce为合并键
+        """
+        return await self.send_scheduler.submit(args[0], func, *args, lane=lane, coalesce=coalesce, **kwargs)
 
-        return await future
+    async def close(self):
+        """停止发送队列并关闭会话"""
+        await self.send_scheduler.stop()
+        await super().close()
 
     async def revoke_message(self, wxid: str, client_msg_id: int, create_time: int, new_msg_id: int) -> bool:
         """撤回消息。
@@ -82,38 +123,44 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "ClientMsgId": client_msg_id, "CreateTime": create_time,
-                          "NewMsgId": new_msg_id}
-            response = await session.post(f'http://{self.ip}:{self.port}/RevokeMsg', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                logger.info("消息撤回成功: 对方wxid:{} ClientMsgId:{} CreateTime:{} NewMsgId:{}",
-                            wxid,
-                            client_msg_id,
-                            new_msg_id)
-                return True
-            else:
-                self.error_handler(json_resp)
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "ClientMsgId": client_msg_id, "CreateTime": create_time,
+                      "NewMsgId": new_msg_id}
+        json_resp = await self._post("/RevokeMsg", json_param)
+
+        if json_resp.get("Success"):
+            logger.info("消息撤回成功: 对方wxid:{} ClientMsgId:{} CreateTime:{} NewMsgId:{}",
+                        wxid,
+                        client_msg_id,
+                        new_msg_id)
+            return True
+        else:
+            self.error_handler(json_resp)
 
-    async def send_text_message(self, wxid: str, content: str, at: Union[list, str] = "") -> tuple[int, int, int]:
+    async def send_text_message(self, wxid: str, content: str, at: Union[list, str] = "", lane: str = None,
+                                coalesce: bool = True) -> tuple[int, int, int]:
         """发送文本消息。
 
         Args:
             wxid (str): 接收人wxid
             content (str): 消息内容
             at (list, str, optional): 要@的用户
+            lane (str, optional): 发送通道，interactive、normal或bulk，默认使用当前上下文的通道
+            coalesce (bool, optional): 开启合并时，是否允许与相邻的、@相同用户的文本消息合并发送. Defaults to True.
 
         Returns:
-            tuple[int, int, int]: 返回(ClientMsgid, CreateTime, NewMsgId)
+            tuple[int, int, int]: 返回(ClientMsgid, CreateTime, NewMsgId)，被合并时为合并后消息的值
 
         Raises:
             UserLoggedOut: 未登录时调用
             BanProtection: 登录新设备后4小时内操作
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_text_message, wxid, content, at)
+        coalesce_key = None
+        if coalesce:
+            at_list = at.split(",") if isinstance(at, str) else (at or [])
+            coalesce_key = ("text", frozenset(user for user in at_list if user))
+        return await self._queue_message(self._send_text_message, wxid, content, at, lane=lane,
+                                         coalesce=coalesce_key)
 
     async def _send_text_message(self, wxid: str, content: str, at: list[str] = None) -> tuple[int, int, int]:
         """
@@ -126,31 +173,32 @@ class MessageMixin(WechatAPIClientBase):
 
         if isinstance(at, str):
             at_str = at
-        elif isinstance(at, list):
+        elif isinstance(at, (list, tuple)):
             if at is None:
                 at = []
             at_str = ",".join(at)
         else:
             raise ValueError("Argument 'at' should be str or list")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": content, "Type": 1, "At": at_str}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendTextMsg', json=json_param)
-            json_resp = await response.json()
-            if json_resp.get("Success"):
-                logger.info("发送文字消息: 对方wxid:{} at:{} 内容:{}", wxid, at, content)
-                data = json_resp.get("Data")
-                return data.get("List")[0].get("ClientMsgid"), data.get("List")[0].get("Createtime"), data.get("List")[
-                    0].get("NewMsgId")
-            else:
-                self.error_handler(json_resp)
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": content, "Type": 1, "At": at_str}
+        json_resp = await self._post("/SendTextMsg", json_param)
+        if json_resp.get("Success"):
+            logger.info("发送文字消息: 对方wxid:{} at:{} 内容:{}", wxid, at, content)
+            data = json_resp.get("Data")
+            return data.get("List")[0].get("ClientMsgid"), data.get("List")[0].get("Createtime"), data.get("List")[
+                0].get("NewMsgId")
+        else:
+            self.error_handler(json_resp)
 
-    async def send_image_message(self, wxid: str, image: Union[str, bytes, os.PathLike]) -> tuple[int, int, int]:
+    async def send_image_message(self, wxid: str, image: Union[str, bytes, os.PathLike], lane: str = None,
+                                 optimize: Union[bool, ImageOptions] = None) -> tuple[int, int, int]:
         """发送图片消息。
 
         Args:
             wxid (str): 接收人wxid
             image (str, byte, os.PathLike): 图片，支持base64字符串，图片byte，图片路径
+            lane (str, optional): 发送通道，interactive、normal或bulk，默认使用当前上下文的通道
+            optimize (bool, ImageOptions, optional): 发送前是否压缩图片，None使用全局设置，也可以传入单次的ImageOptions
 
         Returns:
             tuple[int, int, int]: 返回(ClientImgId, CreateTime, NewMsgId)
@@ -161,7 +209,11 @@ class MessageMixin(WechatAPIClientBase):
             ValueError: image_path和image_base64都为空或都不为空时
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_image_message, wxid, image)
+        options = merge_options(self.image_options, optimize)
+        if options is not None:
+            # 在排队前压缩，不占用发送队列
+            image = await self._optimize_image(image, options)
+        return await self._queue_message(self._send_image_message, wxid, image, lane=lane)
 
     async def _send_image_message(self, wxid: str, image: Union[str, bytes, os.PathLike]) -> tuple[
         int, int, int]:
@@ -180,27 +232,36 @@ class MessageMixin(WechatAPIClientBase):
         else:
             raise ValueError("Argument 'image' can only be str, bytes, or os.PathLike")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": image}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendImageMsg', json=json_param)
-            json_resp = await response.json()
+        # 相同的图片只上传一次，之后转发
+        return await self.media_cache.send(f"image:{content_hash(image)}",
+                                           lambda: self._upload_image(wxid, image),
+                                           lambda xml: self._send_cdn_img_msg(wxid, xml))
 
-            if json_resp.get("Success"):
-                json_param.pop('Base64')
-                logger.info("发送图片消息: 对方wxid:{} 图片base64略", wxid)
-                data = json_resp.get("Data")
-                return data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")
-            else:
-                self.error_handler(json_resp)
+    async def _upload_image(self, wxid: str, image: str) -> tuple[tuple[int, int, int], Optional[str]]:
+        """
+        上传并发送图片，返回(发送结果, 转发用的xml)
+        """
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": image}
+        json_resp = await self._post("/SendImageMsg", json_param)
+
+        if json_resp.get("Success"):
+            json_param.pop('Base64')
+            logger.info("发送图片消息: 对方wxid:{} 图片base64略", wxid)
+            data = json_resp.get("Data")
+            raw = base64.b64decode(image)
+            xml = build_image_xml(data, hashlib.md5(raw).hexdigest(), len(raw))
+            return (data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")), xml
+        else:
+            self.error_handler(json_resp)
 
     async def send_video_message(self, wxid: str, video: Union[str, bytes, os.PathLike],
                                  image: [str, bytes, os.PathLike] = None):
-        """发送视频消息。不推荐使用，上传速度很慢300KB/s。如要使用，可压缩视频，或者发送链接卡片而不是视频。
+        """发送视频消息。上传速度很慢300KB/s，发送前会按configure_video的设置转码压缩，也可以发送链接卡片而不是视频。
 
                 Args:
                     wxid (str): 接收人wxid
                     video (str, bytes, os.PathLike): 视频 接受base64字符串，字节，文件路径
-                    image (str, bytes, os.PathLike): 视频封面图片 接受base64字符串，字节，文件路径
+                    image (str, bytes, os.PathLike): 视频封面图片 接受base64字符串，字节，文件路径，为空时自动截取视频画面
 
                 Returns:
                     tuple[int, int]: 返回(ClientMsgid, NewMsgId)
@@ -211,58 +272,64 @@ class MessageMixin(WechatAPIClientBase):
                     ValueError: 视频或图片参数都为空或都不为空时
                     根据error_handler处理错误
                 """
-        if not image:
-            image = Path(os.path.join(Path(__file__).resolve().parent, "fallback.png"))
-        # get video base64 and duration
+        # 读取视频，路径在线程中读取
         if isinstance(video, str):
-            vid_base64 = video
             video = base64.b64decode(video)
-            file_len = len(video)
-            media_info = MediaInfo.parse(BytesIO(video))
-        elif isinstance(video, bytes):
-            vid_base64 = base64.b64encode(video).decode()
-            file_len = len(video)
-            media_info = MediaInfo.parse(BytesIO(video))
         elif isinstance(video, os.PathLike):
-            with open(video, "rb") as f:
-                file_len = len(f.read())
-                vid_base64 = base64.b64encode(f.read()).decode()
-            media_info = MediaInfo.parse(video)
-        else:
+            video = await asyncio.to_thread(Path(video).read_bytes)
+        elif not isinstance(video, bytes):
             raise ValueError("video should be str, bytes, or path")
-        duration = media_info.tracks[0].duration
+
+        # 在线程和ffmpeg子进程中读取信息、转码、截取封面，结果按内容缓存
+        prepared = await self.video_pipeline.prepare(video)
+        vid_base64 = base64.b64encode(prepared.video).decode()
+        file_len = len(prepared.video)
+        duration = prepared.duration
 
         # get image base64
+        if not image:
+            image = prepared.cover or Path(os.path.join(Path(__file__).resolve().parent, "fallback.png"))
         if isinstance(image, str):
             image_base64 = image
         elif isinstance(image, bytes):
             image_base64 = base64.b64encode(image).decode()
         elif isinstance(image, os.PathLike):
-            with open(image, "rb") as f:
-                image_base64 = base64.b64encode(f.read()).decode()
+            image_base64 = base64.b64encode(await asyncio.to_thread(Path(image).read_bytes)).decode()
         else:
             raise ValueError("image should be str, bytes, or path")
 
+        # 相同的视频只上传一次，之后转发
+        return await self.media_cache.send(f"video:{content_hash(vid_base64)}",
+                                           lambda: self._upload_video(wxid, vid_base64, image_base64, duration,
+                                                                      file_len),
+                                           lambda xml: self._send_cdn_video_msg(wxid, xml))
+
+    async def _upload_video(self, wxid: str, vid_base64: str, image_base64: str, duration: int, file_len: int) -> \
+            tuple[tuple[int, int], Optional[str]]:
+        """
+        上传并发送视频，返回(发送结果, 转发用的xml)
+        """
         # 打印预估时间，300KB/s
         predict_time = int(file_len / 1024 / 300)
         logger.info("开始发送视频: 对方wxid:{} 视频base64略 图片base64略 预计耗时:{}秒", wxid, predict_time)
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": vid_base64, "ImageBase64": image_base64,
-                          "PlayLength": duration}
-            async with session.post(f'http://{self.ip}:{self.port}/SendVideoMsg', json=json_param) as resp:
-                json_resp = await resp.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": vid_base64, "ImageBase64": image_base64,
+                      "PlayLength": duration}
+        json_resp = await self._post("/SendVideoMsg", json_param)
 
         if json_resp.get("Success"):
             json_param.pop('Base64')
             json_param.pop('ImageBase64')
             logger.info("发送视频成功: 对方wxid:{} 时长:{} 视频base64略 图片base64略", wxid, duration)
             data = json_resp.get("Data")
-            return data.get("clientMsgId"), data.get("newMsgId")
+            raw = base64.b64decode(vid_base64)
+            xml = build_video_xml(data, hashlib.md5(raw).hexdigest(), len(raw), int((duration or 0) / 1000))
+            return (data.get("clientMsgId"), data.get("newMsgId")), xml
         else:
             self.error_handler(json_resp)
 
-    async def send_voice_message(self, wxid: str, voice: Union[str, bytes, os.PathLike], format: str = "amr") -> \
+    async def send_voice_message(self, wxid: str, voice: Union[str, bytes, os.PathLike], format: str = "amr",
+                                 lane: str = None) -> \
             tuple[int, int, int]:
         """发送语音消息。
 
@@ -270,6 +337,7 @@ class MessageMixin(WechatAPIClientBase):
             wxid (str): 接收人wxid
             voice (str, bytes, os.PathLike): 语音 接受base64字符串，字节，文件路径
             format (str, optional): 语音格式，支持amr/wav/mp3. Defaults to "amr".
+            lane (str, optional): 发送通道，interactive、normal或bulk，默认使用当前上下文的通道
 
         Returns:
             tuple[int, int, int]: 返回(ClientMsgid, CreateTime, NewMsgId)
@@ -280,7 +348,7 @@ class MessageMixin(WechatAPIClientBase):
             ValueError: voice_path和voice_base64都为空或都不为空时，或format不支持时
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_voice_message, wxid, voice, format)
+        return await self._queue_message(self._send_voice_message, wxid, voice, format, lane=lane)
 
     async def _send_voice_message(self, wxid: str, voice: Union[str, bytes, os.PathLike], format: str = "amr") -> \
             tuple[int, int, int]:
@@ -297,61 +365,32 @@ class MessageMixin(WechatAPIClientBase):
         elif isinstance(voice, bytes):
             voice_byte = voice
         elif isinstance(voice, os.PathLike):
-            with open(voice, "rb") as f:
-                voice_byte = f.read()
+            voice_byte = await asyncio.to_thread(Path(voice).read_bytes)
         else:
             raise ValueError("voice should be str, bytes, or path")
 
-        # get voice duration and b64
-        if format.lower() == "amr":
-            audio = AudioSegment.from_file(BytesIO(voice_byte), format="amr")
-            voice_base64 = base64.b64encode(voice_byte).decode()
-        elif format.lower() == "wav":
-            audio = AudioSegment.from_file(BytesIO(voice_byte), format="wav").set_channels(1)
-            audio = audio.set_frame_rate(self._get_closest_frame_rate(audio.frame_rate))
-            voice_base64 = base64.b64encode(
-                await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate)).decode()
-        elif format.lower() == "mp3":
-            audio = AudioSegment.from_file(BytesIO(voice_byte), format="mp3").set_channels(1)
-            audio = audio.set_frame_rate(self._get_closest_frame_rate(audio.frame_rate))
-            voice_base64 = base64.b64encode(
-                await pysilk.async_encode(audio.raw_data, sample_rate=audio.frame_rate)).decode()
-        else:
-            raise ValueError("format must be one of amr, wav, mp3")
-
-        duration = len(audio)
+        # get voice duration and b64，wav/mp3转为silk，在转码进程中执行
+        target = "amr" if format.lower() == "amr" else "silk"
+        voice_byte, duration = await audio_service.convert(voice_byte, format, target)
+        voice_base64 = base64.b64encode(voice_byte).decode()
 
         format_dict = {"amr": 0, "wav": 4, "mp3": 4}
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": voice_base64, "VoiceTime": duration,
-                          "Type": format_dict[format]}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendVoiceMsg', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                json_param.pop('Base64')
-                logger.info("发送语音消息: 对方wxid:{} 时长:{} 格式:{} 音频base64略", wxid, duration, format)
-                data = json_resp.get("Data")
-                return int(data.get("ClientMsgId")), data.get("CreateTime"), data.get("NewMsgId")
-            else:
-                self.error_handler(json_resp)
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Base64": voice_base64, "VoiceTime": duration,
+                      "Type": format_dict[format]}
+        json_resp = await self._post("/SendVoiceMsg", json_param)
 
-    @staticmethod
-    def _get_closest_frame_rate(frame_rate: int) -> int:
-        supported = [8000, 12000, 16000, 24000]
-        closest_rate = None
-        smallest_diff = float('inf')
-        for num in supported:
-            diff = abs(frame_rate - num)
-            if diff < smallest_diff:
-                smallest_diff = diff
-                closest_rate = num
+        if json_resp.get("Success"):
+            json_param.pop('Base64')
+            logger.info("发送语音消息: 对方wxid:{} 时长:{} 格式:{} 音频base64略", wxid, duration, format)
+            data = json_resp.get("Data")
+            return int(data.get("ClientMsgId")), data.get("CreateTime"), data.get("NewMsgId")
+        else:
+            self.error_handler(json_resp)
 
-        return closest_rate
 
     async def send_link_message(self, wxid: str, url: str, title: str = "", description: str = "",
-                                thumb_url: str = "") -> tuple[str, int, int]:
+                                thumb_url: str = "", lane: str = None) -> tuple[str, int, int]:
         """发送链接消息。
 
         Args:
@@ -360,6 +399,7 @@ class MessageMixin(WechatAPIClientBase):
             title (str, optional): 标题. Defaults to "".
             description (str, optional): 描述. Defaults to "".
             thumb_url (str, optional): 缩略图链接. Defaults to "".
+            lane (str, optional): 发送通道，interactive、normal或bulk，默认使用当前上下文的通道
 
         Returns:
             tuple[str, int, int]: 返回(ClientMsgid, CreateTime, NewMsgId)
@@ -369,7 +409,7 @@ class MessageMixin(WechatAPIClientBase):
             BanProtection: 登录新设备后4小时内操作
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_link_message, wxid, url, title, description, thumb_url)
+        return await self._queue_message(self._send_link_message, wxid, url, title, description, thumb_url, lane=lane)
 
     async def _send_link_message(self, wxid: str, url: str, title: str = "", description: str = "",
                                  thumb_url: str = "") -> tuple[int, int, int]:
@@ -378,31 +418,30 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Url": url, "Title": title, "Desc": description,
-                          "ThumbUrl": thumb_url}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendShareLink', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                logger.info("发送链接消息: 对方wxid:{} 链接:{} 标题:{} 描述:{} 缩略图链接:{}",
-                            wxid,
-                            url,
-                            title,
-                            description,
-                            thumb_url)
-                data = json_resp.get("Data")
-                return data.get("clientMsgId"), data.get("createTime"), data.get("newMsgId")
-            else:
-                self.error_handler(json_resp)
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Url": url, "Title": title, "Desc": description,
+                      "ThumbUrl": thumb_url}
+        json_resp = await self._post("/SendShareLink", json_param)
+
+        if json_resp.get("Success"):
+            logger.info("发送链接消息: 对方wxid:{} 链接:{} 标题:{} 描述:{} 缩略图链接:{}",
+                        wxid,
+                        url,
+                        title,
+                        description,
+                        thumb_url)
+            data = json_resp.get("Data")
+            return data.get("clientMsgId"), data.get("createTime"), data.get("newMsgId")
+        else:
+            self.error_handler(json_resp)
 
-    async def send_emoji_message(self, wxid: str, md5: str, total_length: int) -> list[dict]:
+    async def send_emoji_message(self, wxid: str, md5: str, total_length: int, lane: str = None) -> list[dict]:
         """发送表情消息。
 
         Args:
             wxid (str): 接收人wxid
             md5 (str): 表情md5值
             total_length (int): 表情总长度
+            lane (str, optional): 发送通道，interactive、normal或bulk，默认使用当前上下文的通道
 
         Returns:
             list[dict]: 返回表情项列表(list of emojiItem)
@@ -412,7 +451,7 @@ class MessageMixin(WechatAPIClientBase):
             BanProtection: 登录新设备后4小时内操作
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_emoji_message, wxid, md5, total_length)
+        return await self._queue_message(self._send_emoji_message, wxid, md5, total_length, lane=lane)
 
     async def _send_emoji_message(self, wxid: str, md5: str, total_length: int) -> tuple[int, int, int]:
         if not self.wxid:
@@ -420,19 +459,17 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Md5": md5, "TotalLen": total_length}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendEmojiMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Md5": md5, "TotalLen": total_length}
+        json_resp = await self._post("/SendEmojiMsg", json_param)
 
-            if json_resp.get("Success"):
-                logger.info("发送表情消息: 对方wxid:{} md5:{} 总长度:{}", wxid, md5, total_length)
-                return json_resp.get("Data").get("emojiItem")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            logger.info("发送表情消息: 对方wxid:{} md5:{} 总长度:{}", wxid, md5, total_length)
+            return json_resp.get("Data").get("emojiItem")
+        else:
+            self.error_handler(json_resp)
 
-    async def send_card_message(self, wxid: str, card_wxid: str, card_nickname: str, card_alias: str = "") -> tuple[
-        int, int, int]:
+    async def send_card_message(self, wxid: str, card_wxid: str, card_nickname: str, card_alias: str = "",
+                                lane: str = None) -> tuple[int, int, int]:
         """发送名片消息。
 
         Args:
@@ -440,6 +477,7 @@ class MessageMixin(WechatAPIClientBase):
             card_wxid (str): 名片用户的wxid
             card_nickname (str): 名片用户的昵称
             card_alias (str, optional): 名片用户的备注. Defaults to "".
+            lane (str, optional): 发送通道，interactive、normal或bulk，默认使用当前上下文的通道
 
         Returns:
             tuple[int, int, int]: 返回(ClientMsgid, CreateTime, NewMsgId)
@@ -449,7 +487,8 @@ class MessageMixin(WechatAPIClientBase):
             BanProtection: 登录新设备后4小时内操作
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_card_message, wxid, card_wxid, card_nickname, card_alias)
+        return await self._queue_message(self._send_card_message, wxid, card_wxid, card_nickname, card_alias,
+                                         lane=lane)
 
     async def _send_card_message(self, wxid: str, card_wxid: str, card_nickname: str, card_alias: str = "") -> tuple[
         int, int, int]:
@@ -458,30 +497,29 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "CardWxid": card_wxid, "CardAlias": card_alias,
-                          "CardNickname": card_nickname}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendCardMsg', json=json_param)
-            json_resp = await response.json()
-
-            if json_resp.get("Success"):
-                logger.info("发送名片消息: 对方wxid:{} 名片wxid:{} 名片备注:{} 名片昵称:{}", wxid,
-                            card_wxid,
-                            card_alias,
-                            card_nickname)
-                data = json_resp.get("Data")
-                return data.get("List")[0].get("ClientMsgid"), data.get("List")[0].get("Createtime"), data.get("List")[
-                    0].get("NewMsgId")
-            else:
-                self.error_handler(json_resp)
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "CardWxid": card_wxid, "CardAlias": card_alias,
+                      "CardNickname": card_nickname}
+        json_resp = await self._post("/SendCardMsg", json_param)
 
-    async def send_app_message(self, wxid: str, xml: str, type: int) -> tuple[str, int, int]:
+        if json_resp.get("Success"):
+            logger.info("发送名片消息: 对方wxid:{} 名片wxid:{} 名片备注:{} 名片昵称:{}", wxid,
+                        card_wxid,
+                        card_alias,
+                        card_nickname)
+            data = json_resp.get("Data")
+            return data.get("List")[0].get("ClientMsgid"), data.get("List")[0].get("Createtime"), data.get("List")[
+                0].get("NewMsgId")
+        else:
+            self.error_handler(json_resp)
+
+    async def send_app_message(self, wxid: str, xml: str, type: int, lane: str = None) -> tuple[str, int, int]:
         """发送应用消息。
 
         Args:
             wxid (str): 接收人wxid
             xml (str): 应用消息的xml内容
             type (int): 应用消息类型
+            lane (str, optional): 发送通道，interactive、normal或bulk，默认使用当前上下文的通道
 
         Returns:
             tuple[str, int, int]: 返回(ClientMsgid, CreateTime, NewMsgId)
@@ -491,7 +529,7 @@ class MessageMixin(WechatAPIClientBase):
             BanProtection: 登录新设备后4小时内操作
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_app_message, wxid, xml, type)
+        return await self._queue_message(self._send_app_message, wxid, xml, type, lane=lane)
 
     async def _send_app_message(self, wxid: str, xml: str, type: int) -> tuple[int, int, int]:
         if not self.wxid:
@@ -499,25 +537,24 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Xml": xml, "Type": type}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendAppMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Xml": xml, "Type": type}
+        json_resp = await self._post("/SendAppMsg", json_param)
 
-            if json_resp.get("Success"):
-                json_param["Xml"] = json_param["Xml"].replace("\n", "")
-                logger.info("发送app消息: 对方wxid:{} 类型:{} xml:{}", wxid, type, json_param["Xml"])
-                return json_resp.get("Data").get("clientMsgId"), json_resp.get("Data").get(
-                    "createTime"), json_resp.get("Data").get("newMsgId")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            json_param["Xml"] = json_param["Xml"].replace("\n", "")
+            logger.info("发送app消息: 对方wxid:{} 类型:{} xml:{}", wxid, type, json_param["Xml"])
+            return json_resp.get("Data").get("clientMsgId"), json_resp.get("Data").get(
+                "createTime"), json_resp.get("Data").get("newMsgId")
+        else:
+            self.error_handler(json_resp)
 
-    async def send_cdn_file_msg(self, wxid: str, xml: str) -> tuple[str, int, int]:
+    async def send_cdn_file_msg(self, wxid: str, xml: str, lane: str = None) -> tuple[str, int, int]:
         """转发文件消息。
 
         Args:
             wxid (str): 接收人wxid
             xml (str): 要转发的文件消息xml内容
+            lane (str, optional): 发送通道，interactive、normal或bulk，默认使用当前上下文的通道
 
         Returns:
             tuple[str, int, int]: 返回(ClientMsgid, CreateTime, NewMsgId)
@@ -527,7 +564,7 @@ class MessageMixin(WechatAPIClientBase):
             BanProtection: 登录新设备后4小时内操作
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_cdn_file_msg, wxid, xml)
+        return await self._queue_message(self._send_cdn_file_msg, wxid, xml, lane=lane)
 
     async def _send_cdn_file_msg(self, wxid: str, xml: str) -> tuple[int, int, int]:
         if not self.wxid:
@@ -535,24 +572,23 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendCDNFileMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
+        json_resp = await self._post("/SendCDNFileMsg", json_param)
 
-            if json_resp.get("Success"):
-                logger.info("转发文件消息: 对方wxid:{} xml:{}", wxid, xml)
-                data = json_resp.get("Data")
-                return data.get("clientMsgId"), data.get("createTime"), data.get("newMsgId")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            logger.info("转发文件消息: 对方wxid:{} xml:{}", wxid, xml)
+            data = json_resp.get("Data")
+            return data.get("clientMsgId"), data.get("createTime"), data.get("newMsgId")
+        else:
+            self.error_handler(json_resp)
 
-    async def send_cdn_img_msg(self, wxid: str, xml: str) -> tuple[str, int, int]:
+    async def send_cdn_img_msg(self, wxid: str, xml: str, lane: str = None) -> tuple[str, int, int]:
         """转发图片消息。
 
         Args:
             wxid (str): 接收人wxid
             xml (str): 要转发的图片消息xml内容
+            lane (str, optional): 发送通道，interactive、normal或bulk，默认使用当前上下文的通道
 
         Returns:
             tuple[str, int, int]: 返回(ClientImgId, CreateTime, NewMsgId)
@@ -562,7 +598,7 @@ class MessageMixin(WechatAPIClientBase):
             BanProtection: 登录新设备后4小时内操作
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_cdn_img_msg, wxid, xml)
+        return await self._queue_message(self._send_cdn_img_msg, wxid, xml, lane=lane)
 
     async def _send_cdn_img_msg(self, wxid: str, xml: str) -> tuple[int, int, int]:
         if not self.wxid:
@@ -570,24 +606,23 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendCDNImgMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
+        json_resp = await self._post("/SendCDNImgMsg", json_param)
 
-            if json_resp.get("Success"):
-                logger.info("转发图片消息: 对方wxid:{} xml:{}", wxid, xml)
-                data = json_resp.get("Data")
-                return data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            logger.info("转发图片消息: 对方wxid:{} xml:{}", wxid, xml)
+            data = json_resp.get("Data")
+            return data.get("ClientImgId").get("string"), data.get("CreateTime"), data.get("Newmsgid")
+        else:
+            self.error_handler(json_resp)
 
-    async def send_cdn_video_msg(self, wxid: str, xml: str) -> tuple[str, int]:
+    async def send_cdn_video_msg(self, wxid: str, xml: str, lane: str = None) -> tuple[str, int]:
         """转发视频消息。
 
         Args:
             wxid (str): 接收人wxid
             xml (str): 要转发的视频消息xml内容
+            lane (str, optional): 发送通道，interactive、normal或bulk，默认使用当前上下文的通道
 
         Returns:
             tuple[str, int]: 返回(ClientMsgid, NewMsgId)
@@ -597,7 +632,7 @@ class MessageMixin(WechatAPIClientBase):
             BanProtection: 登录新设备后4小时内操作
             根据error_handler处理错误
         """
-        return await self._queue_message(self._send_cdn_video_msg, wxid, xml)
+        return await self._queue_message(self._send_cdn_video_msg, wxid, xml, lane=lane)
 
     async def _send_cdn_video_msg(self, wxid: str, xml: str) -> tuple[int, int]:
         if not self.wxid:
@@ -605,17 +640,15 @@ class MessageMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
-            response = await session.post(f'http://{self.ip}:{self.port}/SendCDNVideoMsg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "ToWxid": wxid, "Content": xml}
+        json_resp = await self._post("/SendCDNVideoMsg", json_param)
 
-            if json_resp.get("Success"):
-                logger.info("转发视频消息: 对方wxid:{} xml:{}", wxid, xml)
-                data = json_resp.get("Data")
-                return data.get("clientMsgId"), data.get("newMsgId")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            logger.info("转发视频消息: 对方wxid:{} xml:{}", wxid, xml)
+            data = json_resp.get("Data")
+            return data.get("clientMsgId"), data.get("newMsgId")
+        else:
+            self.error_handler(json_resp)
 
     async def sync_message(self) -> dict:
         """同步消息。
@@ -630,12 +663,10 @@ class MessageMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-            json_param = {"Wxid": self.wxid, "Scene": 0, "Synckey": ""}
-            response = await session.post(f'http://{self.ip}:{self.port}/Sync', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "Scene": 0, "Synckey": ""}
+        json_resp = await self._post("/Sync", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data")
+        else:
+            self.error_handler(json_resp)
@@ -0,0 +1,380 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Callable, Dict, Hashable, Optional
+
+# 发送通道，数值越小越优先
+LANE_INTERACTIVE = "interactive"  # 回复用户的消息
+LANE_NORMAL = "normal"  # 默认
+LANE_BULK = "bulk"  # 定时群发等批量消息
+LANES = {LANE_INTERACTIVE: 0, LANE_NORMAL: 1, LANE_BULK: 2}
+
+# 未指定通道时使用的通道，处理消息事件时为interactive
+current_lane: ContextVar[str] = ContextVar("wechatapi_send_lane", default=LANE_NORMAL)
+
+
+@contextmanager
+def send_lane(lane: str):
+    """在with块内，未指定通道的发送都使用此通道"""
+    token = current_lane.set(lane)
+    try:
+        yield
+    finally:
+        current_lane.reset(token)
+
+
+def lane_rank(lane: Optional[str]) -> int:
+    """通道名转换为优先级，未指定时使用当前上下文的通道"""
+    if lane is None:
+        lane = current_lane.get()
+    try:
+        return LANES[lane]
+    except KeyError:
+        raise ValueError(f"未知的发送通道: {lane}，可选: {', '.join(LANES)}") from None
+
+
+def effective_rank(rank: int, enqueue_time: float, now: float, aging: float) -> float:
+    """等待越久优先级越高，每等待aging秒提升一级，防止低优先级消息饿死"""
+    if aging <= 0:
+        return rank
+    return rank - (now - enqueue_time) / aging
+
+
+class TokenBucket:
+    """令牌桶限速
+
+    Args:
+        rate (float): 每秒生成的令牌数，小于等于0时不限速
+        burst (int): 令牌桶容量，即允许的突发数量
+    """
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+
+    def wait_time(self) -> float:
+        """距离下一个令牌可用还需等待的秒数"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    async def acquire(self):
+        """等待并取走一个令牌"""
+        while (delay := self.wait_time()) > 0:
+            await asyncio.sleep(delay)
+        if self.rate > 0:
+            self.tokens -= 1
+
+
+class LaneQueue:
+    """按通道优先级出队的队列，同一通道内先进先出
+
+    Args:
+        aging (float): 每等待多少秒提升一级优先级
+    """
+
+    def __init__(self, aging: float):
+        self.aging = aging
+        self._lanes = [deque() for _ in LANES]
+        self._not_empty = asyncio.Event()
+
+    def qsize(self) -> int:
+        return sum(len(lane) for lane in self._lanes)
+
+    def empty(self) -> bool:
+        return not any(self._lanes)
+
+    def put_nowait(self, rank: int, item: tuple):
+        """item的第一个元素必须是入队时间"""
+        self._lanes[rank].append(item)
+        self._not_empty.set()
+
+    def peek(self, rank: int) -> Optional[tuple]:
+        """查看某个通道的第一个元素"""
+        lane = self._lanes[rank]
+        return lane[0] if lane else None
+
+    def get_nowait(self, rank: Optional[int] = None) -> tuple:
+        """出队，rank为None时取优先级最高的通道"""
+        if rank is not None:
+            item = self._lanes[rank].popleft()
+            if self.empty():
+                self._not_empty.clear()
+            return item
+
+        now = time.monotonic()
+        rank = min((rank for rank, lane in enumerate(self._lanes) if lane),
+                   key=lambda r: effective_rank(r, self._lanes[r][0][0], now, self.aging))
+        item = self._lanes[rank].popleft()
+        if self.empty():
+            self._not_empty.clear()
+        return item
+
+    async def wait(self):
+        """等待队列非空"""
+        while self.empty():
+            await self._not_empty.wait()
+
+
+class PriorityGate:
+    """全局令牌桶的优先级闸门
+
+    令牌不足时，等待者按通道优先级（含等待时间提升）领取令牌，同一优先级先到先得。
+    """
+
+    def __init__(self, bucket: TokenBucket, aging: float):
+        self.bucket = bucket
+        self.aging = aging
+        self._waiters: list[tuple[int, float, int, asyncio.Future]] = []
+        self._seq = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def acquire(self, rank: int, enqueue_time: float):
+        if not self._waiters and self.bucket.wait_time() <= 0:
+            await self.bucket.acquire()
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        self._seq += 1
+        self._waiters.append((rank, enqueue_time, self._seq, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._grant())
+        await future
+
+    async def _grant(self):
+        while self._waiters:
+            delay = self.bucket.wait_time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            now = time.monotonic()
+            waiter = min(self._waiters,
+                         key=lambda w: (effective_rank(w[0], w[1], now, self.aging), w[2]))
+            self._waiters.remove(waiter)
+            future = waiter[3]
+            if future.done():  # 等待者已取消
+                continue
+            await self.bucket.acquire()
+            future.set_result(None)
+
+
+class RecipientStats:
+    """单个接收人的发送统计"""
+
+    __slots__ = ("sent", "last_wait", "avg_wait", "max_wait")
+
+    def __init__(self):
+        self.sent = 0
+        self.last_wait = 0.0
+        self.avg_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float):
+        self.sent += 1
+        self.last_wait = wait
+        # 指数移动平均，近期的等待时间权重更高
+        self.avg_wait = wait if self.sent == 1 else self.avg_wait * 0.8 + wait * 0.2
+        self.max_wait = max(self.max_wait, wait)
+
+
+class SendScheduler:
+    """消息发送调度器
+
+    每个接收人一个发送队列，不同接收人之间并发发送。
+    每条消息发送前需要同时取得接收人的令牌和全局的令牌，从而在账号安全的频率内尽快发送。
+
+    消息分为interactive、normal、bulk三个通道，队列和全局令牌都优先分给interactive，
+    等待时间越长优先级越高，保证bulk消息不会一直发不出去。同一接收人同一通道内按顺序发送。
+    接收人的队列空闲一段时间后自动回收，其发送统计随之删除。
+
+    开启合并后，同一接收人同一通道内相邻且合并键相同的文本消息会用换行拼接成一条发送，
+    发送结果返回给每个被合并的调用方。
+
+    Args:
+        rate (float): 全局每秒发送数量
+        burst (int): 全局突发数量
+        chat_rate (float): 单个接收人每秒发送数量
+        chat_burst (int): 单个接收人突发数量
+        aging (float): 每等待多少秒提升一级优先级，0为不提升
+        coalesce_window (float): 合并等待时间（秒），0为不合并
+        coalesce_max_length (int): 合并后文本的最大长度
+        idle_timeout (float): 接收人队列空闲回收时间（秒）
+    """
+
+    def __init__(self, rate: float = 1.0, burst: int = 1, chat_rate: float = 1.0, chat_burst: int = 3,
+                 aging: float = 10, coalesce_window: float = 0, coalesce_max_length: int = 2000,
+                 idle_timeout: float = 60):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.aging = aging
+        self.coalesce_window = coalesce_window
+        self.coalesce_max_length = coalesce_max_length
+        self.idle_timeout = idle_timeout
+
+        self._gate = PriorityGate(TokenBucket(rate, burst), aging)
+        self._queues: Dict[str, LaneQueue] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+        self._stats: Dict[str, RecipientStats] = {}
+
+    def configure(self, rate: Optional[float] = None, burst: Optional[int] = None, chat_rate: Optional[float] = None,
+                  chat_burst: Optional[int] = None, aging: Optional[float] = None,
+                  coalesce_window: Optional[float] = None, coalesce_max_length: Optional[int] = None):
+        """修改发送频率，接收人的新设置在其队列重新创建后生效"""
+        if rate is not None or burst is not None:
+            bucket = self._gate.bucket
+            self._gate.bucket = TokenBucket(bucket.rate if rate is None else rate,
+                                            bucket.burst if burst is None else burst)
+        if chat_rate is not None:
+            self.chat_rate = chat_rate
+        if chat_burst is not None:
+            self.chat_burst = chat_burst
+        if aging is not None:
+            self.aging = self._gate.aging = aging
+        if coalesce_window is not None:
+            self.coalesce_window = coalesce_window
+        if coalesce_max_length is not None:
+            self.coalesce_max_length = coalesce_max_length
+
+    @property
+    def queue_depth(self) -> int:
+        """所有接收人待发送的消息总数"""
+        return sum(queue.qsize() for queue in self._queues.values())
+
+    def stats(self) -> Dict[str, dict]:
+        """各接收人的待发送数量和等待时间（秒），只包括队列尚未回收的接收人"""
+        result = {}
+        for wxid, stats in self._stats.items():
+            queue = self._queues.get(wxid)
+            result[wxid] = {
+                "depth": queue.qsize() if queue is not None else 0,
+                "sent": stats.sent,
+                "last_wait": stats.last_wait,
+                "avg_wait": stats.avg_wait,
+                "max_wait": stats.max_wait,
+            }
+        return result
+
+    async def submit(self, wxid: str, func: Callable[..., Awaitable], *args, lane: Optional[str] = None,
+                     coalesce: Optional[Hashable] = None, **kwargs):
+        """把一次发送加入接收人的队列，等待发送完成并返回结果
+
+        Args:
+            wxid: 接收人
+            func: 实际发送的协程函数
+            lane: 发送通道，interactive、normal或bulk，默认使用当前上下文的通道
+            coalesce: 合并键，None为不合并。合并时把args的第二个参数（文本）用换行拼接
+        """
+        rank = lane_rank(lane)
+        future = asyncio.get_running_loop().create_future()
+
+        queue = self._queues.get(wxid)
+        if queue is None:
+            queue = self._queues[wxid] = LaneQueue(self.aging)
+            self._stats.setdefault(wxid, RecipientStats())
+            self._workers[wxid] = asyncio.create_task(self._worker(wxid, queue), name=f"send-{wxid}")
+
+        if not self.coalesce_window:
+            coalesce = None
+        queue.put_nowait(rank, (time.monotonic(), rank, func, args, kwargs, future, coalesce))
+        return await future
+
+    async def stop(self):
+        """停止所有发送队列，未发送的消息会被取消"""
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        for queue in self._queues.values():
+            while not queue.empty():
+                queue.get_nowait()[5].cancel()
+        self._queues.clear()
+        self._workers.clear()
+
+    async def _coalesce(self, queue: LaneQueue, rank: int, enqueue_time: float, func: Callable, args: tuple,
+                        future: asyncio.Future, coalesce: Hashable) -> tuple[tuple, list]:
+        """等待合并窗口结束，把同一通道内紧随其后的可合并消息拼接到一起
+
+        Returns:
+            tuple: (合并后的args, 所有被合并消息的future)
+        """
+        delay = enqueue_time + self.coalesce_window - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        texts = [args[1]]
+        length = len(args[1])
+        futures = [future]
+        while (item := queue.peek(rank)) is not None:
+            _, _, next_func, next_args, _, next_future, next_coalesce = item
+            if next_future.done():  # 已取消的直接丢弃
+                queue.get_nowait(rank)
+                continue
+            if next_func != func or next_coalesce != coalesce:
+                break
+            length += 1 + len(next_args[1])
+            if length > self.coalesce_max_length:
+                break
+            queue.get_nowait(rank)
+            texts.append(next_args[1])
+            futures.append(next_future)
+
+        if len(texts) > 1:
+            args = (args[0], "\n".join(texts), *args[2:])
+        return args, futures
+
+    async def _worker(self, wxid: str, queue: LaneQueue):
+        bucket = TokenBucket(self.chat_rate, self.chat_burst)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(queue.wait(), timeout=self.idle_timeout)
+                except asyncio.TimeoutError:
+                    if queue.empty():
+                        return
+                    continue
+
+                # 取得令牌后再出队，等待期间新到的高优先级消息可以插队
+                await bucket.acquire()
+                enqueue_time, rank, func, args, kwargs, future, coalesce = queue.get_nowait()
+                if future.done():  # 调用方已取消
+                    continue
+
+                futures = [future]
+                try:
+                    if coalesce is not None:
+                        args, futures = await self._coalesce(queue, rank, enqueue_time, func, args, future, coalesce)
+
+                    await self._gate.acquire(rank, enqueue_time)
+
+                    self._stats[wxid].record(time.monotonic() - enqueue_time)
+                    result = await func(*args, **kwargs)
+                except asyncio.CancelledError:
+                    for future in futures:
+                        future.cancel()
+                    raise
+                except Exception as e:
+                    for future in futures:
+                        if not future.done():
+                            future.set_exception(e)
+                else:
+                    for future in futures:
+                        if not future.done():
+                            future.set_result(result)
+        finally:
+            if self._queues.get(wxid) is queue:
+                del self._queues[wxid]
+                del self._workers[wxid]
+                # 统计随队列一起回收，否则群发过的每个接收人都会一直占用内存
+                self._stats.pop(wxid, None)
@@ -1,17 +1,29 @@
 import base64
-import io
 import os
 
-import aiohttp
-import pysilk
-from pydub import AudioSegment
-
+from .audio_service import audio_service, convert_audio
 from .base import *
 from .protect import protector
 from ..errors import *
 
 
 class ToolMixin(WechatAPIClientBase):
+    @staticmethod
+    def configure_audio(workers: int = None, max_pending: int = None, cache_size: int = None):
+        """设置音频转码服务
+
+        Args:
+            workers (int, optional): 转码进程数，0为使用线程
+            max_pending (int, optional): 最多同时提交的转码任务数，超出时排队等待
+            cache_size (int, optional): 最多缓存的转换结果数量，0为不缓存
+        """
+        audio_service.configure(workers, max_pending, cache_size)
+
+    async def close(self):
+        """关闭音频转码进程池"""
+        audio_service.shutdown()
+        await super().close()
+
     async def download_image(self, aeskey: str, cdnmidimgurl: str) -> str:
         """CDN下载高清图片。
 
@@ -29,15 +41,13 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "AesKey": aeskey, "Cdnmidimgurl": cdnmidimgurl}
-            response = await session.post(f'http://{self.ip}:{self.port}/CdnDownloadImg', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "AesKey": aeskey, "Cdnmidimgurl": cdnmidimgurl}
+        json_resp = await self._post("/CdnDownloadImg", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data")
+        else:
+            self.error_handler(json_resp)
 
     async def download_voice(self, msg_id: str, voiceurl: str, length: int) -> str:
         """下载语音文件。
@@ -57,15 +67,13 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "MsgId": msg_id, "Voiceurl": voiceurl, "Length": length}
-            response = await session.post(f'http://{self.ip}:{self.port}/DownloadVoice', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "MsgId": msg_id, "Voiceurl": voiceurl, "Length": length}
+        json_resp = await self._post("/DownloadVoice", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("data").get("buffer")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("data").get("buffer")
+        else:
+            self.error_handler(json_resp)
 
     async def download_attach(self, attach_id: str) -> dict:
         """下载附件。
@@ -83,15 +91,13 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "AttachId": attach_id}
-            response = await session.post(f'http://{self.ip}:{self.port}/DownloadAttach', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "AttachId": attach_id}
+        json_resp = await self._post("/DownloadAttach", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("data").get("buffer")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("data").get("buffer")
+        else:
+            self.error_handler(json_resp)
 
     async def download_video(self, msg_id) -> str:
         """下载视频。
@@ -109,15 +115,13 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "MsgId": msg_id}
-            response = await session.post(f'http://{self.ip}:{self.port}/DownloadVideo', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "MsgId": msg_id}
+        json_resp = await self._post("/DownloadVideo", json_param)
 
-            if json_resp.get("Success"):
-                return json_resp.get("Data").get("data").get("buffer")
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return json_resp.get("Data").get("data").get("buffer")
+        else:
+            self.error_handler(json_resp)
 
     async def set_step(self, count: int) -> bool:
         """设置步数。
@@ -138,15 +142,13 @@ class ToolMixin(WechatAPIClientBase):
         elif not self.ignore_protect and protector.check(14400):
             raise BanProtection("风控保护: 新设备登录后4小时内请挂机")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid, "StepCount": count}
-            response = await session.post(f'http://{self.ip}:{self.port}/SetStep', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid, "StepCount": count}
+        json_resp = await self._post("/SetStep", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def set_proxy(self, proxy: Proxy) -> bool:
         """设置代理。
@@ -164,18 +166,16 @@ class ToolMixin(WechatAPIClientBase):
         if not self.wxid:
             raise UserLoggedOut("请先登录")
 
-        async with aiohttp.ClientSession() as session:
-            json_param = {"Wxid": self.wxid,
-                          "Proxy": {"ProxyIp": f"{proxy.ip}:{proxy.port}",
-                                    "ProxyUser": proxy.username,
-                                    "ProxyPassword": proxy.password}}
-            response = await session.post(f'http://{self.ip}:{self.port}/SetProxy', json=json_param)
-            json_resp = await response.json()
+        json_param = {"Wxid": self.wxid,
+                      "Proxy": {"ProxyIp": f"{proxy.ip}:{proxy.port}",
+                                "ProxyUser": proxy.username,
+                                "ProxyPassword": proxy.password}}
+        json_resp = await self._post("/SetProxy", json_param)
 
-            if json_resp.get("Success"):
-                return True
-            else:
-                self.error_handler(json_resp)
+        if json_resp.get("Success"):
+            return True
+        else:
+            self.error_handler(json_resp)
 
     async def check_database(self) -> bool:
         """检查数据库状态。
@@ -183,14 +183,12 @@ class ToolMixin(WechatAPIClientBase):
         Returns:
             bool: 数据库正常返回True，否则返回False
         """
-        async with aiohttp.ClientSession() as session:
-            response = await session.get(f'http://{self.ip}:{self.port}/CheckDatabaseOK')
-            json_resp = await response.json()
+        json_resp = await self._get("/CheckDatabaseOK")
 
-            if json_resp.get("Running"):
-                return True
-            else:
-                return False
+        if json_resp.get("Running"):
+            return True
+        else:
+            return False
 
     @staticmethod
     def base64_to_file(base64_str: str, file_name: str, file_path: str) -> bool:
@@ -274,12 +272,14 @@ class ToolMixin(WechatAPIClientBase):
         Returns:
             bytes: wav格式的字节数据
         """
-        return await pysilk.async_decode(silk_byte, to_wav=True)
+        return (await audio_service.convert(silk_byte, "silk", "wav"))[0]
 
     @staticmethod
     def wav_byte_to_amr_byte(wav_byte: bytes) -> bytes:
         """将WAV字节数据转换为AMR格式。
 
+        同步执行，会阻塞事件循环，在协程中请使用wav_byte_to_amr_byte_async。
+
         Args:
             wav_byte (bytes): WAV格式的字节数据
 
@@ -290,27 +290,45 @@ class ToolMixin(WechatAPIClientBase):
             Exception: 转换失败时抛出异常
         """
         try:
-            # 从字节数据创建 AudioSegment 对象
-            audio = AudioSegment.from_wav(io.BytesIO(wav_byte))
+            return convert_audio(wav_byte, "wav", "amr")[0]
+        except Exception as e:
+            raise Exception(f"转换WAV到AMR失败: {str(e)}")
+
+    @staticmethod
+    def wav_byte_to_amr_base64(wav_byte: bytes) -> str:
+        """将WAV字节数据转换为AMR格式的base64字符串。
+
+        同步执行，会阻塞事件循环，在协程中请使用wav_byte_to_amr_base64_async。
 
-            # 设置 AMR 编码的标准参数
-            audio = audio.set_frame_rate(8000).set_channels(1)
+        Args:
+            wav_byte (bytes): WAV格式的字节数据
 
-            # 创建一个字节缓冲区来存储 AMR 数据
-            output = io.BytesIO()
+        Returns:
+            str: AMR格式的base64编码字符串
+        """
+        return base64.b64encode(ToolMixin.wav_byte_to_amr_byte(wav_byte)).decode()
 
-            # 导出为 AMR 格式
-            audio.export(output, format="amr")
+    @staticmethod
+    async def wav_byte_to_amr_byte_async(wav_byte: bytes) -> bytes:
+        """将WAV字节数据转换为AMR格式，在音频转码服务中执行，不阻塞事件循环。
 
-            # 获取字节数据
-            return output.getvalue()
+        Args:
+            wav_byte (bytes): WAV格式的字节数据
 
+        Returns:
+            bytes: AMR格式的字节数据
+
+        Raises:
+            Exception: 转换失败时抛出异常
+        """
+        try:
+            return (await audio_service.convert(wav_byte, "wav", "amr"))[0]
         except Exception as e:
             raise Exception(f"转换WAV到AMR失败: {str(e)}")
 
     @staticmethod
-    def wav_byte_to_amr_base64(wav_byte: bytes) -> str:
-        """将WAV字节数据转换为AMR格式的base64字符串。
+    async def wav_byte_to_amr_base64_async(wav_byte: bytes) -> str:
+        """将WAV字节数据转换为AMR格式的base64字符串，不阻塞事件循环。
 
         Args:
             wav_byte (bytes): WAV格式的字节数据
@@ -318,11 +336,11 @@ class ToolMixin(WechatAPIClientBase):
         Returns:
             str: AMR格式的base64编码字符串
         """
-        return base64.b64encode(ToolMixin.wav_byte_to_amr_byte(wav_byte)).decode()
+        return base64.b64encode(await ToolMixin.wav_byte_to_amr_byte_async(wav_byte)).decode()
 
     @staticmethod
     async def wav_byte_to_silk_byte(wav_byte: bytes) -> bytes:
-        """将WAV字节数据转换为silk格式。
+        """将WAV字节数据转换为silk格式，在转码进程中执行。
 
         Args:
             wav_byte (bytes): WAV格式的字节数据
@@ -330,10 +348,7 @@ class ToolMixin(WechatAPIClientBase):
         Returns:
             bytes: silk格式的字节数据
         """
-        # get pcm data
-        audio = AudioSegment.from_wav(io.BytesIO(wav_byte))
-        pcm = audio.raw_data
-        return await pysilk.async_encode(pcm, data_rate=audio.frame_rate, sample_rate=audio.frame_rate)
+        return (await audio_service.convert(wav_byte, "wav", "silk"))[0]
 
     @staticmethod
     async def wav_byte_to_silk_base64(wav_byte: bytes) -> str:
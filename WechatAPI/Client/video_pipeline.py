@@ -0,0 +1,207 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from dataclasses import astuple, dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+from loguru import logger
+from pymediainfo import MediaInfo
+
+
+@dataclass
+class VideoOptions:
+    """发送视频前的转码设置
+
+    Args:
+        enabled (bool): 是否转码，关闭时只自动生成封面，默认关闭
+        max_dimension (int): 最长边的最大像素，0为不限制
+        video_bitrate (int): 视频码率（kbps），原视频码率更高时转码
+        audio_bitrate (int): 音频码率（kbps）
+        preset (str): x264的preset，越快压缩率越低
+    """
+    enabled: bool = False
+    max_dimension: int = 720
+    video_bitrate: int = 1000
+    audio_bitrate: int = 64
+    preset: str = "veryfast"
+
+
+@dataclass
+class PreparedVideo:
+    """处理好的视频，可以直接上传"""
+    video: bytes
+    cover: Optional[bytes]
+    duration: int  # 毫秒
+
+
+def probe_video(data: bytes) -> tuple[int, int, int, int]:
+    """读取视频信息，同步函数
+
+    Returns:
+        tuple: (时长毫秒, 宽, 高, 总码率bps)，无法读取的字段为0
+    """
+    media_info = MediaInfo.parse(BytesIO(data))
+    duration, width, height, bitrate = 0, 0, 0, 0
+    for track in media_info.tracks:
+        if track.track_type == "General":
+            duration = int(float(track.duration or 0))
+            bitrate = int(track.overall_bit_rate or 0)
+        elif track.track_type == "Video" and not width:
+            width, height = int(track.width or 0), int(track.height or 0)
+    if not duration and media_info.tracks:
+        duration = int(float(media_info.tracks[0].duration or 0))
+    return duration, width, height, bitrate
+
+
+class VideoPipeline:
+    """视频发送前的处理
+
+    在线程中用MediaInfo读取视频信息，用ffmpeg子进程把视频转码到设置的码率和分辨率，并截取一帧作为封面。
+    同时运行的ffmpeg进程数量有限制，避免占满CPU。处理结果按原视频内容的哈希缓存，重复发送时无需再次转码。
+    找不到ffmpeg时发送原视频，使用默认封面。
+
+    Args:
+        options (VideoOptions): 转码设置
+        concurrency (int): 最多同时运行的ffmpeg进程数
+        cache_size (int): 最多缓存的处理结果数量
+    """
+
+    def __init__(self, options: VideoOptions = None, concurrency: int = 2, cache_size: int = 16):
+        self.options = options or VideoOptions()
+        self.concurrency = concurrency
+        self.cache_size = cache_size
+
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._cache: OrderedDict[str, PreparedVideo] = OrderedDict()
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._ffmpeg: Optional[str] = None
+        self._ffmpeg_checked = False
+
+    def configure(self, options: VideoOptions = None, concurrency: int = None, cache_size: int = None):
+        """修改转码设置、并发数和缓存容量"""
+        if options is not None:
+            self.options = options
+        if concurrency is not None:
+            self.concurrency = concurrency
+            self._semaphore = None
+        if cache_size is not None:
+            self.cache_size = cache_size
+            while len(self._cache) > max(self.cache_size, 0):
+                self._cache.popitem(last=False)
+
+    @property
+    def ffmpeg(self) -> Optional[str]:
+        """ffmpeg路径，优先使用IMAGEIO_FFMPEG_EXE环境变量"""
+        if not self._ffmpeg_checked:
+            self._ffmpeg_checked = True
+            path = os.environ.get("IMAGEIO_FFMPEG_EXE")
+            self._ffmpeg = path if path and os.path.exists(path) else shutil.which("ffmpeg")
+            if not self._ffmpeg:
+                logger.warning("找不到ffmpeg，发送视频时不会转码和生成封面")
+        return self._ffmpeg
+
+    async def prepare(self, data: bytes) -> PreparedVideo:
+        """处理视频，相同内容和设置只处理一次"""
+        key = hashlib.sha256(data).hexdigest() + repr(astuple(self.options))
+        while True:
+            prepared = self._cache.get(key)
+            if prepared is not None:
+                self._cache.move_to_end(key)
+                return prepared
+
+            future = self._inflight.get(key)
+            if future is None:
+                break
+            prepared = await asyncio.shield(future)
+            if prepared is not None:
+                return prepared
+            # 负责处理的调用方被取消，重新检查后自己处理
+
+        future = self._inflight[key] = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        try:
+            prepared = await self._prepare(data)
+            self._cache[key] = prepared
+            while len(self._cache) > max(self.cache_size, 0):
+                self._cache.popitem(last=False)
+            future.set_result(prepared)
+            return prepared
+        except asyncio.CancelledError:
+            # 不取消等待者，让它们自己处理
+            future.set_result(None)
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def _prepare(self, data: bytes) -> PreparedVideo:
+        duration, width, height, bitrate = await asyncio.to_thread(probe_video, data)
+        if self.ffmpeg is None:
+            return PreparedVideo(data, None, duration)
+
+        with tempfile.TemporaryDirectory(prefix="xybot_video_") as tmp:
+            source = Path(tmp, "source")
+            await asyncio.to_thread(source.write_bytes, data)
+            video, video_path = data, source
+
+            options = self.options
+            target_bitrate = (options.video_bitrate + options.audio_bitrate) * 1000
+            too_large = options.max_dimension and max(width, height) > options.max_dimension
+            # 码率留出20%余量，避免对已经压缩过的视频重复转码
+            if options.enabled and (too_large or bitrate > target_bitrate * 1.2):
+                output = Path(tmp, "output.mp4")
+                if await self._transcode(source, output, too_large):
+                    transcoded = await asyncio.to_thread(output.read_bytes)
+                    if transcoded and len(transcoded) < len(data):
+                        logger.debug("视频转码完成: {}KB -> {}KB", len(data) // 1024, len(transcoded) // 1024)
+                        video, video_path = transcoded, output
+
+            cover_path = Path(tmp, "cover.jpg")
+            cover = None
+            if await self._extract_cover(video_path, cover_path, duration):
+                cover = await asyncio.to_thread(cover_path.read_bytes) or None
+
+        return PreparedVideo(video, cover, duration)
+
+    async def _run(self, *args: str) -> bool:
+        """运行ffmpeg，返回是否成功"""
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(max(self.concurrency, 1))
+        async with self._semaphore:
+            process = await asyncio.create_subprocess_exec(self.ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+                                                           *args, stdout=asyncio.subprocess.DEVNULL,
+                                                           stderr=asyncio.subprocess.PIPE)
+            try:
+                _, stderr = await process.communicate()
+            except asyncio.CancelledError:
+                process.kill()
+                await process.wait()
+                raise
+        if process.returncode != 0:
+            logger.warning("ffmpeg执行失败: {}", stderr.decode(errors="ignore").strip()[-500:])
+            return False
+        return True
+
+    async def _transcode(self, source: Path, output: Path, scale: bool) -> bool:
+        options = self.options
+        args = ["-i", str(source), "-c:v", "libx264", "-preset", options.preset, "-pix_fmt", "yuv420p",
+                "-b:v", f"{options.video_bitrate}k", "-maxrate", f"{options.video_bitrate * 3 // 2}k",
+                "-bufsize", f"{options.video_bitrate * 2}k",
+                "-c:a", "aac", "-b:a", f"{options.audio_bitrate}k", "-movflags", "+faststart"]
+        if scale:
+            size = options.max_dimension
+            args += ["-vf", f"scale={size}:{size}:force_original_aspect_ratio=decrease:force_divisible_by=2"]
+        return await self._run(*args, str(output))
+
+    async def _extract_cover(self, source: Path, output: Path, duration: int) -> bool:
+        # 第一帧经常是黑屏，取第1秒或视频中间的一帧
+        position = min(1.0, duration / 2000) if duration else 0
+        return await self._run("-ss", f"{position:.2f}", "-i", str(source), "-frames:v", "1", "-q:v", "3",
+                               str(output))
@@ -0,0 +1,66 @@
+"""联系人缓存的合并查询测试
+
+模拟耗时的/GetContractDetail，检查ContactCache的批量合并：
+先确认请求进行中到达的未命中也能得到结果（不会一直等待），
+再统计并发查询N个不同联系人时实际发出的请求数和耗时。
+
+用法: python benchmarks/contact_cache.py [--delay 秒] [--lookups 50 200]
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from WechatAPI.Client.contact_cache import ContactCache  # noqa: E402
+
+
+def fake_fetch(delay: float):
+    async def fetch(wxids: list) -> list:
+        await asyncio.sleep(delay)
+        return [{"UserName": {"string": wxid}, "NickName": {"string": f"昵称{wxid}"}} for wxid in wxids]
+
+    return fetch
+
+
+async def check_overlapping_misses(delay: float):
+    """第二个未命中在第一个请求进行中到达，两者都必须得到结果"""
+    cache = ContactCache(fake_fetch(delay))
+    first = asyncio.create_task(cache.get("wxid_a"))
+    await asyncio.sleep(delay / 4)
+    second = asyncio.create_task(cache.get("wxid_b"))
+    try:
+        a, b = await asyncio.wait_for(asyncio.gather(first, second), timeout=delay * 10)
+    except asyncio.TimeoutError:
+        raise SystemExit(f"请求进行中到达的未命中没有得到结果，未处理: {cache._pending}")
+    if a["UserName"]["string"] != "wxid_a" or b["UserName"]["string"] != "wxid_b":
+        raise SystemExit("联系人与wxid不对应")
+    print(f"重叠的未命中: 正常，共{cache.requests}次请求")
+
+
+async def measure(count: int, delay: float) -> tuple[int, float]:
+    cache = ContactCache(fake_fetch(delay))
+    start = time.perf_counter()
+    await asyncio.gather(*(cache.get(f"wxid_{i}") for i in range(count)))
+    return cache.requests, time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--delay", type=float, default=0.2, help="模拟的单次请求耗时（秒）")
+    parser.add_argument("--lookups", type=int, nargs="+", default=[1, 20, 50, 200], help="并发查询的联系人数")
+    args = parser.parse_args()
+
+    await check_overlapping_misses(args.delay)
+
+    print(f"{'联系人数':<10}{'请求数':>8}{'耗时(ms)':>12}")
+    for count in args.lookups:
+        requests, elapsed = await measure(count, args.delay)
+        print(f"{count:<10}{requests:>8}{elapsed * 1e3:>12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
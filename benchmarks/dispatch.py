@@ -0,0 +1,90 @@
+"""事件分发的性能测试
+
+用EventManager.emit分发文本消息和图片消息（Content为约1MB的base64），
+统计处理函数数量为1、5、20时每条消息的分发耗时。
+“只读消息”为现在的分发方式，所有处理函数共享同一个只读消息；
+“逐个深拷贝”分发普通dict，每个处理函数各深拷贝一次，与以前的分发方式相同。
+
+用法: python benchmarks/dispatch.py [-n 次数] [--handlers 1 5 20]
+"""
+import argparse
+import asyncio
+import base64
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from loguru import logger  # noqa: E402
+
+from utils.decorators import on_image_message, on_text_message  # noqa: E402
+from utils.event_manager import EventManager  # noqa: E402
+from utils.message import build_message  # noqa: E402
+
+
+class BenchPlugin:
+    """只读取消息的处理函数，模拟大部分插件"""
+
+    @on_text_message
+    async def handle_text(self, bot, message):
+        return message["Content"]
+
+    @on_image_message
+    async def handle_image(self, bot, message):
+        return message["Content"]
+
+
+def sample_messages() -> dict:
+    base = {
+        "MsgId": 1234567890, "NewMsgId": 9876543210123456789, "MsgSeq": 812345678,
+        "FromWxid": "12345678901@chatroom", "ToWxid": "wxid_bot0000000001", "SenderWxid": "wxid_sender000000001",
+        "IsGroup": True, "Status": 3, "ImgStatus": 1, "CreateTime": 1735660800,
+        "MsgSource": "<msgsource><sequence_id>812345678</sequence_id><membercount>128</membercount></msgsource>",
+        "PushContent": "小明 : 签到",
+    }
+    return {
+        "text_message": dict(base, MsgType=1, Content="签到", Ats=[]),
+        "image_message": dict(base, MsgType=3, Content=base64.b64encode(os.urandom(768 * 1024)).decode(),
+                              ImgBuf={"iLen": 0}),
+    }
+
+
+async def measure(event_type: str, data: dict, number: int, frozen: bool) -> float:
+    """每条消息的平均分发耗时（秒），每次分发都新建消息，与实际处理流程相同"""
+    start = time.perf_counter()
+    for _ in range(number):
+        message = build_message(event_type, data) if frozen else dict(data)
+        await EventManager.emit(event_type, None, message)
+    return (time.perf_counter() - start) / number
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--number", type=int, default=200, help="每种情况分发的消息数")
+    parser.add_argument("--handlers", type=int, nargs="+", default=[1, 5, 20], help="处理函数数量")
+    args = parser.parse_args()
+
+    logger.remove()  # 处理函数的日志不计入耗时
+    messages = sample_messages()
+
+    print(f"{'事件':<16}{'处理函数':>8}{'只读消息(µs/条)':>18}{'逐个深拷贝(µs/条)':>20}")
+    for count in args.handlers:
+        plugins = [BenchPlugin() for _ in range(count)]
+        for plugin in plugins:
+            EventManager.bind_instance(plugin)
+        try:
+            for event_type, data in messages.items():
+                number = args.number if event_type == "text_message" else max(args.number // 20, 5)
+                shared = await measure(event_type, data, number, frozen=True)
+                copied = await measure(event_type, data, number, frozen=False)
+                print(f"{event_type:<16}{count:>8}{shared * 1e6:>18.1f}{copied * 1e6:>20.1f}")
+        finally:
+            for plugin in plugins:
+                EventManager.unbind_instance(plugin)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
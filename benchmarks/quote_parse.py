@@ -0,0 +1,117 @@
+"""引用消息解析的性能测试
+
+对比逐个find()的旧写法和按字段表提取的parse_quote，输出每条引用消息的解析耗时（包括XML解析）。
+样例消息在fixtures/quote_messages中，分别引用了文本、公众号文章和文件。
+
+用法: python benchmarks/quote_parse.py [-n 次数]
+"""
+import argparse
+import sys
+import timeit
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from utils.message_xml import parse_quote, parse_xml  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures" / "quote_messages"
+
+
+def _text(element, tag, convert=None, default=""):
+    if not isinstance(element.find(tag), ET.Element):
+        return default
+    return convert(element.find(tag).text) if convert else element.find(tag).text
+
+
+def legacy_parse_quote(root) -> tuple:
+    """旧版XYBot.process_quote_message中的解析逻辑，每个字段find()两次"""
+    quote = {}
+    appmsg = root.find("appmsg")
+    text = appmsg.find("title").text
+    refermsg = appmsg.find("refermsg")
+
+    quote["MsgType"] = int(refermsg.find("type").text)
+
+    if quote["MsgType"] in (1, 49):
+        quote["NewMsgId"] = refermsg.find("svrid").text
+        quote["ToWxid"] = refermsg.find("fromusr").text
+        quote["FromWxid"] = refermsg.find("chatusr").text
+        quote["Nickname"] = refermsg.find("displayname").text
+        quote["MsgSource"] = refermsg.find("msgsource").text
+        quote["Content"] = refermsg.find("content").text
+        quote["Createtime"] = refermsg.find("createtime").text
+
+    if quote["MsgType"] == 49:
+        quote_appmsg = ET.fromstring(quote["Content"]).find("appmsg")
+        quote["Content"] = _text(quote_appmsg, "title")
+        quote["destination"] = _text(quote_appmsg, "des")
+        quote["action"] = _text(quote_appmsg, "action")
+        quote["XmlType"] = _text(quote_appmsg, "type", int, 0)
+        quote["showtype"] = _text(quote_appmsg, "showtype", int, 0)
+        quote["soundtype"] = _text(quote_appmsg, "soundtype", int, 0)
+        quote["url"] = _text(quote_appmsg, "url")
+        quote["lowurl"] = _text(quote_appmsg, "lowurl")
+        quote["dataurl"] = _text(quote_appmsg, "dataurl")
+        quote["lowdataurl"] = _text(quote_appmsg, "lowdataurl")
+        quote["songlyric"] = _text(quote_appmsg, "songlyric")
+        appattach = quote_appmsg.find("appattach")
+        quote["appattach"] = {
+            "totallen": _text(appattach, "totallen", int, 0),
+            "attachid": _text(appattach, "attachid"),
+            "emoticonmd5": _text(appattach, "emoticonmd5"),
+            "fileext": _text(appattach, "fileext"),
+            "cdnthumbaeskey": _text(appattach, "cdnthumbaeskey"),
+            "aeskey": _text(appattach, "aeskey"),
+        }
+        quote["extinfo"] = _text(quote_appmsg, "extinfo")
+        quote["sourceusername"] = _text(quote_appmsg, "sourceusername")
+        quote["sourcedisplayname"] = _text(quote_appmsg, "sourcedisplayname")
+        quote["thumburl"] = _text(quote_appmsg, "thumburl")
+        quote["md5"] = _text(quote_appmsg, "md5")
+        quote["statextstr"] = _text(quote_appmsg, "statextstr")
+        quote["directshare"] = _text(quote_appmsg, "directshare", int, 0)
+
+    return text, quote
+
+
+def _same(legacy: dict, current: dict) -> bool:
+    """比较两种写法的结果，旧版对空元素返回None，parse_quote返回默认值，None不参与比较"""
+    for key, value in legacy.items():
+        if isinstance(value, dict):
+            if not _same(value, current.get(key, {})):
+                return False
+        elif value is not None and current.get(key) != value:
+            return False
+    return True
+
+
+def run_legacy(payload: str):
+    return legacy_parse_quote(parse_xml({"Content": payload}))
+
+
+def run_current(payload: str):
+    return parse_quote(parse_xml({"Content": payload}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--number", type=int, default=5000, help="每个样例的执行次数")
+    args = parser.parse_args()
+
+    payloads = {path.stem: path.read_text(encoding="utf-8") for path in sorted(FIXTURES.glob("*.xml"))}
+    print(f"{'样例':<16}{'旧版(µs/条)':>14}{'parse_quote(µs/条)':>22}")
+    for name, payload in payloads.items():
+        legacy_text, legacy_quote = run_legacy(payload)
+        text, quote = run_current(payload)
+        if legacy_text != text or not _same(legacy_quote, quote):
+            raise SystemExit(f"{name}: 解析结果不一致")
+
+        legacy = min(timeit.repeat(lambda: run_legacy(payload), number=args.number, repeat=3)) / args.number
+        current = min(timeit.repeat(lambda: run_current(payload), number=args.number, repeat=3)) / args.number
+        print(f"{name:<16}{legacy * 1e6:>14.1f}{current * 1e6:>22.1f}")
+
+
+if __name__ == "__main__":
+    main()
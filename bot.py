@@ -15,15 +15,23 @@ from WechatAPI.Server.WechatAPIServer import wechat_api_server
 from database.XYBotDB import XYBotDB
 from database.keyvalDB import KeyvalDB
 from database.messsagDB import MessageDB
+from utils.chatroom_cache import chatroom_members
+from utils.contact_directory import contact_directory
 from utils.decorators import scheduler
+from utils.event_manager import EventManager
+from utils.message_counter import MessageCounter
+from utils.message_sync import AdaptiveSyncLoop
 from utils.plugin_manager import PluginManager
-from utils.xybot import XYBot
+from utils.tracing import tracer
+from utils.xybot import XYBot, MessageDispatcher
 
 
 async def run_bot():
     """
     机器人主要运行逻辑
     """
+    bot = None
+    dispatcher = None
 
     try:
         # 设置工作目录
@@ -52,6 +60,35 @@ async def run_bot():
         # 实例化WechatAPI客户端
         bot = WechatAPI.WechatAPIClient("127.0.0.1", api_config.get("port", 9000))
         bot.ignore_protect = main_config.get("XYBot", {}).get("ignore-protection", False)
+        bot.configure_http(connection_limit=api_config.get("http-connection-limit", 100),
+                           timeout=api_config.get("http-timeout", 60),
+                           endpoint_timeouts=api_config.get("http-endpoint-timeouts", {}))
+        send_config = main_config.get("XYBot", {})
+        bot.configure_send(rate=send_config.get("send-rate", 1.0),
+                           burst=send_config.get("send-burst", 1),
+                           chat_rate=send_config.get("send-chat-rate", 1.0),
+                           chat_burst=send_config.get("send-chat-burst", 3),
+                           aging=send_config.get("send-bulk-aging", 10),
+                           coalesce_window=send_config.get("send-coalesce-window", 0),
+                           coalesce_max_length=send_config.get("send-coalesce-max-length", 2000))
+        bot.configure_contact_cache(ttl=send_config.get("contact-cache-ttl", 600),
+                                    max_size=send_config.get("contact-cache-size", 5000))
+        bot.configure_media_cache(ttl=send_config.get("media-cache-ttl", 86400),
+                                  max_size=send_config.get("media-cache-size", 256))
+        bot.configure_image(enabled=send_config.get("image-optimize", False),
+                            format=send_config.get("image-format", "auto"),
+                            max_dimension=send_config.get("image-max-dimension", 1920),
+                            max_bytes=send_config.get("image-max-bytes", 1048576),
+                            quality=send_config.get("image-quality", 85))
+        bot.configure_video(enabled=send_config.get("video-transcode", False),
+                            max_dimension=send_config.get("video-max-dimension", 720),
+                            video_bitrate=send_config.get("video-bitrate", 1000),
+                            audio_bitrate=send_config.get("video-audio-bitrate", 64),
+                            concurrency=send_config.get("video-transcode-concurrency", 2))
+        bot.configure_audio(workers=send_config.get("audio-workers", 0),
+                            max_pending=send_config.get("audio-max-pending", 32),
+                            cache_size=send_config.get("audio-cache-size", 128))
+        chatroom_members.configure(ttl=send_config.get("chatroom-member-cache-ttl", 3600))
 
         # 等待WechatAPI服务启动
         time_out = 10
@@ -210,6 +247,14 @@ async def run_bot():
         keyval_db = KeyvalDB()
         await keyval_db.set("start_time", str(int(time.time())))
 
+        # 加载通讯录，在后台增量同步
+        contact_directory.configure(sync_interval=send_config.get("contact-sync-interval", 600),
+                                    full_sync_interval=send_config.get("contact-full-sync-interval", 86400))
+        await contact_directory.start(bot)
+
+        message_counter = MessageCounter()
+        await message_counter.start(main_config.get("XYBot", {}).get("message-count-flush-interval", 10))
+
         # 先接受堆积消息
         logger.info("处理堆积消息中")
         count = 0
@@ -228,21 +273,33 @@ async def run_bot():
         logger.success("处理堆积消息完毕")
 
         logger.success("开始处理消息")
-        while True:
-            try:
-                data = await bot.sync_message()
-            except Exception as e:
-                logger.warning("获取新消息失败 {}", e)
-                await asyncio.sleep(5)
-                continue
 
-            data = data.get("AddMsgs")
-            if data:
-                for message in data:
-                    asyncio.create_task(xybot.process_message(message))
-            await asyncio.sleep(0.5)
+        xybot_config = main_config.get("XYBot", {})
+        tracer.configure(sample_rate=xybot_config.get("trace-sample-rate", 0),
+                         path=xybot_config.get("trace-file", "logs/trace.log"),
+                         rotation=xybot_config.get("trace-rotation", "50 MB"),
+                         retention=xybot_config.get("trace-retention", 5))
+        tracer.instrument(bot, "wechat")
+        EventManager.configure(default_timeout=xybot_config.get("handler-timeout", 0),
+                               plugin_timeouts=xybot_config.get("plugin-handler-timeouts", {}))
+        dispatcher = MessageDispatcher(xybot,
+                                       workers=xybot_config.get("message-workers", 8),
+                                       queue_size=xybot_config.get("message-queue-size", 1000),
+                                       lane_idle_timeout=xybot_config.get("lane-idle-timeout", 60))
+        dispatcher.start()
+
+        sync_loop = AdaptiveSyncLoop(bot, dispatcher.submit_batch,
+                                     min_interval=xybot_config.get("sync-min-interval", 0.1),
+                                     max_interval=xybot_config.get("sync-max-interval", 5.0),
+                                     backoff_factor=xybot_config.get("sync-backoff-factor", 2.0))
+        await sync_loop.run()
 
     except asyncio.CancelledError:
+        if dispatcher:
+            await dispatcher.stop()
+        await MessageCounter().stop()
+        if bot:
+            await bot.close()
         await wechat_api_server.stop()
         logger.info("机器人关闭")
     except Exception as e:
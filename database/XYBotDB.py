@@ -404,16 +404,22 @@ class XYBotDB(metaclass=Singleton):
             session.close()
 
     def get_chatroom_members(self, chatroom_id: str) -> set:
-        """Get members of a chatroom"""
+        """Get members' wxid of a chatroom"""
+        return {member["UserName"] for member in self.get_chatroom_member_list(chatroom_id)}
+
+    def get_chatroom_member_list(self, chatroom_id: str) -> list[dict]:
+        """Get member details of a chatroom, members saved as wxid only are returned as {"UserName": wxid}"""
         session = self.DBSession()
         try:
             chatroom = session.query(Chatroom).filter_by(chatroom_id=chatroom_id).first()
-            return set(chatroom.members) if chatroom else set()
+            if not chatroom:
+                return []
+            return [member if isinstance(member, dict) else {"UserName": member} for member in chatroom.members]
         finally:
             session.close()
 
-    def set_chatroom_members(self, chatroom_id: str, members: set) -> bool:
-        """Set members of a chatroom"""
+    def set_chatroom_members(self, chatroom_id: str, members: Union[set, list]) -> bool:
+        """Set members of a chatroom, members can be wxids or member details"""
         session = self.DBSession()
         try:
             chatroom = session.query(Chatroom).filter_by(chatroom_id=chatroom_id).first()
@@ -11,6 +11,7 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_scop
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from utils.singleton import Singleton
+from utils.tracing import traced
 
 # 使用新的声明式基类
 DeclarativeBase = declarative_base()
@@ -59,6 +60,7 @@ class MessageDB(metaclass=Singleton):
         async with self.engine.begin() as conn:
             await conn.run_sync(DeclarativeBase.metadata.create_all)
 
+    @traced()
     @validate_arguments(config=dict(arbitrary_types_allowed=True))
     async def save_message(self,
                            msg_id: int,
@@ -30,7 +30,7 @@ class AdminPoint(PluginBase):
 
         self.db = XYBotDB()
 
-    @on_text_message
+    @on_text_message(commands=["加积分", "减积分", "设置积分"])
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
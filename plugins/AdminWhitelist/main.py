@@ -30,7 +30,7 @@ class AdminWhitelist(PluginBase):
 
         self.db = XYBotDB()
 
-    @on_text_message
+    @on_text_message(commands=["添加白名单", "移除白名单", "白名单列表"])
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -87,7 +87,8 @@ class AdminWhitelist(PluginBase):
 
         elif command[0] == "白名单列表":
             whitelist = self.db.get_whitelist_list()
-            whitelist = "\n".join([f"{wxid} {await bot.get_nickname(wxid)}" for wxid in whitelist])
+            nicknames = await bot.get_nickname(whitelist)
+            whitelist = "\n".join([f"{wxid} {nickname}" for wxid, nickname in zip(whitelist, nicknames)])
             await bot.send_text_message(message["FromWxid"], f"-----XYBot-----\n白名单列表：\n{whitelist}")
 
         else:
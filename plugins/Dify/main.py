@@ -86,6 +86,7 @@ class Dify(PluginBase):
         return False
 
     @on_voice_message(priority=20)
+    @lazy_media
     async def handle_voice(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -97,8 +98,12 @@ class Dify(PluginBase):
             await bot.send_at_message(message["FromWxid"], "\n你还没配置Dify API密钥！", [message["SenderWxid"]])
             return False
 
+        media = await message.media()
+        if media is None:  # 没有可下载的媒体
+            return
+
         if await self._check_point(bot, message):
-            upload_file_id = await self.upload_file(message["FromWxid"], message["Content"])
+            upload_file_id = await self.upload_file(message["FromWxid"], media)
 
             files = [
                 {
@@ -113,6 +118,7 @@ class Dify(PluginBase):
         return False
 
     @on_image_message(priority=20)
+    @lazy_media
     async def handle_image(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -124,8 +130,12 @@ class Dify(PluginBase):
             await bot.send_at_message(message["FromWxid"], "\n你还没配置Dify API密钥！", [message["SenderWxid"]])
             return False
 
+        media = await message.media()
+        if media is None:  # 没有可下载的媒体
+            return
+
         if await self._check_point(bot, message):
-            upload_file_id = await self.upload_file(message["FromWxid"], bot.base64_to_byte(message["Content"]))
+            upload_file_id = await self.upload_file(message["FromWxid"], bot.base64_to_byte(media))
 
             files = [
                 {
@@ -140,6 +150,7 @@ class Dify(PluginBase):
         return False
 
     @on_video_message(priority=20)
+    @lazy_media
     async def handle_video(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -151,8 +162,12 @@ class Dify(PluginBase):
             await bot.send_at_message(message["FromWxid"], "\n你还没配置Dify API密钥！", [message["SenderWxid"]])
             return False
 
+        media = await message.media()
+        if media is None:  # 没有可下载的媒体
+            return
+
         if await self._check_point(bot, message):
-            upload_file_id = await self.upload_file(message["FromWxid"], bot.base64_to_byte(message["Video"]))
+            upload_file_id = await self.upload_file(message["FromWxid"], bot.base64_to_byte(media))
 
             files = [
                 {
@@ -167,6 +182,7 @@ class Dify(PluginBase):
         return False
 
     @on_file_message(priority=20)
+    @lazy_media
     async def handle_file(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -178,8 +194,12 @@ class Dify(PluginBase):
             await bot.send_at_message(message["FromWxid"], "\n你还没配置Dify API密钥！", [message["SenderWxid"]])
             return False
 
+        media = await message.media()
+        if media is None:  # 没有可下载的媒体
+            return
+
         if await self._check_point(bot, message):
-            upload_file_id = await self.upload_file(message["FromWxid"], message["Content"])
+            upload_file_id = await self.upload_file(message["FromWxid"], bot.base64_to_byte(media))
 
             files = [
                 {
@@ -293,7 +313,7 @@ class Dify(PluginBase):
             elif extension in ('jpg', 'jpeg', 'png', 'gif', 'bmp', 'svg'):
                 await bot.send_image_message(message["FromWxid"], file)
             elif extension in ('mp4', 'avi', 'mov', 'mkv', 'flv'):
-                await bot.send_video_message(message["FromWxid"], video=file, image="None")
+                await bot.send_video_message(message["FromWxid"], video=file)
 
         pattern = r'\[[^\]]+\]\(https?:\/\/[^\s\)]+\)'
         text = re.sub(pattern, '', text)
@@ -7,6 +7,7 @@ from loguru import logger
 from tabulate import tabulate
 
 from WechatAPI import WechatAPIClient
+from utils.contact_directory import contact_directory
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 
@@ -33,7 +34,7 @@ class GetContact(PluginBase):
 
         self.admins = main_config["admins"]
 
-    @on_text_message
+    @on_text_message(command_attr="command")
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -55,15 +56,9 @@ class GetContact(PluginBase):
         start_time = datetime.now()
         logger.info("开始获取通讯录信息时间：{}", start_time)
 
-        id_list = []
-        wx_seq, chatroom_seq = 0, 0
-        while True:
-            contact_list = await bot.get_contract_list(wx_seq, chatroom_seq)
-            id_list.extend(contact_list["ContactUsernameList"])
-            wx_seq = contact_list["CurrentWxcontactSeq"]
-            chatroom_seq = contact_list["CurrentChatRoomContactSeq"]
-            if contact_list["CountinueFlag"] != 1:
-                break
+        # 先增量同步，获取上次同步后新增的联系人
+        await contact_directory.sync()
+        id_list = await contact_directory.list_contacts()
 
         get_list_time = datetime.now()
         logger.info("获取通讯录信息列表耗时：{}", get_list_time - start_time)
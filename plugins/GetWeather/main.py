@@ -29,6 +29,7 @@ class GetWeather(PluginBase):
         self.api_key = config["api-key"]
 
     @on_text_message
+    @concurrent_handler
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
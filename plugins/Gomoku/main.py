@@ -5,7 +5,7 @@ from random import sample
 
 from PIL import Image, ImageDraw
 
-from WechatAPI import WechatAPIClient
+from WechatAPI import ImageOptions, WechatAPIClient
 from database.XYBotDB import XYBotDB
 from utils.decorators import *
 from utils.plugin_base import PluginBase
@@ -39,7 +39,8 @@ class Gomoku(PluginBase):
         self.gomoku_games = {}  # 存储所有进行中的游戏
         self.gomoku_players = {}  # 存储玩家与游戏的对应关系
 
-    @on_text_message
+    @on_text_message(command_attr=("command", "create_game_commands", "accept_game_commands",
+                                   "play_game_commands"))
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -155,8 +156,7 @@ class Gomoku(PluginBase):
         game['turn'] = game['black']
 
         # 发送游戏开始信息
-        black_nick = await bot.get_nickname(game['black'])
-        white_nick = await bot.get_nickname(game['white'])
+        black_nick, white_nick = await bot.get_nickname([game['black'], game['white']])
 
         start_msg = (
             f"-----XYBot-----\n"
@@ -176,7 +176,7 @@ class Gomoku(PluginBase):
 
         # 发送棋盘
         board_base64 = self._draw_board(game_id)
-        await bot.send_image_message(room_id, board_base64)
+        await bot.send_image_message(room_id, board_base64, optimize=ImageOptions(format="png"))
 
         # 设置回合超时
         game['timeout_task'] = asyncio.create_task(
@@ -240,7 +240,7 @@ class Gomoku(PluginBase):
 
         # 绘制并发送新棋盘
         board_base64 = self._draw_board(game_id, highlight=(x, y))
-        await bot.send_image_message(room_id, board_base64)
+        await bot.send_image_message(room_id, board_base64, optimize=ImageOptions(format="png"))
 
         # 检查是否获胜
         winner = self._check_winner(game_id)
@@ -266,8 +266,7 @@ class Gomoku(PluginBase):
         game['turn'] = game['white'] if sender == game['black'] else game['black']
 
         # 发送回合信息
-        current_nick = await bot.get_nickname(sender)
-        next_nick = await bot.get_nickname(game['turn'])
+        current_nick, next_nick = await bot.get_nickname([sender, game['turn']])
         current_color = '⚫️' if sender == game['black'] else '⚪️'
         next_color = '⚫️' if game['turn'] == game['black'] else '⚪️'
 
@@ -398,8 +397,7 @@ class Gomoku(PluginBase):
             self.gomoku_players.pop(game['white'])
             self.gomoku_games.pop(game_id)
 
-            loser_nick = await bot.get_nickname(player)
-            winner_nick = await bot.get_nickname(winner)
+            loser_nick, winner_nick = await bot.get_nickname([player, winner])
 
             await bot.send_text_message(
                 room_id,
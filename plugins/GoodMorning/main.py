@@ -6,6 +6,7 @@ from random import randint
 import aiohttp
 
 from WechatAPI import WechatAPIClient
+from utils.contact_directory import contact_directory
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 
@@ -33,20 +34,7 @@ class GoodMorning(PluginBase):
         if not self.enable:
             return
 
-        id_list = []
-        wx_seq, chatroom_seq = 0, 0
-        while True:
-            contact_list = await bot.get_contract_list(wx_seq, chatroom_seq)
-            id_list.extend(contact_list["ContactUsernameList"])
-            wx_seq = contact_list["CurrentWxcontactSeq"]
-            chatroom_seq = contact_list["CurrentChatRoomContactSeq"]
-            if contact_list["CountinueFlag"] != 1:
-                break
-
-        chatrooms = []
-        for id in id_list:
-            if id.endswith("@chatroom"):
-                chatrooms.append(id)
+        chatrooms = await contact_directory.list_chatrooms()
         try:
             async with aiohttp.request("GET", "http://zj.v.api.aa1.cn/api/bk/?num=1&type=json",
                                        timeout=aiohttp.ClientTimeout(total=20)) as req:
@@ -1,9 +1,9 @@
-import asyncio
 import tomllib
 from random import choice
 
 from WechatAPI import WechatAPIClient
 from database.XYBotDB import XYBotDB
+from utils.chatroom_cache import chatroom_members
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 
@@ -27,7 +27,7 @@ class Leaderboard(PluginBase):
 
         self.db = XYBotDB()
 
-    @on_text_message
+    @on_text_message(command_attr="command")
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -39,14 +39,14 @@ class Leaderboard(PluginBase):
             return
 
         if "群" in command[0]:
-            chatroom_members = await bot.get_chatroom_member_list(message["FromWxid"])
+            members = await chatroom_members.get(bot, message["FromWxid"])
             data = []
-            for member in chatroom_members:
+            for member in members:
                 wxid = member["UserName"]
                 points = self.db.get_points(wxid)
                 if points == 0:
                     continue
-                data.append((member["NickName"], points))
+                data.append((member.get("NickName") or wxid, points))
 
             data.sort(key=lambda x: x[1], reverse=True)
             data = data[:self.max_count]
@@ -64,27 +64,8 @@ class Leaderboard(PluginBase):
             data = self.db.get_leaderboard(self.max_count)
 
             wxids = [i[0] for i in data]
-            nicknames = []
-
-            async def get_nicknames_chunk(chunk_wxids):
-                return await bot.get_nickname(chunk_wxids)
-
-            # 将wxids分成每组20个
-            chunks = [wxids[i:i + 20] for i in range(0, len(wxids), 20)]
-            # 使用信号量限制并发数为2
-            sem = asyncio.Semaphore(2)
-
-            async def worker(chunk):
-                async with sem:
-                    return await get_nicknames_chunk(chunk)
-
-            # 并发执行所有请求
-            tasks = [worker(chunk) for chunk in chunks]
-            results = await asyncio.gather(*tasks)
-
-            # 将所有结果合并到nicknames列表中
-            for result in results:
-                nicknames.extend(result)
+            # 未缓存的昵称会自动按每组20个批量查询
+            nicknames = await bot.get_nickname(wxids)
 
             out_message = "-----XYBot积分排行榜-----"
             rank_emojis = ["👑", "🥈", "🥉"]
@@ -40,7 +40,7 @@ class LuckyDraw(PluginBase):
 
         self.db = XYBotDB()
 
-    @on_text_message
+    @on_text_message(command_attr="command")
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
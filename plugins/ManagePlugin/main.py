@@ -5,6 +5,7 @@ from tabulate import tabulate
 from WechatAPI import WechatAPIClient
 from database.XYBotDB import XYBotDB
 from utils.decorators import *
+from utils.metrics import metrics
 from utils.plugin_base import PluginBase
 from utils.plugin_manager import PluginManager
 
@@ -33,7 +34,7 @@ class ManagePlugin(PluginBase):
 
         self.plugin_manager = PluginManager()
 
-    @on_text_message
+    @on_text_message(command_attr="command")
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         content = str(message["Content"]).strip()
         command = content.split(" ")
@@ -129,3 +130,20 @@ class ManagePlugin(PluginBase):
                 await bot.send_text_message(message["FromWxid"], output)
             else:
                 await bot.send_text_message(message["FromWxid"], "⚠️插件不存在或未加载")
+
+        elif command[0] == "插件统计":
+            stats = metrics.handler_stats(plugin_name)
+            if not stats:
+                await bot.send_text_message(message["FromWxid"], "⚠️暂无统计数据")
+                return
+
+            table_data = [["插件", "事件", "次数", "p50", "p95", "p99", "错误", "超时"]]
+            for stat in stats[:15]:
+                latency = stat["latency"]
+                table_data.append([stat["plugin"], stat["event_type"].removesuffix("_message"), stat["calls"],
+                                   f"{latency['p50'] * 1000:.0f}ms", f"{latency['p95'] * 1000:.0f}ms",
+                                   f"{latency['p99'] * 1000:.0f}ms", stat["errors"], stat["timeouts"]])
+
+            table = str(tabulate(table_data, headers="firstrow", tablefmt="simple"))
+
+            await bot.send_text_message(message["FromWxid"], table)
@@ -24,7 +24,8 @@ class Music(PluginBase):
         self.command = config["command"]
         self.command_format = config["command-format"]
 
-    @on_text_message
+    @on_text_message(command_attr="command")
+    @concurrent_handler
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
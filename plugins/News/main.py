@@ -5,6 +5,7 @@ from random import choice
 import aiohttp
 
 from WechatAPI import WechatAPIClient
+from utils.contact_directory import contact_directory
 from utils.decorators import *
 from utils.plugin_base import PluginBase
 
@@ -29,7 +30,8 @@ class News(PluginBase):
         self.enable_schedule_news = config["enable-schedule-news"]
         self.command = config["command"]
 
-    @on_text_message
+    @on_text_message(command_attr="command")
+    @concurrent_handler
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
@@ -72,20 +74,7 @@ class News(PluginBase):
     async def noon_news(self, bot: WechatAPIClient):
         if not self.enable_schedule_news:
             return
-        id_list = []
-        wx_seq, chatroom_seq = 0, 0
-        while True:
-            contact_list = await bot.get_contract_list(wx_seq, chatroom_seq)
-            id_list.extend(contact_list["ContactUsernameList"])
-            wx_seq = contact_list["CurrentWxcontactSeq"]
-            chatroom_seq = contact_list["CurrentChatRoomContactSeq"]
-            if contact_list["CountinueFlag"] != 1:
-                break
-
-        chatrooms = []
-        for id in id_list:
-            if id.endswith("@chatroom"):
-                chatrooms.append(id)
+        chatrooms = await contact_directory.list_chatrooms()
 
         async with aiohttp.ClientSession() as session:
             async with session.get("http://zj.v.api.aa1.cn/api/60s-v2/?cc=XYBot") as resp:
@@ -99,20 +88,7 @@ class News(PluginBase):
     async def night_news(self, bot: WechatAPIClient):
         if not self.enable_schedule_news:
             return
-        id_list = []
-        wx_seq, chatroom_seq = 0, 0
-        while True:
-            contact_list = await bot.get_contract_list(wx_seq, chatroom_seq)
-            id_list.extend(contact_list["ContactUsernameList"])
-            wx_seq = contact_list["CurrentWxcontactSeq"]
-            chatroom_seq = contact_list["CurrentChatRoomContactSeq"]
-            if contact_list["CountinueFlag"] != 1:
-                break
-
-        chatrooms = []
-        for id in id_list:
-            if id.endswith("@chatroom"):
-                chatrooms.append(id)
+        chatrooms = await contact_directory.list_chatrooms()
 
         async with aiohttp.ClientSession() as session:
             async with session.get("http://v.api.aa1.cn/api/60s-v3/?cc=XYBot") as resp:
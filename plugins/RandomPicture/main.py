@@ -25,7 +25,8 @@ class RandomPicture(PluginBase):
         self.enable = config["enable"]
         self.command = config["command"]
 
-    @on_text_message
+    @on_text_message(command_attr="command")
+    @concurrent_handler
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
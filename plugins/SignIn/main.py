@@ -48,7 +48,7 @@ class SignIn(PluginBase):
             self.today_signin_count = 0
             self.last_reset_date = current_date
 
-    @on_text_message
+    @on_text_message(command_attr="command")
     async def handle_text(self, bot: WechatAPIClient, message: dict):
         if not self.enable:
             return
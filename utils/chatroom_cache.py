@@ -0,0 +1,202 @@
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from loguru import logger
+
+from WechatAPI import WechatAPIClient
+from database.XYBotDB import XYBotDB
+from utils.message_xml import XmlView
+from utils.singleton import Singleton
+
+# 入群系统消息模版 -> 新成员所在的link
+JOIN_TEMPLATES = (
+    ('"$names$"加入了群聊', "names"),  # 直接加入群聊
+    ('"$username$"邀请"$names$"加入了群聊', "names"),  # 通过邀请加入群聊
+    ('你邀请"$names$"加入了群聊', "names"),  # 自己邀请成员加入群聊
+    ('"$adder$"通过扫描"$from$"分享的二维码加入群聊', "adder"),  # 通过二维码加入群聊
+    ('"$adder$"通过"$from$"的邀请二维码加入群聊', "adder"),
+)
+
+# 移出群聊系统消息模版 -> 被移出成员所在的link
+REMOVE_TEMPLATES = (
+    ('"$kickoutname$"移出了群聊', "kickoutname"),  # 你将/xx将 xx 移出了群聊
+)
+
+
+def parse_member_info(root: XmlView, link_name: str = "names") -> list[dict]:
+    """解析系统消息中link里的成员信息
+
+    Returns:
+        list[dict]: [{"wxid": 成员wxid, "nickname": 成员昵称}]
+    """
+    members = []
+    try:
+        link = root.find(f".//link[@name='{link_name}']")
+        if link is None:
+            return members
+
+        memberlist = link.find("memberlist")
+        if memberlist is None:
+            return members
+
+        for member in memberlist.findall("member"):
+            members.append({
+                "wxid": member.findtext("username"),
+                "nickname": member.findtext("nickname"),
+            })
+    except Exception as e:
+        logger.warning(f"解析系统消息成员信息失败: {e}")
+
+    return members
+
+
+def parse_member_change(root: XmlView) -> Optional[tuple[list[dict], list[dict]]]:
+    """解析群成员变动的系统消息
+
+    Returns:
+        Optional[tuple]: (加入的成员, 移出的成员)，不是成员变动消息时为None。
+            是成员变动但无法识别具体成员时返回两个空列表。
+    """
+    if root.tag != "sysmsg":
+        return None
+
+    sysmsg_type = root.attrib.get("type")
+    if sysmsg_type == "delchatroommember":
+        return [], []
+    if sysmsg_type != "sysmsgtemplate":
+        return None
+
+    template = root.find("sysmsgtemplate/content_template")
+    if template is None or template.attrib.get("type") not in ("tmpl_type_profile", "tmpl_type_profilewithrevoke"):
+        return None
+
+    template_text = template.findtext("template") or ""
+    for pattern, link_name in JOIN_TEMPLATES:
+        if pattern in template_text:
+            return parse_member_info(root, link_name), []
+    for pattern, link_name in REMOVE_TEMPLATES:
+        if pattern in template_text:
+            return [], parse_member_info(root, link_name)
+    if "群聊" in template_text and ("加入" in template_text or "移出" in template_text or "退出" in template_text):
+        logger.warning(f"未知的群成员变动消息: {template_text}")
+        return [], []
+    return None
+
+
+class ChatroomMemberCache(metaclass=Singleton):
+    """群成员列表缓存
+
+    /GetChatroomMemberDetail在大群中返回的数据很大，成员列表缓存在内存中并保存到数据库。
+    收到入群、移出群聊的系统消息时增量更新，无法识别时清除缓存，另外按有效期定期重新获取。
+    机器人重启后先使用数据库中的列表，同时在后台重新获取。
+    """
+
+    def __init__(self):
+        self.ttl = 3600
+        # 群聊id -> (过期时间, 成员列表)
+        self._entries: Dict[str, tuple[float, List[dict]]] = {}
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def configure(self, ttl: float = 3600):
+        """设置有效期（秒），0为不缓存"""
+        self.ttl = ttl
+
+    async def get(self, bot: WechatAPIClient, chatroom: str) -> List[dict]:
+        """获取群成员列表，格式与bot.get_chatroom_member_list相同
+
+        从数据库加载的成员和通过系统消息增量加入的成员只有UserName和NickName（可能为空），
+        其他字段在下次重新获取后补全。
+        """
+        if self.ttl <= 0:
+            return await bot.get_chatroom_member_list(chatroom)
+
+        entry = self._entries.get(chatroom)
+        if entry is not None and entry[0] > time.monotonic():
+            return entry[1]
+
+        if entry is None:
+            members = await asyncio.to_thread(XYBotDB().get_chatroom_member_list, chatroom)
+            if members:
+                # 数据库中的列表可能已过时，先返回，同时在后台刷新
+                self._entries[chatroom] = (0, members)
+                self._refresh(bot, chatroom)
+                return members
+
+        return await asyncio.shield(self._refresh(bot, chatroom))
+
+    def _refresh(self, bot: WechatAPIClient, chatroom: str) -> asyncio.Task:
+        """重新获取成员列表，同一群聊同时只有一个请求"""
+        task = self._inflight.get(chatroom)
+        if task is None:
+            task = self._inflight[chatroom] = asyncio.create_task(self._fetch(bot, chatroom))
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _fetch(self, bot: WechatAPIClient, chatroom: str) -> List[dict]:
+        try:
+            members = await bot.get_chatroom_member_list(chatroom) or []
+            self._store(chatroom, members)
+            return members
+        finally:
+            self._inflight.pop(chatroom, None)
+
+    def _store(self, chatroom: str, members: List[dict]):
+        self._entries[chatroom] = (time.monotonic() + self.ttl, members)
+        self._persist(chatroom, members)
+
+    @staticmethod
+    def _persist(chatroom: str, members: List[dict]):
+        # 只保存wxid和昵称，大群的完整成员详情很大，不必每次变动都整个写入
+        rows = [{"UserName": member.get("UserName"), "NickName": member.get("NickName") or ""} for member in members]
+        # 使用数据库的单线程执行器，保证写入顺序
+        db = XYBotDB()
+        future = asyncio.get_running_loop().run_in_executor(db.executor, db.set_chatroom_members, chatroom, rows)
+        future.add_done_callback(lambda f: ChatroomMemberCache._on_persisted(chatroom, f))
+
+    @staticmethod
+    def _on_persisted(chatroom: str, future: asyncio.Future):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            logger.warning("保存群成员列表失败: {} {}", chatroom, future.exception())
+        elif future.result() is False:
+            logger.warning("保存群成员列表失败: {}", chatroom)
+
+    def invalidate(self, chatroom: Optional[str] = None):
+        """使缓存过期，下次获取时重新请求，chatroom为None时全部过期"""
+        chatrooms = list(self._entries) if chatroom is None else [chatroom]
+        for chatroom in chatrooms:
+            entry = self._entries.get(chatroom)
+            if entry is not None:
+                self._entries[chatroom] = (0, entry[1])
+
+    def apply_system_message(self, chatroom: str, root: XmlView):
+        """根据群系统消息更新成员列表"""
+        change = parse_member_change(root)
+        if change is None:
+            return
+
+        joined, removed = change
+        entry = self._entries.get(chatroom)
+        if entry is None:
+            return
+        if not joined and not removed:
+            self.invalidate(chatroom)
+            logger.debug("群成员变动，成员缓存已过期: {}", chatroom)
+            return
+
+        removed_wxids = {member["wxid"] for member in removed}
+        members = [member for member in entry[1] if member.get("UserName") not in removed_wxids]
+        existing = {member.get("UserName") for member in members}
+        for member in joined:
+            if member["wxid"] and member["wxid"] not in existing:
+                members.append({"UserName": member["wxid"], "NickName": member["nickname"] or ""})
+
+        # 增量更新不延长有效期
+        self._entries[chatroom] = (entry[0], members)
+        self._persist(chatroom, members)
+        logger.debug("群成员变动: {} 加入:{} 移出:{}", chatroom, [m["wxid"] for m in joined], list(removed_wxids))
+
+
+chatroom_members = ChatroomMemberCache()
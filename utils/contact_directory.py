@@ -0,0 +1,208 @@
+import asyncio
+import json
+import time
+from typing import List, Optional
+
+from loguru import logger
+
+from WechatAPI import WechatAPIClient
+from database.keyvalDB import KeyvalDB
+from utils.singleton import Singleton
+
+
+class ContactDirectory(metaclass=Singleton):
+    """通讯录目录
+
+    在内存中保存所有联系人和群聊的wxid，并保存到keyvalDB，重启后无需重新获取。
+    根据CurrentWxcontactSeq/CurrentChatRoomContactSeq增量同步，只获取上次同步后变化的联系人；
+    增量同步无法得知被删除的联系人，因此定期完整同步一次。
+    消息同步返回的ModContacts/DelContacts也会实时更新目录。
+
+    查询时直接返回内存中的数据，数据过期时在后台同步，不阻塞调用方。
+    """
+
+    KEY = "contact_directory"
+
+    def __init__(self):
+        self.sync_interval = 600
+        self.full_sync_interval = 86400
+
+        self._bot: Optional[WechatAPIClient] = None
+        self._wxids: set[str] = set()
+        self.wx_seq = 0
+        self.chatroom_seq = 0
+        # 上次同步的时间戳，完整同步的时间会持久化
+        self._last_sync = 0.0
+        self._last_full_sync = 0.0
+
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._save_tasks: set[asyncio.Task] = set()
+        # 同步进行中时，消息同步带来的变动：wxid -> 是否新增（False为删除），同步结束后合并
+        self._changes: Optional[dict[str, bool]] = None
+        self._ready = False
+
+    def configure(self, sync_interval: float = 600, full_sync_interval: float = 86400):
+        """设置同步间隔
+
+        Args:
+            sync_interval: 增量同步间隔（秒）
+            full_sync_interval: 完整同步间隔（秒）
+        """
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+
+    async def start(self, bot: WechatAPIClient):
+        """从数据库加载通讯录，并在后台同步"""
+        self._bot = bot
+        await self._load()
+        self._schedule_sync()
+
+    async def _load(self):
+        try:
+            raw = await KeyvalDB().get(self.KEY)
+            if raw:
+                data = json.loads(raw)
+                if data.get("wxid") == self._bot.wxid:  # 换号登录后不使用旧数据
+                    self._wxids = set(data.get("contacts", []))
+                    self.wx_seq = data.get("wx_seq", 0)
+                    self.chatroom_seq = data.get("chatroom_seq", 0)
+                    self._last_full_sync = data.get("full_sync_time", 0.0)
+                    self._ready = True
+                    logger.info("已从数据库加载通讯录: {}个联系人", len(self._wxids))
+        except Exception as e:
+            logger.warning("加载通讯录失败: {}", e)
+
+    async def _save(self):
+        data = {
+            "wxid": self._bot.wxid,
+            "contacts": sorted(self._wxids),
+            "wx_seq": self.wx_seq,
+            "chatroom_seq": self.chatroom_seq,
+            "full_sync_time": self._last_full_sync,
+        }
+        await KeyvalDB().set(self.KEY, json.dumps(data, ensure_ascii=False))
+
+    def _save_in_background(self):
+        # 保留任务的引用，避免被垃圾回收，并记录保存失败
+        task = asyncio.create_task(self._save())
+        self._save_tasks.add(task)
+        task.add_done_callback(self._on_saved)
+
+    def _on_saved(self, task: asyncio.Task):
+        self._save_tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("保存通讯录失败: {}", task.exception())
+
+    def _schedule_sync(self):
+        """数据过期时在后台同步"""
+        if self._bot is None or (self._task is not None and not self._task.done()):
+            return
+
+        full = time.time() - self._last_full_sync >= self.full_sync_interval
+        if full or time.monotonic() - self._last_sync >= self.sync_interval:
+            self._task = asyncio.create_task(self._background_sync(full))
+
+    async def _background_sync(self, full: bool):
+        try:
+            await self.sync(full)
+        except Exception as e:
+            logger.warning("同步通讯录失败: {}", e)
+
+    async def sync(self, full: bool = False) -> int:
+        """同步通讯录
+
+        Args:
+            full: 为True时从头完整同步，会移除已删除的联系人；否则从上次的位置增量同步
+
+        Returns:
+            int: 本次获取到的联系人数量
+        """
+        async with self._lock:
+            wx_seq, chatroom_seq = (0, 0) if full else (self.wx_seq, self.chatroom_seq)
+            fetched = []
+            self._changes = {}
+            try:
+                while True:
+                    contact_list = await self._bot.get_contract_list(wx_seq, chatroom_seq)
+                    fetched.extend(contact_list.get("ContactUsernameList") or [])
+                    next_seq = (contact_list["CurrentWxcontactSeq"], contact_list["CurrentChatRoomContactSeq"])
+                    if contact_list["CountinueFlag"] != 1 or next_seq == (wx_seq, chatroom_seq):
+                        wx_seq, chatroom_seq = next_seq
+                        break
+                    wx_seq, chatroom_seq = next_seq
+            finally:
+                changes, self._changes = self._changes, None
+
+            if full:
+                self._wxids = set(fetched)
+                self._last_full_sync = time.time()
+            else:
+                self._wxids.update(fetched)
+            # 获取过程中消息同步带来的变动比获取到的列表新，重新应用
+            for wxid, added in changes.items():
+                if added:
+                    self._wxids.add(wxid)
+                else:
+                    self._wxids.discard(wxid)
+            self.wx_seq, self.chatroom_seq = wx_seq, chatroom_seq
+            self._last_sync = time.monotonic()
+            self._ready = True
+
+            await self._save()
+            logger.debug("通讯录{}同步完成: 获取{}个 共{}个", "完整" if full else "增量", len(fetched), len(self._wxids))
+            return len(fetched)
+
+    def apply_sync(self, data: dict):
+        """根据消息同步返回的联系人变动更新目录"""
+        changed = False
+        for contact in data.get("ModContacts") or []:
+            wxid = (contact.get("UserName") or {}).get("string")
+            if wxid:
+                if self._changes is not None:
+                    self._changes[wxid] = True
+                if wxid not in self._wxids:
+                    self._wxids.add(wxid)
+                    changed = True
+        for contact in data.get("DelContacts") or []:
+            wxid = (contact.get("UserName") or {}).get("string")
+            if wxid:
+                if self._changes is not None:
+                    self._changes[wxid] = False
+                if wxid in self._wxids:
+                    self._wxids.discard(wxid)
+                    changed = True
+        if changed and self._bot is not None:
+            self._save_in_background()
+
+    async def _contacts(self) -> set[str]:
+        self._schedule_sync()
+        if not self._ready:
+            # 首次使用且数据库中没有数据时需要等待第一次同步，后台同步失败时在这里重试并抛出异常
+            if self._task is not None and not self._task.done():
+                await asyncio.shield(self._task)
+            if not self._ready:
+                await self.sync(full=True)
+        return self._wxids
+
+    async def list_contacts(self) -> List[str]:
+        """所有联系人和群聊的wxid"""
+        return sorted(await self._contacts())
+
+    async def list_chatrooms(self) -> List[str]:
+        """所有群聊的wxid"""
+        return sorted(wxid for wxid in await self._contacts() if wxid.endswith("@chatroom"))
+
+    async def list_friends(self) -> List[str]:
+        """所有好友的wxid，不包括群聊和公众号"""
+        return sorted(wxid for wxid in await self._contacts()
+                      if not wxid.endswith("@chatroom") and not wxid.startswith("gh_"))
+
+    def __contains__(self, wxid: str) -> bool:
+        return wxid in self._wxids
+
+    def __len__(self) -> int:
+        return len(self._wxids)
+
+
+contact_directory = ContactDirectory()
@@ -1,10 +1,12 @@
 from functools import wraps
-from typing import Callable, Union
+from typing import Callable, Iterable, Union
 
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
+from WechatAPI.Client.send_scheduler import LANE_BULK, send_lane
+
 scheduler = AsyncIOScheduler()
 
 
@@ -14,7 +16,9 @@ def schedule(
 ) -> Callable:
     """
     定时任务装饰器
-    
+
+    定时任务中未指定通道的消息都通过bulk通道发送，不会挡住回复用户的消息。
+
     例子:
 
     - @schedule('interval', seconds=30)
@@ -27,7 +31,8 @@ def schedule(
 
         @wraps(func)
         async def wrapper(self, *args, **kwargs):
-            return await func(self, *args, **kwargs)
+            with send_lane(LANE_BULK):
+                return await func(self, *args, **kwargs)
 
         setattr(wrapper, '_is_scheduled', True)
         setattr(wrapper, '_schedule_trigger', trigger)
@@ -57,8 +62,66 @@ def remove_job_safe(scheduler: AsyncIOScheduler, job_id: str):
         pass
 
 
-def on_text_message(priority=50):
-    """文本消息装饰器"""
+def mutable_message(func: Callable) -> Callable:
+    """让处理函数收到可修改的消息副本
+
+    默认所有处理函数共享同一个只读消息，修改会抛出TypeError。
+    确实需要修改消息的处理函数加上此装饰器，会得到一份独立的副本。
+    """
+    setattr(func, '_mutable_message', True)
+    return func
+
+
+def concurrent_handler(func: Callable) -> Callable:
+    """让处理函数与同优先级的其他并发处理函数同时执行
+
+    默认处理函数按顺序逐个执行。加上此装饰器的处理函数会和相邻的同优先级并发处理函数一起用asyncio.gather执行，
+    适合耗时较长、不需要用返回False阻止后续执行的处理函数。
+    同一组中任意一个返回False，仍会在整组执行完后阻止后续执行。
+    """
+    setattr(func, '_concurrent', True)
+    return func
+
+
+def lazy_media(func: Callable) -> Callable:
+    """让媒体消息处理函数按需下载媒体
+
+    默认收到图片、语音、视频、文件消息时先下载媒体再调用处理函数。
+    某个事件的所有处理函数都加上此装饰器时，不再预先下载，处理函数需要时通过await message.media()下载，
+    结果会被缓存，多个处理函数共享。适合只处理私聊或需要先检查条件的处理函数。
+    """
+    setattr(func, '_lazy_media', True)
+    return func
+
+
+def handler_timeout(seconds: float) -> Callable:
+    """设置处理函数的超时时间，优先于main_config.toml中的设置
+
+    超时的处理函数会被取消，不影响后续处理函数。seconds为0时不限制。
+
+    例子:
+
+    - @handler_timeout(120)
+    """
+
+    def decorator(func: Callable):
+        setattr(func, '_timeout', seconds)
+        return func
+
+    return decorator
+
+
+def on_text_message(priority=50, commands: Iterable[str] = None, command_attr: Union[str, Iterable[str]] = None):
+    """文本消息装饰器
+
+    设置了commands或command_attr时，只有消息的第一个词是其中某个指令时才会调用，
+    没有设置时接收所有文本消息。
+
+    Args:
+        priority: 优先级
+        commands: 指令列表
+        command_attr: 保存指令列表的插件属性名，可以是多个，绑定插件时读取，如"command"
+    """
 
     def decorator(func):
         if callable(priority):  # 无参数调用时
@@ -69,6 +132,10 @@ def on_text_message(priority=50):
         # 有参数调用时
         setattr(func, '_event_type', 'text_message')
         setattr(func, '_priority', min(max(priority, 0), 99))
+        if commands is not None:
+            setattr(func, '_commands', (commands,) if isinstance(commands, str) else tuple(commands))
+        if command_attr is not None:
+            setattr(func, '_command_attr', (command_attr,) if isinstance(command_attr, str) else tuple(command_attr))
         return func
 
     return decorator if not callable(priority) else decorator(priority)
@@ -1,9 +1,45 @@
+import asyncio
 import copy
-from typing import Callable, Dict, List
+import time
+import traceback
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+from loguru import logger
+
+from WechatAPI.Client.send_scheduler import LANE_INTERACTIVE, send_lane
+from utils.message import Message
+from utils.metrics import metrics
+from utils.tracing import tracer
 
 
 class EventManager:
     _handlers: Dict[str, List[tuple[Callable, object, int]]] = {}
+    # 指令路由表：事件类型 -> 第一个词 -> 需要调用的处理函数
+    _routes: Dict[str, Dict[str, List[tuple[Callable, object, int]]]] = {}
+    # 没有匹配到指令时调用的处理函数，即没有声明指令的处理函数
+    _catch_all: Dict[str, List[tuple[Callable, object, int]]] = {}
+    # 处理函数超时时间（秒），0为不限制
+    _default_timeout: float = 0
+    _plugin_timeouts: Dict[str, float] = {}
+
+    @classmethod
+    def configure(cls, default_timeout: float = 0, plugin_timeouts: Optional[Dict[str, float]] = None):
+        """设置处理函数的超时时间
+
+        Args:
+            default_timeout: 默认超时时间（秒），0为不限制
+            plugin_timeouts: 按插件名设置的超时时间，优先于默认值
+        """
+        cls._default_timeout = default_timeout or 0
+        cls._plugin_timeouts = dict(plugin_timeouts or {})
+
+    @classmethod
+    def _handler_timeout(cls, handler: Callable, plugin: str) -> float:
+        """处理函数自己的设置优先，其次是插件的设置，最后是默认值"""
+        timeout = getattr(handler, '_timeout', None)
+        if timeout is None:
+            timeout = cls._plugin_timeouts.get(plugin, cls._default_timeout)
+        return timeout or 0
 
     @classmethod
     def bind_instance(cls, instance: object):
@@ -13,12 +49,73 @@ class EventManager:
             if hasattr(method, '_event_type'):
                 event_type = getattr(method, '_event_type')
                 priority = getattr(method, '_priority', 50)
-                
+
                 if event_type not in cls._handlers:
                     cls._handlers[event_type] = []
                 cls._handlers[event_type].append((method, instance, priority))
                 # 按优先级排序，优先级高的在前
                 cls._handlers[event_type].sort(key=lambda x: x[2], reverse=True)
+                cls._build_routes(event_type)
+
+    @staticmethod
+    def _handler_commands(handler: Callable, instance: object) -> Optional[FrozenSet[str]]:
+        """获取处理函数声明的指令，没有声明时返回None，表示接收所有消息"""
+        if not hasattr(handler, '_commands') and not hasattr(handler, '_command_attr'):
+            return None
+
+        commands = list(getattr(handler, '_commands', ()))
+        for attr in getattr(handler, '_command_attr', ()):
+            value = getattr(instance, attr, None)
+            if isinstance(value, str):
+                commands.append(value)
+            elif value:
+                commands.extend(value)
+        return frozenset(str(command) for command in commands)
+
+    @classmethod
+    def _build_routes(cls, event_type: str):
+        """根据处理函数声明的指令重建路由表
+
+        每个指令对应的列表保持原有的优先级顺序，包含声明了该指令的处理函数和所有未声明指令的处理函数。
+        """
+        handlers = cls._handlers.get(event_type, [])
+        declared = [(entry, cls._handler_commands(entry[0], entry[1])) for entry in handlers]
+
+        if all(commands is None for _, commands in declared):
+            cls._routes.pop(event_type, None)
+            cls._catch_all.pop(event_type, None)
+            return
+
+        tokens = set().union(*(commands for _, commands in declared if commands is not None))
+        cls._routes[event_type] = {
+            token: [entry for entry, commands in declared if commands is None or token in commands]
+            for token in tokens
+        }
+        cls._catch_all[event_type] = [entry for entry, commands in declared if commands is None]
+
+    @classmethod
+    def _select_handlers(cls, event_type: str, message) -> List[tuple[Callable, object, int]]:
+        """按消息的第一个词查路由表，只返回可能处理这条消息的处理函数"""
+        routes = cls._routes.get(event_type)
+        if routes is None:
+            return cls._handlers[event_type]
+
+        content = message.get("Content") if hasattr(message, "get") else None
+        if not isinstance(content, str):
+            return cls._handlers[event_type]
+
+        token = content.strip().split(" ")[0]
+        return routes.get(token, cls._catch_all[event_type])
+
+    @classmethod
+    def has_handlers(cls, event_type: str) -> bool:
+        """是否有处理函数订阅了该事件"""
+        return bool(cls._handlers.get(event_type))
+
+    @classmethod
+    def needs_media(cls, event_type: str) -> bool:
+        """是否有处理函数需要预先下载的媒体，即没有使用@lazy_media"""
+        return any(not getattr(handler, '_lazy_media', False) for handler, _, _ in cls._handlers.get(event_type, []))
 
     @classmethod
     async def emit(cls, event_type: str, *args, **kwargs) -> None:
@@ -27,19 +124,70 @@ class EventManager:
             return
 
         api_client, message = args
-        for handler, instance, priority in cls._handlers[event_type]:
-            # 只对 message 进行深拷贝，api_client 保持不变
-            handler_args = (api_client, copy.deepcopy(message))
-            new_kwargs = {k: copy.deepcopy(v) for k, v in kwargs.items()}
+        if isinstance(message, Message):
+            # 冻结后所有处理函数共享同一个只读消息，不再逐个深拷贝
+            message.freeze()
+
+        handlers = cls._select_handlers(event_type, message)
+        i = 0
+        while i < len(handlers):
+            handler, instance, priority = handlers[i]
+            if not getattr(handler, '_concurrent', False):
+                results = [await cls._call_handler(event_type, handler, instance, api_client, message, kwargs)]
+                i += 1
+            else:
+                # 相邻的同优先级并发处理函数一起执行
+                group = [(handler, instance)]
+                i += 1
+                while (i < len(handlers) and handlers[i][2] == priority
+                       and getattr(handlers[i][0], '_concurrent', False)):
+                    group.append((handlers[i][0], handlers[i][1]))
+                    i += 1
+                results = await asyncio.gather(
+                    *(cls._call_handler(event_type, h, inst, api_client, message, kwargs) for h, inst in group))
 
-            result = await handler(*handler_args, **new_kwargs)
+            # True 继续执行 False 停止执行，其他返回值视为继续执行
+            if any(result is False for result in results):
+                break
 
-            if isinstance(result, bool):
-                # True 继续执行 False 停止执行
-                if not result:
-                    break
+    @classmethod
+    async def _call_handler(cls, event_type: str, handler: Callable, instance: object, api_client, message,
+                            kwargs: dict):
+        """调用单个处理函数
+
+        处理函数抛出异常或超时只记录日志，返回None，不影响后续处理函数。
+        """
+        if getattr(handler, '_mutable_message', False) or not isinstance(message, Message):
+            # 需要自行修改消息的处理函数得到独立副本
+            if isinstance(message, Message):
+                handler_message = message.mutable_copy()
             else:
-                continue  # 我也不知道你返回了个啥玩意，反正继续执行就是了
+                handler_message = copy.deepcopy(message)
+            handler_kwargs = {k: copy.deepcopy(v) for k, v in kwargs.items()}
+        else:
+            handler_message = message
+            handler_kwargs = kwargs
+
+        plugin = type(instance).__name__
+        timeout = cls._handler_timeout(handler, plugin)
+        error = timed_out = False
+        start = time.perf_counter()
+        try:
+            # 处理消息时发送的回复默认走interactive通道，优先于定时群发
+            with tracer.span("handler", plugin=plugin, event_type=event_type), send_lane(LANE_INTERACTIVE):
+                coro = handler(api_client, handler_message, **handler_kwargs)
+                if timeout > 0:
+                    return await asyncio.wait_for(coro, timeout)
+                return await coro
+        except asyncio.TimeoutError:
+            timed_out = True
+            logger.warning("插件 {} 处理 {} 超时（{}秒），已取消", plugin, event_type, timeout)
+        except Exception:
+            error = True
+            logger.error(f"插件 {plugin} 处理 {event_type} 时发生错误: {traceback.format_exc()}")
+        finally:
+            metrics.observe_handler(plugin, event_type, time.perf_counter() - start, error, timed_out)
+        return None
 
     @classmethod
     def unbind_instance(cls, instance: object):
@@ -50,3 +198,4 @@ class EventManager:
                 for handler, inst, priority in cls._handlers[event_type]
                 if inst is not instance
             ]
+            cls._build_routes(event_type)
@@ -0,0 +1,324 @@
+import asyncio
+import copy
+from collections.abc import MutableMapping
+from types import MappingProxyType
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Type
+
+from utils.message_xml import XmlView, parse_xml
+
+_MISSING = object()
+
+
+def _freeze_value(value: Any) -> Any:
+    """把list/dict转换为只读的tuple/MappingProxyType"""
+    if isinstance(value, list):
+        return tuple(_freeze_value(v) for v in value)
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze_value(v) for k, v in value.items()})
+    return value
+
+
+def _thaw_value(value: Any) -> Any:
+    """_freeze_value的逆操作，得到可修改的独立副本"""
+    if isinstance(value, (tuple, list)):
+        return [_thaw_value(v) for v in value]
+    if isinstance(value, (dict, MappingProxyType)):
+        return {k: _thaw_value(v) for k, v in value.items()}
+    return value
+
+
+class LazyMedia:
+    """按需下载的媒体
+
+    首次await时才下载，结果缓存，同一条消息的所有处理函数共享一次下载。
+    某个处理函数被取消不会中断下载；下载失败时下次await重新下载。复制消息时共享同一个对象。
+
+    Args:
+        loader: 下载媒体的协程函数
+    """
+
+    __slots__ = ("_loader", "_task")
+
+    def __init__(self, loader: Callable[[], Awaitable[Any]]):
+        self._loader = loader
+        self._task: Optional[asyncio.Future] = None
+
+    @property
+    def loaded(self) -> bool:
+        """是否已经下载完成"""
+        return self._task is not None and self._task.done() and not self._task.cancelled() \
+            and self._task.exception() is None
+
+    async def get(self) -> Any:
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._loader())
+            self._task.add_done_callback(self._on_done)
+        return await asyncio.shield(self._task)
+
+    def _on_done(self, task: asyncio.Future):
+        if task.cancelled() or task.exception() is not None:
+            self._task = None
+
+    def __await__(self):
+        return self.get().__await__()
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class Message(MutableMapping):
+    """消息对象基类
+
+    常用字段存放在__slots__中，比dict更省内存；其他字段存放在_extra中。
+    兼容dict的用法，插件可以继续使用message["Content"]、message.get("Ats")等写法，
+    也可以直接用属性访问，如message.Content。
+    以下划线开头的键只供内部使用，不会出现在遍历结果中。
+
+    消息分发给插件前会被冻结为只读，所有处理函数共享同一个对象，无需复制。
+    """
+
+    __slots__ = ("MsgId", "NewMsgId", "MsgSeq", "MsgType", "FromWxid", "ToWxid", "SenderWxid", "Content",
+                 "IsGroup", "Status", "ImgStatus", "ImgBuf", "CreateTime", "MsgSource", "PushContent", "_extra",
+                 "_frozen")
+
+    # 可以用下标访问的字段，由子类自动扩展
+    _fields: tuple[str, ...] = tuple(name for name in __slots__ if not name.startswith("_"))
+    _field_set: frozenset = frozenset(_fields)
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        own = tuple(name for name in cls.__dict__.get("__slots__", ()) if not name.startswith("_"))
+        cls._fields = cls._fields + own
+        cls._field_set = frozenset(cls._fields)
+
+    def __init__(self, data: Optional[Dict[str, Any]] = None, **kwargs):
+        self._frozen = False
+        self._extra = {}
+        if data:
+            self.update(data)
+        if kwargs:
+            self.update(kwargs)
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Message":
+        """从预处理后的消息字典创建消息对象"""
+        if isinstance(data, cls):
+            return data
+        return cls(data)
+
+    # 只读
+
+    @property
+    def frozen(self) -> bool:
+        return self._frozen
+
+    def freeze(self) -> "Message":
+        """冻结为只读，内部的list/dict也转换为只读，返回自身"""
+        if self._frozen:
+            return self
+        for name in self._fields:
+            value = getattr(self, name, _MISSING)
+            if isinstance(value, (list, dict)):
+                setattr(self, name, _freeze_value(value))
+        for key, value in self._extra.items():
+            if not key.startswith("_"):
+                self._extra[key] = _freeze_value(value)
+        self._frozen = True
+        return self
+
+    def mutable_copy(self) -> "Message":
+        """获取可修改的独立副本，内部的容器也会被复制"""
+        new = type(self).__new__(type(self))
+        object.__setattr__(new, "_frozen", False)
+        for name in self._fields:
+            value = getattr(self, name, _MISSING)
+            if value is not _MISSING:
+                setattr(new, name, _thaw_value(value))
+        new._extra = {key: (value if key.startswith("_") else _thaw_value(value))
+                      for key, value in self._extra.items()}
+        return new
+
+    def __setattr__(self, name: str, value: Any):
+        if getattr(self, "_frozen", False):
+            raise TypeError(f"消息是只读的，无法修改 {name}，如需修改请使用 @mutable_message")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name: str):
+        if getattr(self, "_frozen", False):
+            raise TypeError(f"消息是只读的，无法删除 {name}，如需修改请使用 @mutable_message")
+        object.__delattr__(self, name)
+
+    # 延迟计算的字段
+
+    async def media(self) -> Any:
+        """媒体内容（图片base64、语音wav字节、视频base64、文件base64）
+
+        使用@lazy_media的处理函数收到的消息不会预先下载媒体，首次调用时下载，之后返回缓存的结果。
+        消息中没有可下载的媒体时（如图片消息缺少CDN信息）返回None，不会返回消息的XML。
+        """
+        lazy = self._extra.get("_media")
+        if lazy is None:
+            return None
+        return await lazy
+
+    @property
+    def xml(self) -> XmlView:
+        """Content解析后的只读XML，首次访问时解析并缓存"""
+        return parse_xml(self)
+
+    @property
+    def is_group(self) -> bool:
+        """是否群聊消息，未预处理时根据FromWxid判断"""
+        value = getattr(self, "IsGroup", _MISSING)
+        if value is _MISSING:
+            value = str(getattr(self, "FromWxid", "")).endswith("@chatroom")
+        return value
+
+    # dict兼容
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._field_set:
+            value = getattr(self, key, _MISSING)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        return self._extra[key]
+
+    def __setitem__(self, key: str, value: Any):
+        if key in self._field_set:
+            setattr(self, key, value)
+        elif self._frozen and not key.startswith("_"):
+            # 下划线开头的内部缓存（如XML解析结果）允许在只读消息上写入
+            raise TypeError(f"消息是只读的，无法修改 {key}，如需修改请使用 @mutable_message")
+        else:
+            self._extra[key] = value
+
+    def __delitem__(self, key: str):
+        if key in self._field_set:
+            try:
+                delattr(self, key)
+            except AttributeError:
+                raise KeyError(key) from None
+        elif self._frozen:
+            raise TypeError(f"消息是只读的，无法删除 {key}，如需修改请使用 @mutable_message")
+        else:
+            del self._extra[key]
+
+    def __contains__(self, key: object) -> bool:
+        if key in self._field_set:
+            return hasattr(self, key)
+        return key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for name in self._fields:
+            if hasattr(self, name):
+                yield name
+        for key in self._extra:
+            if not key.startswith("_"):
+                yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为普通dict"""
+        return {key: self[key] for key in self}
+
+    def copy(self) -> "Message":
+        """浅拷贝，副本与原消息的只读状态相同"""
+        new = type(self).__new__(type(self))
+        object.__setattr__(new, "_frozen", False)
+        for name in self._fields:
+            value = getattr(self, name, _MISSING)
+            if value is not _MISSING:
+                setattr(new, name, value)
+        new._extra = dict(self._extra)
+        new._frozen = self._frozen
+        return new
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        if self._frozen:
+            # 只读消息的副本同样只读，直接共享即可
+            return self
+        new = type(self).__new__(type(self))
+        object.__setattr__(new, "_frozen", False)
+        memo[id(self)] = new
+        for name in self._fields:
+            value = getattr(self, name, _MISSING)
+            if value is not _MISSING:
+                setattr(new, name, copy.deepcopy(value, memo))
+        new._extra = copy.deepcopy(self._extra, memo)
+        return new
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class TextMessage(Message):
+    """文本消息，也用于被@消息"""
+    __slots__ = ("Ats",)
+
+
+class ImageMessage(Message):
+    """图片消息，Content为图片base64，@lazy_media的处理函数通过await message.media()获取"""
+    __slots__ = ()
+
+
+class VoiceMessage(Message):
+    """语音消息，Content为wav字节，@lazy_media的处理函数通过await message.media()获取"""
+    __slots__ = ()
+
+
+class VideoMessage(Message):
+    """视频消息，Video为视频base64，@lazy_media的处理函数通过await message.media()获取"""
+    __slots__ = ("Video",)
+
+
+class FileMessage(Message):
+    """文件消息，File为文件base64，@lazy_media的处理函数通过await message.media()获取"""
+    __slots__ = ("Filename", "FileExtend", "File")
+
+
+class QuoteMessage(Message):
+    """引用消息，Quote为被引用的消息"""
+    __slots__ = ("Quote",)
+
+
+class PatMessage(Message):
+    """拍一拍消息"""
+    __slots__ = ("Patter", "Patted", "PatSuffix")
+
+
+class SystemMessage(Message):
+    """系统消息"""
+    __slots__ = ()
+
+
+class FriendRequestMessage(Message):
+    """好友请求消息"""
+    __slots__ = ()
+
+
+MESSAGE_TYPES: Dict[str, Type[Message]] = {
+    "text_message": TextMessage,
+    "at_message": TextMessage,
+    "image_message": ImageMessage,
+    "voice_message": VoiceMessage,
+    "video_message": VideoMessage,
+    "file_message": FileMessage,
+    "quote_message": QuoteMessage,
+    "pat_message": PatMessage,
+    "system_message": SystemMessage,
+    "friend_request": FriendRequestMessage,
+}
+
+
+def build_message(event_type: str, data: Dict[str, Any]) -> Message:
+    """根据事件类型创建对应的消息对象"""
+    return MESSAGE_TYPES.get(event_type, Message).from_dict(data)
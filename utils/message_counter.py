@@ -0,0 +1,73 @@
+import asyncio
+from typing import Optional
+
+from loguru import logger
+
+from database.keyvalDB import KeyvalDB
+from utils.singleton import Singleton
+
+KEY_MESSAGES = "messages"
+KEY_WEBUI_MESSAGE_COUNT = "bot:stats:message_count"
+
+
+class MessageCounter(metaclass=Singleton):
+    """消息计数器
+
+    计数只在内存中累加，定时以及关闭时批量写回键值数据库，
+    同时更新WebUI使用的消息计数键。
+    """
+
+    def __init__(self):
+        self.key_db = KeyvalDB()
+        self.count = 0
+        self.loaded = False
+        self._flushed_count = None
+        self._task: Optional[asyncio.Task] = None
+
+    def incr(self, amount: int = 1):
+        """消息数+amount，只修改内存，不访问数据库"""
+        self.count += amount
+
+    async def load(self):
+        """从数据库读取已有计数，加到启动后已累加的数量上"""
+        if self.loaded:
+            return
+        self.count += int(await self.key_db.get(KEY_MESSAGES) or 0)
+        self._flushed_count = self.count
+        self.loaded = True
+
+    async def flush(self):
+        """把当前计数写回数据库，没有变化时跳过"""
+        if not self.loaded:
+            return
+        count = self.count
+        if count == self._flushed_count:
+            return
+        await self.key_db.set(KEY_MESSAGES, str(count))
+        await self.key_db.set(KEY_WEBUI_MESSAGE_COUNT, str(count))
+        self._flushed_count = count
+
+    async def start(self, interval: float = 10):
+        """读取计数并开始定时写回"""
+        await self.load()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._flush_loop(interval))
+
+    async def stop(self):
+        """停止定时写回并最后写回一次"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _flush_loop(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("消息计数写回数据库失败: {}", e)
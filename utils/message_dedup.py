@@ -0,0 +1,115 @@
+import hashlib
+import math
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from utils.metrics import metrics
+
+
+class BloomFilter:
+    """定长布隆过滤器
+
+    Args:
+        capacity (int): 预计插入的元素数量
+        error_rate (float): 期望的误判率
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        # m = -n*ln(p)/ln(2)^2, k = m/n*ln(2)，取整后固定哈希次数
+        self.size = max(int(-capacity * math.log(error_rate) / (math.log(2) ** 2)), 8)
+        self.hash_count = max(round(self.size / capacity * math.log(2)), 1)
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: str):
+        for pos in self._positions(key):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+
+class RotatingBloomFilter:
+    """两代轮换的布隆过滤器，当前代写满后丢弃上一代，内存占用恒定
+
+    Args:
+        capacity (int): 每一代的容量
+        error_rate (float): 每一代的误判率
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._current = BloomFilter(capacity, error_rate)
+        self._previous: Optional[BloomFilter] = None
+
+    def add(self, key: str):
+        if self._current.count >= self.capacity:
+            self._previous = self._current
+            self._current = BloomFilter(self.capacity, self.error_rate)
+        self._current.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._current or (self._previous is not None and key in self._previous)
+
+
+class MessageDeduplicator:
+    """消息去重缓存
+
+    以NewMsgId（没有时用MsgId）为键，用LRU记录最近见过的消息。
+    可选地用轮换布隆过滤器记住更早的消息，布隆过滤器存在极小误判率。
+
+    Args:
+        capacity (int): LRU缓存的消息ID数量
+        bloom_capacity (int): 布隆过滤器每一代的容量，为0时不启用
+    """
+
+    def __init__(self, capacity: int = 10000, bloom_capacity: int = 0):
+        self.capacity = max(capacity, 1)
+        self._seen: OrderedDict[str, None] = OrderedDict()
+        self._bloom = RotatingBloomFilter(bloom_capacity) if bloom_capacity > 0 else None
+
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def message_key(message: Dict[str, Any]) -> Optional[str]:
+        msg_id = message.get("NewMsgId") or message.get("MsgId")
+        return str(msg_id) if msg_id else None
+
+    def is_duplicate(self, message: Dict[str, Any]) -> bool:
+        """检查消息是否已经见过，未见过则记录下来"""
+        key = self.message_key(message)
+        if key is None:
+            return False
+
+        if key in self._seen:
+            self._seen.move_to_end(key)
+            self._hit()
+            return True
+
+        if self._bloom is not None and key in self._bloom:
+            self._hit()
+            return True
+
+        self._seen[key] = None
+        if len(self._seen) > self.capacity:
+            self._seen.popitem(last=False)
+        if self._bloom is not None:
+            self._bloom.add(key)
+
+        self.misses += 1
+        metrics.incr("dedup.misses")
+        return False
+
+    def _hit(self):
+        self.hits += 1
+        metrics.incr("dedup.hits")
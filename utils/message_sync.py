@@ -0,0 +1,79 @@
+import asyncio
+import time
+from typing import Awaitable, Callable
+
+from loguru import logger
+
+from WechatAPI import WechatAPIClient
+from utils.contact_directory import contact_directory
+from utils.metrics import metrics
+from utils.tracing import tracer
+
+
+class AdaptiveSyncLoop:
+    """自适应消息同步循环
+
+    有消息时立即再次同步，空闲时按指数退避延长轮询间隔，直到达到上限。
+
+    Args:
+        bot (WechatAPIClient): 微信API客户端
+        on_batch (Callable): 收到一批消息时调用的协程函数，参数为AddMsgs列表
+        min_interval (float): 空闲退避的起始间隔（秒）
+        max_interval (float): 空闲时的最大轮询间隔（秒）
+        backoff_factor (float): 每次空轮询后间隔的放大倍数
+        error_interval (float): 同步失败后的等待时间（秒）
+    """
+
+    def __init__(self, bot: WechatAPIClient, on_batch: Callable[[list], Awaitable[None]],
+                 min_interval: float = 0.1, max_interval: float = 5.0, backoff_factor: float = 2.0,
+                 error_interval: float = 5.0):
+        self.bot = bot
+        self.on_batch = on_batch
+        self.min_interval = max(min_interval, 0.0)
+        self.max_interval = max(max_interval, self.min_interval)
+        self.backoff_factor = max(backoff_factor, 1.0)
+        self.error_interval = error_interval
+
+        self.interval = 0.0
+
+    def _next_interval(self, batch_size: int) -> float:
+        """根据本次同步到的消息数量计算下一次轮询间隔"""
+        if batch_size > 0:
+            return 0.0
+        if self.interval <= 0:
+            return self.min_interval
+        return min(self.interval * self.backoff_factor, self.max_interval)
+
+    async def run(self):
+        """开始同步消息，直到任务被取消"""
+        while True:
+            sync_start = time.perf_counter()
+            try:
+                data = await self.bot.sync_message()
+            except Exception as e:
+                logger.warning("获取新消息失败 {}", e)
+                metrics.incr("sync.errors")
+                await asyncio.sleep(self.error_interval)
+                continue
+
+            messages = (data or {}).get("AddMsgs") or []
+            if data:
+                contact_directory.apply_sync(data)
+            batch_size = len(messages)
+
+            metrics.incr("sync.polls")
+            metrics.observe("sync.batch_size", batch_size)
+
+            if messages:
+                with tracer.trace("sync_batch", size=batch_size,
+                                  sync_ms=round((time.perf_counter() - sync_start) * 1000, 3)):
+                    await self.on_batch(messages)
+
+            self.interval = self._next_interval(batch_size)
+            metrics.set_gauge("sync.interval", self.interval)
+
+            if self.interval > 0:
+                await asyncio.sleep(self.interval)
+            else:
+                # 让出事件循环，避免连续满批时饿死其他任务
+                await asyncio.sleep(0)
@@ -0,0 +1,220 @@
+import xml.etree.ElementTree as ET
+from types import MappingProxyType
+from typing import Any, Callable, Iterator, MutableMapping, Optional, TypedDict
+
+XML_CACHE_KEY = "_XmlCache"
+
+
+class XmlView:
+    """ET.Element的只读视图
+
+    解析结果在消息的整个处理过程中共享，插件只能读取，不能修改。
+    """
+
+    __slots__ = ("_element", "source")
+
+    def __init__(self, element: ET.Element, source: Optional[str] = None):
+        self._element = element
+        self.source = source
+
+    @property
+    def tag(self) -> str:
+        return self._element.tag
+
+    @property
+    def text(self) -> Optional[str]:
+        return self._element.text
+
+    @property
+    def tail(self) -> Optional[str]:
+        return self._element.tail
+
+    @property
+    def attrib(self) -> MappingProxyType:
+        return MappingProxyType(self._element.attrib)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self._element.get(key, default)
+
+    def find(self, path: str) -> Optional["XmlView"]:
+        element = self._element.find(path)
+        return XmlView(element) if element is not None else None
+
+    def findall(self, path: str) -> list["XmlView"]:
+        return [XmlView(element) for element in self._element.findall(path)]
+
+    def findtext(self, path: str, default: Optional[str] = None) -> Optional[str]:
+        return self._element.findtext(path, default)
+
+    def iter(self, tag: Optional[str] = None) -> Iterator["XmlView"]:
+        for element in self._element.iter(tag):
+            yield XmlView(element)
+
+    def __iter__(self) -> Iterator["XmlView"]:
+        for element in self._element:
+            yield XmlView(element)
+
+    def __len__(self) -> int:
+        return len(self._element)
+
+    def __bool__(self) -> bool:
+        # 与ET.Element不同，视图存在即为真，避免没有子元素时被当成None
+        return True
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        # 只读，复制消息时无需复制解析树
+        return self
+
+    def __repr__(self) -> str:
+        return f"<XmlView {self.tag}>"
+
+
+def parse_xml(message: MutableMapping[str, Any], field: str = "Content") -> XmlView:
+    """解析消息中的XML字段，并把结果缓存在消息上
+
+    同一字段内容不变时只解析一次，XYBot预处理和插件共享同一棵解析树。
+
+    Args:
+        message: 消息
+        field: 要解析的字段名，默认为Content
+
+    Returns:
+        XmlView: 根元素的只读视图
+
+    Raises:
+        ET.ParseError: XML格式错误时抛出
+    """
+    source = message[field]
+    cache = message.get(XML_CACHE_KEY)
+    if cache is None:
+        cache = message[XML_CACHE_KEY] = {}
+
+    view = cache.get(field)
+    if view is not None and (view.source is source or view.source == source):
+        return view
+
+    view = XmlView(ET.fromstring(source), source)
+    cache[field] = view
+    return view
+
+
+# (结果键名, 子元素标签, 类型转换, 默认值)
+FieldSpec = tuple[str, str, Callable[[str], Any], Any]
+
+REFERMSG_FIELDS: tuple[FieldSpec, ...] = (
+    ("NewMsgId", "svrid", str, None),
+    ("ToWxid", "fromusr", str, None),
+    ("FromWxid", "chatusr", str, None),
+    ("Nickname", "displayname", str, None),
+    ("MsgSource", "msgsource", str, None),
+    ("Content", "content", str, None),
+    ("Createtime", "createtime", str, None),
+)
+
+QUOTE_APPMSG_FIELDS: tuple[FieldSpec, ...] = (
+    ("Content", "title", str, ""),
+    ("destination", "des", str, ""),
+    ("action", "action", str, ""),
+    ("XmlType", "type", int, 0),
+    ("showtype", "showtype", int, 0),
+    ("soundtype", "soundtype", int, 0),
+    ("url", "url", str, ""),
+    ("lowurl", "lowurl", str, ""),
+    ("dataurl", "dataurl", str, ""),
+    ("lowdataurl", "lowdataurl", str, ""),
+    ("songlyric", "songlyric", str, ""),
+    ("extinfo", "extinfo", str, ""),
+    ("sourceusername", "sourceusername", str, ""),
+    ("sourcedisplayname", "sourcedisplayname", str, ""),
+    ("thumburl", "thumburl", str, ""),
+    ("md5", "md5", str, ""),
+    ("statextstr", "statextstr", str, ""),
+    ("directshare", "directshare", int, 0),
+)
+
+APPATTACH_FIELDS: tuple[FieldSpec, ...] = (
+    ("totallen", "totallen", int, 0),
+    ("attachid", "attachid", str, ""),
+    ("emoticonmd5", "emoticonmd5", str, ""),
+    ("fileext", "fileext", str, ""),
+    ("cdnthumbaeskey", "cdnthumbaeskey", str, ""),
+    ("aeskey", "aeskey", str, ""),
+)
+
+
+class QuoteInfo(TypedDict, total=False):
+    """引用消息中被引用的消息"""
+    MsgType: int
+    NewMsgId: str
+    ToWxid: str
+    FromWxid: str
+    Nickname: str
+    MsgSource: str
+    Content: str
+    Createtime: str
+    # 以下仅在被引用的是xml消息时存在
+    destination: str
+    action: str
+    XmlType: int
+    showtype: int
+    soundtype: int
+    url: str
+    lowurl: str
+    dataurl: str
+    lowdataurl: str
+    songlyric: str
+    appattach: dict
+    extinfo: str
+    sourceusername: str
+    sourcedisplayname: str
+    thumburl: str
+    md5: str
+    statextstr: str
+    directshare: int
+
+
+def extract_fields(element: Optional[XmlView], fields: tuple[FieldSpec, ...], result: dict) -> dict:
+    """按字段表从element的直接子元素中提取值
+
+    只遍历一次子元素，缺失或为空的字段使用默认值。
+    """
+    children = {}
+    if element is not None:
+        for child in element._element:
+            children.setdefault(child.tag, child)
+
+    for key, tag, convert, default in fields:
+        child = children.get(tag)
+        text = child.text if child is not None else None
+        result[key] = convert(text) if text is not None else default
+    return result
+
+
+def parse_quote(root: XmlView) -> tuple[Optional[str], QuoteInfo]:
+    """解析引用消息
+
+    Args:
+        root: 引用消息的根元素
+
+    Returns:
+        tuple[str, QuoteInfo]: 回复的文字内容，被引用的消息
+    """
+    appmsg = root.find("appmsg")
+    text = appmsg.findtext("title")
+    refermsg = appmsg.find("refermsg")
+
+    quote: QuoteInfo = {"MsgType": int(refermsg.findtext("type"))}
+
+    if quote["MsgType"] in (1, 49):
+        extract_fields(refermsg, REFERMSG_FIELDS, quote)
+
+    if quote["MsgType"] == 49 and quote["Content"]:
+        quote_appmsg = XmlView(ET.fromstring(quote["Content"])).find("appmsg")
+        extract_fields(quote_appmsg, QUOTE_APPMSG_FIELDS, quote)
+        quote["appattach"] = extract_fields(
+            quote_appmsg.find("appattach") if quote_appmsg is not None else None, APPATTACH_FIELDS, {})
+
+    return text, quote
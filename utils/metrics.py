@@ -0,0 +1,125 @@
+import math
+import threading
+from collections import deque
+from typing import Dict, List, Optional, Union
+
+from utils.singleton import Singleton
+
+
+class RollingWindow:
+    """固定长度的滑动窗口，用于统计最近N次观测值"""
+
+    def __init__(self, size: int = 1024):
+        self._values = deque(maxlen=size)
+
+    def add(self, value: float):
+        self._values.append(value)
+
+    def summary(self) -> dict:
+        values = list(self._values)
+        if not values:
+            return {"count": 0, "avg": 0, "max": 0, "last": 0, "p50": 0, "p95": 0, "p99": 0}
+        ordered = sorted(values)
+        return {
+            "count": len(values),
+            "avg": sum(values) / len(values),
+            "max": ordered[-1],
+            "last": values[-1],
+            "p50": self._percentile(ordered, 50),
+            "p95": self._percentile(ordered, 95),
+            "p99": self._percentile(ordered, 99),
+        }
+
+    @staticmethod
+    def _percentile(ordered: list, percent: float) -> float:
+        """最近秩法计算百分位数，ordered需已排序"""
+        index = max(math.ceil(len(ordered) * percent / 100) - 1, 0)
+        return ordered[index]
+
+
+class HandlerStats:
+    """单个插件处理某类事件的统计"""
+
+    def __init__(self):
+        self.latency = RollingWindow()
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+
+    def summary(self) -> dict:
+        return {"calls": self.calls, "errors": self.errors, "timeouts": self.timeouts,
+                "latency": self.latency.summary()}
+
+
+class Metrics(metaclass=Singleton):
+    """运行时指标，进程内共享，WebUI与插件可直接读取"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._gauges: Dict[str, float] = {}
+        self._counters: Dict[str, int] = {}
+        self._windows: Dict[str, RollingWindow] = {}
+        self._handlers: Dict[tuple[str, str], HandlerStats] = {}
+
+    def set_gauge(self, name: str, value: Union[int, float]):
+        """设置瞬时值，如当前轮询间隔"""
+        self._gauges[name] = value
+
+    def incr(self, name: str, amount: int = 1):
+        """计数器累加"""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def observe(self, name: str, value: Union[int, float]):
+        """记录一次观测值，如每批消息数量"""
+        window = self._windows.get(name)
+        if window is None:
+            with self._lock:
+                window = self._windows.setdefault(name, RollingWindow())
+        window.add(value)
+
+    def observe_handler(self, plugin: str, event_type: str, elapsed: float, error: bool = False,
+                        timeout: bool = False):
+        """记录一次事件处理函数的执行情况
+
+        Args:
+            plugin: 插件名
+            event_type: 事件类型
+            elapsed: 耗时（秒）
+            error: 是否抛出异常
+            timeout: 是否超时
+        """
+        key = (plugin, event_type)
+        stats = self._handlers.get(key)
+        if stats is None:
+            with self._lock:
+                stats = self._handlers.setdefault(key, HandlerStats())
+        stats.calls += 1
+        stats.errors += error
+        stats.timeouts += timeout
+        stats.latency.add(elapsed)
+
+    def handler_stats(self, plugin: Optional[str] = None) -> List[dict]:
+        """获取事件处理函数的统计，按p95耗时从高到低排序
+
+        Args:
+            plugin: 只返回指定插件的统计，为None时返回全部
+        """
+        with self._lock:
+            items = list(self._handlers.items())
+        result = [{"plugin": name, "event_type": event_type, **stats.summary()}
+                  for (name, event_type), stats in items if plugin is None or name == plugin]
+        result.sort(key=lambda x: x["latency"]["p95"], reverse=True)
+        return result
+
+    def snapshot(self) -> dict:
+        """获取所有指标的快照"""
+        with self._lock:
+            return {
+                "gauges": dict(self._gauges),
+                "counters": dict(self._counters),
+                "windows": {name: window.summary() for name, window in self._windows.items()},
+            }
+
+
+metrics = Metrics()
@@ -0,0 +1,171 @@
+import functools
+import inspect
+import json
+import os
+import random
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+from loguru import logger
+
+from utils.singleton import Singleton
+
+SPAN_LEVEL = "SPAN"
+
+_current_span: ContextVar[Optional["Span"]] = ContextVar("xybot_current_span", default=None)
+
+
+class Span:
+    """一次耗时操作，结束时写入追踪文件"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "attrs", "start", "_perf", "_token")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attrs: dict):
+        self.trace_id = trace_id
+        self.span_id = os.urandom(4).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attrs = attrs
+        self.start = time.time()
+        self._perf = time.perf_counter()
+        self._token = None
+
+    def set(self, **attrs):
+        """补充属性，如处理结果"""
+        self.attrs.update(attrs)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        tracer.record(self, time.perf_counter() - self._perf)
+        return False
+
+
+class _NoopSpan:
+    """未采样时使用的空操作，开销接近为零"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+class Tracer(metaclass=Singleton):
+    """消息处理链路追踪
+
+    每批消息按采样率决定是否追踪，被采样的批次中所有操作都会记录为span，
+    未被采样时span为空操作。span以JSON行写入独立的滚动日志文件。
+    """
+
+    def __init__(self):
+        self.sample_rate = 0.0
+        self._sink_id = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def configure(self, sample_rate: float = 0.0, path: str = "logs/trace.log", rotation: str = "50 MB",
+                  retention: int = 5):
+        """设置采样率和追踪文件
+
+        Args:
+            sample_rate: 采样率，0到1之间，0为关闭
+            path: 追踪文件路径
+            rotation: 滚动大小
+            retention: 保留的文件数量
+        """
+        self.sample_rate = min(max(sample_rate, 0.0), 1.0)
+
+        if self._sink_id is not None:
+            logger.remove(self._sink_id)
+            self._sink_id = None
+        if not self.enabled:
+            return
+
+        try:
+            logger.level(SPAN_LEVEL)
+        except ValueError:
+            logger.level(SPAN_LEVEL, no=1)
+        self._sink_id = logger.add(path, level=SPAN_LEVEL, format="{message}", rotation=rotation,
+                                   retention=retention, encoding="utf-8", enqueue=True,
+                                   filter=lambda r: r["level"].name == SPAN_LEVEL)
+        logger.info("链路追踪已开启: 采样率:{} 文件:{}", self.sample_rate, path)
+
+    @staticmethod
+    def current() -> Optional[Span]:
+        """当前所在的span，未采样时为None"""
+        return _current_span.get()
+
+    def trace(self, name: str, **attrs):
+        """开始一条新的链路，按采样率决定是否记录"""
+        if not self.enabled or random.random() >= self.sample_rate:
+            return _NOOP
+        return Span(name, os.urandom(8).hex(), None, attrs)
+
+    def span(self, name: str, parent: Optional[Span] = None, **attrs):
+        """在当前链路中创建子span，当前不在被采样的链路中时为空操作
+
+        Args:
+            name: 名称
+            parent: 父span，跨任务传递时使用，默认为当前span
+        """
+        if parent is None:
+            parent = _current_span.get()
+            if parent is None:
+                return _NOOP
+        return Span(name, parent.trace_id, parent.span_id, attrs)
+
+    def record(self, span: Span, elapsed: float):
+        logger.log(SPAN_LEVEL, json.dumps({
+            "trace": span.trace_id,
+            "span": span.span_id,
+            "parent": span.parent_id,
+            "name": span.name,
+            "start": round(span.start, 6),
+            "ms": round(elapsed * 1000, 3),
+            **({"attrs": span.attrs} if span.attrs else {}),
+        }, ensure_ascii=False, default=str))
+
+    def instrument(self, obj: Any, prefix: str):
+        """为对象的所有公开异步方法添加span，用于无法直接修改的类（如WechatAPIClient）"""
+        for name in dir(type(obj)):
+            if name.startswith("_") or not inspect.iscoroutinefunction(getattr(type(obj), name, None)):
+                continue
+            setattr(obj, name, traced(f"{prefix}.{name}")(getattr(obj, name)))
+
+
+tracer = Tracer()
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """为异步函数添加span的装饰器，默认以函数的限定名命名"""
+
+    def decorator(func: Callable) -> Callable:
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return await func(*args, **kwargs)
+            with tracer.span(span_name):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
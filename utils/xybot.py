@@ -1,6 +1,8 @@
+import asyncio
+import contextvars
+import time
 import tomllib
-import xml.etree.ElementTree as ET
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 from loguru import logger
 
@@ -8,7 +10,14 @@ from WechatAPI import WechatAPIClient
 from WechatAPI.Client.protect import protector
 from database.keyvalDB import KeyvalDB
 from database.messsagDB import MessageDB
+from utils.chatroom_cache import chatroom_members
 from utils.event_manager import EventManager
+from utils.message_counter import MessageCounter
+from utils.message_dedup import MessageDeduplicator
+from utils.message_xml import parse_quote, parse_xml
+from utils.message import LazyMedia, build_message
+from utils.metrics import metrics
+from utils.tracing import traced, tracer
 
 
 class XYBot:
@@ -28,8 +37,12 @@ class XYBot:
         self.whitelist = main_config.get("XYBot", {}).get("whitelist", [])
         self.blacklist = main_config.get("XYBot", {}).get("blacklist", [])
 
+        self.dedup = MessageDeduplicator(capacity=main_config.get("XYBot", {}).get("dedup-cache-size", 10000),
+                                         bloom_capacity=main_config.get("XYBot", {}).get("dedup-bloom-size", 0))
+
         self.msg_db = MessageDB()
         self.key_db = KeyvalDB()
+        self.message_counter = MessageCounter()
 
 
     def update_profile(self, wxid: str, nickname: str, alias: str, phone: str):
@@ -42,12 +55,13 @@ class XYBot:
     async def process_message(self, message: Dict[str, Any]):
         """处理接收到的消息"""
 
-        # 数据库消息数+1先
-        msg_count = int(await self.key_db.get("messages") or 0) + 1
-        await self.key_db.set("messages", str(msg_count))
-        
-        # 同时更新WebUI使用的消息计数键
-        await self.key_db.set("bot:stats:message_count", str(msg_count))
+        # 同步超时重试或堆积消息可能导致重复投递，在任何处理之前丢弃
+        if self.dedup.is_duplicate(message):
+            logger.debug("丢弃重复消息: 消息ID:{}", message.get("MsgId"))
+            return
+
+        # 消息数+1先，由计数器定时写回数据库
+        self.message_counter.incr()
 
         msg_type = message.get("MsgType")
 
@@ -83,7 +97,7 @@ class XYBot:
 
         elif msg_type == 37:  # 好友请求
             if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("friend_request", self.bot, message)
+                await EventManager.emit("friend_request", self.bot, build_message("friend_request", message))
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
@@ -95,6 +109,7 @@ class XYBot:
 
         # 可以继续添加更多消息类型的处理
 
+    @traced()
     async def process_text_message(self, message: Dict[str, Any]):
         """处理文本消息"""
         # 预处理消息
@@ -117,7 +132,7 @@ class XYBot:
             message["IsGroup"] = False
 
         try:
-            root = ET.fromstring(message["MsgSource"])
+            root = parse_xml(message, "MsgSource")
             ats = root.find("atuserlist").text if root.find("atuserlist") is not None else ""
         except Exception as e:
             logger.error("解析文本消息失败: {}", e)
@@ -149,7 +164,7 @@ class XYBot:
 
             if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
                 if self.ignore_protection or not protector.check(14400):
-                    await EventManager.emit("at_message", self.bot, message)
+                    await EventManager.emit("at_message", self.bot, build_message("at_message", message))
                 else:
                     logger.warning("风控保护: 新设备登录后4小时内请挂机")
             return
@@ -163,10 +178,11 @@ class XYBot:
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("text_message", self.bot, message)
+                await EventManager.emit("text_message", self.bot, build_message("text_message", message))
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
+    @traced()
     async def process_image_message(self, message: Dict[str, Any]):
         """处理图片消息"""
         # 预处理消息
@@ -205,7 +221,7 @@ class XYBot:
         # 解析图片消息
         aeskey, cdnmidimgurl = None, None
         try:
-            root = ET.fromstring(message["Content"])
+            root = parse_xml(message)
             img_element = root.find('img')
             if img_element is not None:
                 aeskey = img_element.get('aeskey')
@@ -215,15 +231,13 @@ class XYBot:
             return
 
         # 下载图片
+        media = None
         if aeskey and cdnmidimgurl:
-            message["Content"] = await self.bot.download_image(aeskey, cdnmidimgurl)
+            media = LazyMedia(lambda: self.bot.download_image(aeskey, cdnmidimgurl))
 
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("image_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
+        await self._emit_media_message("image_message", message, "Content", media)
 
+    @traced()
     async def process_voice_message(self, message: Dict[str, Any]):
         """处理语音消息"""
         # 预处理消息
@@ -263,7 +277,7 @@ class XYBot:
             # 解析语音消息
             voiceurl, length = None, None
             try:
-                root = ET.fromstring(message["Content"])
+                root = parse_xml(message)
                 voicemsg_element = root.find('voicemsg')
                 if voicemsg_element is not None:
                     voiceurl = voicemsg_element.get('voiceurl')
@@ -273,19 +287,20 @@ class XYBot:
                 return
 
             # 下载语音
+            media = None
             if voiceurl and length:
-                silk_base64 = await self.bot.download_voice(message["MsgId"], voiceurl, length)
-                message["Content"] = await self.bot.silk_base64_to_wav_byte(silk_base64)
+                async def load_voice():
+                    silk_base64 = await self.bot.download_voice(message["MsgId"], voiceurl, length)
+                    return await self.bot.silk_base64_to_wav_byte(silk_base64)
+
+                media = LazyMedia(load_voice)
         else:
             silk_base64 = message["ImgBuf"]["buffer"]
-            message["Content"] = await self.bot.silk_base64_to_wav_byte(silk_base64)
+            media = LazyMedia(lambda: self.bot.silk_base64_to_wav_byte(silk_base64))
 
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("voice_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
+        await self._emit_media_message("voice_message", message, "Content", media)
 
+    @traced()
     async def process_xml_message(self, message: Dict[str, Any]):
         """处理xml消息"""
         message["Content"] = message.get("Content").get("string").replace("\n", "").replace("\t", "")
@@ -315,7 +330,7 @@ class XYBot:
         )
 
         try:
-            root = ET.fromstring(message["Content"])
+            root = parse_xml(message)
             type = int(root.find("appmsg").find("type").text)
         except Exception as e:
             logger.error(f"解析xml消息失败: {e}")
@@ -331,92 +346,11 @@ class XYBot:
         else:
             logger.info("未知的xml消息类型: {}", message)
 
+    @traced()
     async def process_quote_message(self, message: Dict[str, Any]):
         """处理引用消息"""
-        quote_messsage = {}
         try:
-            root = ET.fromstring(message["Content"])
-            appmsg = root.find("appmsg")
-            text = appmsg.find("title").text
-            refermsg = appmsg.find("refermsg")
-
-            quote_messsage["MsgType"] = int(refermsg.find("type").text)
-
-            if quote_messsage["MsgType"] == 1:  # 文本消息
-                quote_messsage["NewMsgId"] = refermsg.find("svrid").text
-                quote_messsage["ToWxid"] = refermsg.find("fromusr").text
-                quote_messsage["FromWxid"] = refermsg.find("chatusr").text
-                quote_messsage["Nickname"] = refermsg.find("displayname").text
-                quote_messsage["MsgSource"] = refermsg.find("msgsource").text
-                quote_messsage["Content"] = refermsg.find("content").text
-                quote_messsage["Createtime"] = refermsg.find("createtime").text
-
-            elif quote_messsage["MsgType"] == 49:  # 引用消息
-                quote_messsage["NewMsgId"] = refermsg.find("svrid").text
-                quote_messsage["ToWxid"] = refermsg.find("fromusr").text
-                quote_messsage["FromWxid"] = refermsg.find("chatusr").text
-                quote_messsage["Nickname"] = refermsg.find("displayname").text
-                quote_messsage["MsgSource"] = refermsg.find("msgsource").text
-                quote_messsage["Createtime"] = refermsg.find("createtime").text
-
-                quote_messsage["Content"] = refermsg.find("content").text
-
-                quote_root = ET.fromstring(quote_messsage["Content"])
-                quote_appmsg = quote_root.find("appmsg")
-
-                quote_messsage["Content"] = quote_appmsg.find("title").text if isinstance(quote_appmsg.find("title"),
-                                                                                          ET.Element) else ""
-                quote_messsage["destination"] = quote_appmsg.find("des").text if isinstance(quote_appmsg.find("des"),
-                                                                                            ET.Element) else ""
-                quote_messsage["action"] = quote_appmsg.find("action").text if isinstance(quote_appmsg.find("action"),
-                                                                                          ET.Element) else ""
-                quote_messsage["XmlType"] = int(quote_appmsg.find("type").text) if isinstance(quote_appmsg.find("type"),
-                                                                                              ET.Element) else 0
-                quote_messsage["showtype"] = int(quote_appmsg.find("showtype").text) if isinstance(
-                    quote_appmsg.find("showtype"), ET.Element) else 0
-                quote_messsage["soundtype"] = int(quote_appmsg.find("soundtype").text) if isinstance(
-                    quote_appmsg.find("soundtype"), ET.Element) else 0
-                quote_messsage["url"] = quote_appmsg.find("url").text if isinstance(quote_appmsg.find("url"),
-                                                                                    ET.Element) else ""
-                quote_messsage["lowurl"] = quote_appmsg.find("lowurl").text if isinstance(quote_appmsg.find("lowurl"),
-                                                                                          ET.Element) else ""
-                quote_messsage["dataurl"] = quote_appmsg.find("dataurl").text if isinstance(
-                    quote_appmsg.find("dataurl"), ET.Element) else ""
-                quote_messsage["lowdataurl"] = quote_appmsg.find("lowdataurl").text if isinstance(
-                    quote_appmsg.find("lowdataurl"), ET.Element) else ""
-                quote_messsage["songlyric"] = quote_appmsg.find("songlyric").text if isinstance(
-                    quote_appmsg.find("songlyric"), ET.Element) else ""
-                quote_messsage["appattach"] = {}
-                quote_messsage["appattach"]["totallen"] = int(
-                    quote_appmsg.find("appattach").find("totallen").text) if isinstance(
-                    quote_appmsg.find("appattach").find("totallen"), ET.Element) else 0
-                quote_messsage["appattach"]["attachid"] = quote_appmsg.find("appattach").find(
-                    "attachid").text if isinstance(quote_appmsg.find("appattach").find("attachid"), ET.Element) else ""
-                quote_messsage["appattach"]["emoticonmd5"] = quote_appmsg.find("appattach").find(
-                    "emoticonmd5").text if isinstance(quote_appmsg.find("appattach").find("emoticonmd5"),
-                                                      ET.Element) else ""
-                quote_messsage["appattach"]["fileext"] = quote_appmsg.find("appattach").find(
-                    "fileext").text if isinstance(quote_appmsg.find("appattach").find("fileext"), ET.Element) else ""
-                quote_messsage["appattach"]["cdnthumbaeskey"] = quote_appmsg.find("appattach").find(
-                    "cdnthumbaeskey").text if isinstance(quote_appmsg.find("appattach").find("cdnthumbaeskey"),
-                                                         ET.Element) else ""
-                quote_messsage["appattach"]["aeskey"] = quote_appmsg.find("appattach").find(
-                    "aeskey").text if isinstance(quote_appmsg.find("appattach").find("aeskey"), ET.Element) else ""
-                quote_messsage["extinfo"] = quote_appmsg.find("extinfo").text if isinstance(
-                    quote_appmsg.find("extinfo"), ET.Element) else ""
-                quote_messsage["sourceusername"] = quote_appmsg.find("sourceusername").text if isinstance(
-                    quote_appmsg.find("sourceusername"), ET.Element) else ""
-                quote_messsage["sourcedisplayname"] = quote_appmsg.find("sourcedisplayname").text if isinstance(
-                    quote_appmsg.find("sourcedisplayname"), ET.Element) else ""
-                quote_messsage["thumburl"] = quote_appmsg.find("thumburl").text if isinstance(
-                    quote_appmsg.find("thumburl"), ET.Element) else ""
-                quote_messsage["md5"] = quote_appmsg.find("md5").text if isinstance(quote_appmsg.find("md5"),
-                                                                                    ET.Element) else ""
-                quote_messsage["statextstr"] = quote_appmsg.find("statextstr").text if isinstance(
-                    quote_appmsg.find("statextstr"), ET.Element) else ""
-                quote_messsage["directshare"] = int(quote_appmsg.find("directshare").text) if isinstance(
-                    quote_appmsg.find("directshare"), ET.Element) else 0
-
+            text, quote_messsage = parse_quote(parse_xml(message))
         except Exception as e:
             logger.error(f"解析引用消息失败: {e}")
             return
@@ -433,10 +367,11 @@ class XYBot:
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("quote_message", self.bot, message)
+                await EventManager.emit("quote_message", self.bot, build_message("quote_message", message))
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
+    @traced()
     async def process_video_message(self, message):
         # 预处理消息
         message["Content"] = message.get("Content").get("string")
@@ -471,18 +406,15 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        message["Video"] = await self.bot.download_video(message["MsgId"])
-
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("video_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
+        msg_id = message["MsgId"]
+        await self._emit_media_message("video_message", message, "Video",
+                                       LazyMedia(lambda: self.bot.download_video(msg_id)))
 
+    @traced()
     async def process_file_message(self, message: Dict[str, Any]):
         """处理文件消息"""
         try:
-            root = ET.fromstring(message["Content"])
+            root = parse_xml(message)
             filename = root.find("appmsg").find("title").text
             attach_id = root.find("appmsg").find("appattach").find("attachid").text
             file_extend = root.find("appmsg").find("appattach").find("fileext").text
@@ -508,14 +440,10 @@ class XYBot:
             is_group=message["IsGroup"]
         )
 
-        message["File"] = await self.bot.download_attach(attach_id)
-
-        if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
-            if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("file_message", self.bot, message)
-            else:
-                logger.warning("风控保护: 新设备登录后4小时内请挂机")
+        await self._emit_media_message("file_message", message, "File",
+                                       LazyMedia(lambda: self.bot.download_attach(attach_id)))
 
+    @traced()
     async def process_system_message(self, message: Dict[str, Any]):
         """处理系统消息"""
         # 预处理消息
@@ -537,12 +465,16 @@ class XYBot:
             message["IsGroup"] = False
 
         try:
-            root = ET.fromstring(message["Content"])
+            root = parse_xml(message)
             msg_type = root.attrib["type"]
         except Exception as e:
             logger.error(f"解析系统消息失败: {e}")
             return
 
+        if message["IsGroup"]:
+            # 入群、移出群聊等消息同步更新群成员缓存
+            chatroom_members.apply_system_message(message["FromWxid"], root)
+
         if msg_type == "pat":
             await self.process_pat_message(message)
         elif msg_type == "ClientCheckGetExtInfo":
@@ -551,14 +483,15 @@ class XYBot:
             logger.info("收到系统消息: {}", message)
             if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
                 if self.ignore_protection or not protector.check(14400):
-                    await EventManager.emit("system_message", self.bot, message)
+                    await EventManager.emit("system_message", self.bot, build_message("system_message", message))
                 else:
                     logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
+    @traced()
     async def process_pat_message(self, message: Dict[str, Any]):
         """处理拍一拍请求消息"""
         try:
-            root = ET.fromstring(message["Content"])
+            root = parse_xml(message)
             pat = root.find("pat")
             patter = pat.find("fromusername").text
             patted = pat.find("pattedusername").text
@@ -590,10 +523,33 @@ class XYBot:
 
         if self.ignore_check(message["FromWxid"], message["SenderWxid"]):
             if self.ignore_protection or not protector.check(14400):
-                await EventManager.emit("pat_message", self.bot, message)
+                await EventManager.emit("pat_message", self.bot, build_message("pat_message", message))
             else:
                 logger.warning("风控保护: 新设备登录后4小时内请挂机")
 
+    async def _emit_media_message(self, event_type: str, message: Dict[str, Any], field: str,
+                                  media: LazyMedia = None):
+        """触发媒体消息事件
+
+        没有处理函数订阅时不下载媒体；所有处理函数都使用@lazy_media时由处理函数按需下载，
+        否则先下载并写入field，与以前的行为相同。
+        """
+        if not self.ignore_check(message["FromWxid"], message["SenderWxid"]):
+            return
+        if not self.ignore_protection and protector.check(14400):
+            logger.warning("风控保护: 新设备登录后4小时内请挂机")
+            return
+        if not EventManager.has_handlers(event_type):
+            logger.debug("没有处理函数订阅{}，跳过下载媒体: 消息ID:{}", event_type, message["MsgId"])
+            return
+
+        if media is not None and EventManager.needs_media(event_type):
+            message[field] = await media
+        msg = build_message(event_type, message)
+        if media is not None:
+            msg["_media"] = media
+        await EventManager.emit(event_type, self.bot, msg)
+
     def ignore_check(self, FromWxid: str, SenderWxid: str):
         if self.ignore_mode == "Whitelist":
             return (FromWxid in self.whitelist) or (SenderWxid in self.whitelist)
@@ -601,3 +557,115 @@ class XYBot:
             return (FromWxid not in self.blacklist) and (SenderWxid not in self.blacklist)
         else:
             return True
+
+
+class MessageDispatcher:
+    """按会话分道的有界消息分发器
+
+    消息按会话（FromWxid）分到各自的通道，同一会话内严格按到达顺序处理，
+    不同会话之间并行处理，同时处理的消息数量不超过工作协程数量。
+    待处理消息总数达到上限时submit会等待，从而对消息同步循环形成背压。
+    通道空闲超过指定时间后自动回收。
+
+    Args:
+        xybot (XYBot): 消息处理实例
+        workers (int): 同时处理消息的最大数量
+        queue_size (int): 待处理消息的最大数量
+        lane_idle_timeout (float): 会话通道空闲回收时间（秒）
+    """
+
+    def __init__(self, xybot: XYBot, workers: int = 8, queue_size: int = 1000, lane_idle_timeout: float = 60):
+        self.xybot = xybot
+        self.workers = max(workers, 1)
+        self.queue_size = max(queue_size, 1)
+        self.lane_idle_timeout = lane_idle_timeout
+
+        self._slots = asyncio.Semaphore(self.queue_size)
+        self._running = asyncio.Semaphore(self.workers)
+        self._lanes: Dict[str, asyncio.Queue] = {}
+        self._lane_tasks: Dict[str, asyncio.Task] = {}
+        self._pending = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return self._pending
+
+    @property
+    def lane_count(self) -> int:
+        return len(self._lanes)
+
+    def start(self):
+        """启动分发器，通道按需创建"""
+        logger.success("消息分发器已启动: 并发数:{} 队列长度:{}", self.workers, self.queue_size)
+
+    async def stop(self):
+        """停止所有会话通道，未处理的消息会被丢弃"""
+        tasks = list(self._lane_tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._lanes.clear()
+        self._lane_tasks.clear()
+
+    def conversation_key(self, message: Dict[str, Any]) -> str:
+        """获取消息所属会话，自己发出的消息归到接收方的会话"""
+        from_wxid = message.get("FromUserName", {}).get("string", "")
+        to_wxid = message.get("ToWxid", {}).get("string", "")
+        if from_wxid == self.xybot.wxid:
+            return to_wxid
+        return from_wxid
+
+    async def submit(self, message: Dict[str, Any]):
+        """提交一条消息，待处理消息已满时等待"""
+        if self._slots.locked():
+            metrics.incr("dispatcher.backpressure")
+        await self._slots.acquire()
+
+        key = self.conversation_key(message)
+        lane = self._lanes.get(key)
+        if lane is None:
+            lane = self._lanes[key] = asyncio.Queue()
+            # 通道任务长期存在，使用空的上下文，避免继承创建时所在的追踪链路
+            self._lane_tasks[key] = asyncio.create_task(self._lane_worker(key, lane), name=f"xybot-lane-{key}",
+                                                        context=contextvars.Context())
+
+        lane.put_nowait((time.monotonic(), message, tracer.current()))
+        self._pending += 1
+        metrics.set_gauge("dispatcher.queue_depth", self._pending)
+        metrics.set_gauge("dispatcher.lanes", len(self._lanes))
+
+    async def submit_batch(self, messages: List[Dict[str, Any]]):
+        """按顺序提交一批消息"""
+        for message in messages:
+            await self.submit(message)
+
+    async def _lane_worker(self, key: str, lane: asyncio.Queue):
+        try:
+            while True:
+                try:
+                    enqueue_time, message, parent = await asyncio.wait_for(lane.get(),
+                                                                           timeout=self.lane_idle_timeout)
+                except asyncio.TimeoutError:
+                    # 获取超时和回收之间没有await，不会有新消息插入
+                    if lane.empty():
+                        return
+                    continue
+
+                try:
+                    async with self._running:
+                        wait_time = time.monotonic() - enqueue_time
+                        metrics.observe("dispatcher.wait_time", wait_time)
+                        with tracer.span("message", parent=parent, msg_id=message.get("MsgId"),
+                                         msg_type=message.get("MsgType"), wait_ms=round(wait_time * 1000, 3)):
+                            await self.xybot.process_message(message)
+                except Exception as e:
+                    logger.opt(exception=e).error("处理消息时出错: {}", e)
+                finally:
+                    self._pending -= 1
+                    self._slots.release()
+                    metrics.set_gauge("dispatcher.queue_depth", self._pending)
+        finally:
+            if self._lanes.get(key) is lane:
+                del self._lanes[key]
+                del self._lane_tasks[key]
+            metrics.set_gauge("dispatcher.lanes", len(self._lanes))